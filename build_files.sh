@@ -14,4 +14,8 @@ python3 manage.py collectstatic --noinput --clear
 
 # Jalankan migrasi database (jika ada perubahan model)
 echo "Running migrations..."
-python3 manage.py migrate --noinput
\ No newline at end of file
+python3 manage.py migrate --noinput
+
+# Tabel cache (backend default di luar SQLite lokal, lihat CACHE_BACKEND; aman dijalankan berulang)
+echo "Creating cache table..."
+python3 manage.py createcachetable
@@ -0,0 +1,93 @@
+# library/account.py
+
+"""Ringkasan status peminjaman anggota.
+
+Semua fakta yang dibutuhkan halaman profil, daftar pinjaman dan pengajuan
+pinjaman (jumlah pinjaman aktif, keterlambatan, denda) dihitung dalam satu
+query agregat bersyarat lalu di-cache per user. Cache dihapus setiap ada
+perubahan Loan milik user tersebut.
+
+Cache (``get_account_state``) hanya untuk tampilan: cache lokal per proses
+bisa basi di worker lain. Keputusan yang menulis (``request_loan``) memakai
+``compute_account_state`` langsung dari database.
+"""
+
+from dataclasses import dataclass
+from datetime import date
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.db.models import Count, DateField, F, Q, Sum, Value
+
+from .models import Loan
+
+LOAN_LIMIT = 5
+ACCOUNT_CACHE_TIMEOUT = 300  # detik
+
+
+@dataclass(frozen=True)
+class AccountState:
+    active_count: int       # pending + approved
+    pending_count: int
+    approved_count: int
+    has_overdue: bool
+    has_unpaid_fine: bool
+    unpaid_fixed_fine: Decimal
+    running_fine: int
+
+    @property
+    def total_fine(self):
+        return self.unpaid_fixed_fine + self.running_fine
+
+    @property
+    def can_borrow(self):
+        """Tidak ada denda unpaid dan tidak ada buku overdue."""
+        return not (self.has_unpaid_fine or self.has_overdue)
+
+    @property
+    def at_limit(self):
+        return self.active_count >= LOAN_LIMIT
+
+
+def _cache_key(user_id, today):
+    # Tanggal ikut menjadi kunci karena denda berjalan berubah setiap hari
+    return f'account-state:{user_id}:{today.isoformat()}'
+
+
+def compute_account_state(user_id, today=None):
+    today = today or date.today()
+    overdue = Q(status='approved', due_date__lt=today)
+    row = Loan.objects.filter(member_id=user_id).aggregate(
+        active_count=Count('pk', filter=Q(status__in=['pending', 'approved'])),
+        pending_count=Count('pk', filter=Q(status='pending')),
+        approved_count=Count('pk', filter=Q(status='approved')),
+        overdue_count=Count('pk', filter=overdue),
+        unpaid_count=Count('pk', filter=Q(is_paid=False, fine_amount__gt=0)),
+        unpaid_fixed_fine=Sum('fine_amount', filter=Q(is_paid=False)),
+        overdue_time=Sum(Value(today, output_field=DateField()) - F('due_date'), filter=overdue),
+    )
+    overdue_days = row['overdue_time'].days if row['overdue_time'] else 0
+    return AccountState(
+        active_count=row['active_count'],
+        pending_count=row['pending_count'],
+        approved_count=row['approved_count'],
+        has_overdue=row['overdue_count'] > 0,
+        has_unpaid_fine=row['unpaid_count'] > 0,
+        unpaid_fixed_fine=row['unpaid_fixed_fine'] or Decimal('0'),
+        running_fine=overdue_days * Loan.FINE_PER_DAY,
+    )
+
+
+def get_account_state(user):
+    today = date.today()
+    key = _cache_key(user.pk, today)
+    state = cache.get(key)
+    if state is None:
+        state = compute_account_state(user.pk, today)
+        cache.set(key, state, ACCOUNT_CACHE_TIMEOUT)
+    return state
+
+
+def invalidate_account_state(user_ids):
+    today = date.today()
+    cache.delete_many([_cache_key(user_id, today) for user_id in set(user_ids)])
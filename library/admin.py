@@ -1,7 +1,10 @@
 # library/admin.py
 
 from django.contrib import admin
+from django.db.models import Prefetch
 from .models import Book, Loan, Genre, Location, Author
+from .exports import StreamingExportMixin, iterate
+from .routing import ReplicaChangelistMixin
 from django.utils import timezone
 from datetime import timedelta 
 from django.db.models import F
@@ -25,7 +28,7 @@ class AuthorAdmin(admin.ModelAdmin):
     list_display = ('name', )
     search_fields = ('name',)
 @admin.register(Book)
-class BookAdmin(admin.ModelAdmin):
+class BookAdmin(ReplicaChangelistMixin, StreamingExportMixin, admin.ModelAdmin):
     save_as=True
     # Tambahkan 'location' ke dalam list_display
     list_display = ('title', 'short_description', 'location', 'stock','display_authors','publication_year') 
@@ -49,8 +52,30 @@ class BookAdmin(admin.ModelAdmin):
     
     # Memberikan nama kolom di header tabel admin
     short_description.short_description = "Deskripsi"
+
+    export_header = ('ID', 'Judul', 'ISBN', 'Tahun Terbit', 'Stok', 'Lokasi', 'Penulis', 'Genre',
+                     'Rata-rata Rating', 'Jumlah Review')
+
+    def export_rows(self, queryset):
+        # Prefetch dijalankan per potongan, bukan untuk seluruh hasil sekaligus
+        books = queryset.select_related('location').only(
+            'title', 'isbn', 'publication_year', 'stock', 'rating_avg', 'rating_count', 'location__shelf_name',
+        ).prefetch_related(
+            Prefetch('authors', queryset=Author.objects.only('name').order_by('pk')),
+            Prefetch('genre', queryset=Genre.objects.only('name').order_by('name')),
+        )
+        for book in iterate(books):
+            yield (
+                book.pk, book.title, book.isbn, book.publication_year, book.stock,
+                book.location.shelf_name if book.location else None,
+                ', '.join(a.name for a in book.authors.all()),
+                ', '.join(g.name for g in book.genre.all()),
+                book.rating_avg, book.rating_count,
+            )
 from django.contrib import admin
 from .models import Genre, Book, Loan, Review
+from . import stock
+from .account import invalidate_account_state
 
 @admin.register(Review)
 class ReviewAdmin(admin.ModelAdmin):
@@ -58,11 +83,34 @@ class ReviewAdmin(admin.ModelAdmin):
     list_filter = ('rating', 'created_at')
     search_fields = ('book__title', 'user__username', 'comment')
 
+class AccruedFineFilter(admin.SimpleListFilter):
+    title = 'Denda Berjalan'
+    parameter_name = 'accrued'
+
+    def lookups(self, request, model_admin):
+        return (
+            ('none', 'Tanpa denda'),
+            ('low', '< Rp10.000'),
+            ('mid', 'Rp10.000 - Rp50.000'),
+            ('high', '>= Rp50.000'),
+        )
+
+    def queryset(self, request, queryset):
+        if self.value() == 'none':
+            return queryset.filter(accrued_fine=0)
+        if self.value() == 'low':
+            return queryset.filter(accrued_fine__gt=0, accrued_fine__lt=10000)
+        if self.value() == 'mid':
+            return queryset.filter(accrued_fine__gte=10000, accrued_fine__lt=50000)
+        if self.value() == 'high':
+            return queryset.filter(accrued_fine__gte=50000)
+        return queryset
+
 # --- Register Loan ---
 @admin.register(Loan)
-class LoanAdmin(admin.ModelAdmin):
-    list_display = ('book', 'member', 'status', 'borrow_date', 'due_date', 'fine_amount','is_paid') 
-    list_filter = ('status', 'due_date', 'borrow_date','is_paid') 
+class LoanAdmin(ReplicaChangelistMixin, StreamingExportMixin, admin.ModelAdmin):
+    list_display = ('book', 'member', 'status', 'borrow_date', 'due_date', 'fine_amount', 'accrued_fine', 'is_paid') 
+    list_filter = ('status', 'due_date', 'borrow_date', 'is_paid', AccruedFineFilter) 
     raw_id_fields = ('book', 'member')
     actions = ['approve_loan', 'mark_as_returned', 'reject_loan','mark_fine_as_paid']
     # readonly_fields = ('fine_amount',) 
@@ -75,51 +123,48 @@ class LoanAdmin(admin.ModelAdmin):
         'is_paid'
     )
     
+    export_header = ('ID', 'Anggota', 'Email', 'Buku', 'ISBN', 'Status', 'Tanggal Pinjam', 'Jatuh Tempo',
+                     'Tanggal Kembali', 'Denda (Rp)', 'Denda Berjalan (Rp)', 'Lunas')
+
+    def export_rows(self, queryset):
+        labels = dict(Loan.LOAN_STATUS)
+        rows = queryset.values_list(
+            'pk', 'member__username', 'member__email', 'book__title', 'book__isbn', 'status',
+            'borrow_date', 'due_date', 'return_date', 'fine_amount', 'accrued_fine', 'is_paid',
+        )
+        for row in iterate(rows):
+            yield row[:5] + (labels.get(row[5], row[5]),) + row[6:]
+
+    def save_model(self, request, obj, form, change):
+        if change and 'status' in form.changed_data:
+            obj.status_changed_at = timezone.now()
+        super().save_model(request, obj, form, change)
+
     # Action Kustom: Menyetujui Peminjaman
     def approve_loan(self, request, queryset):
-        loans_to_approve = queryset.filter(status='pending')
-        
-        for loan in loans_to_approve:
-            if loan.book.stock > 0:
-                loan.borrow_date = timezone.now().date()
-                loan.due_date = loan.borrow_date + timedelta(days=7)
-                loan.status = 'approved'
-                loan.save()
-                
-                loan.book.stock =F('stock') - 1
-                loan.book.save()
-            else:
-                self.message_user(request, f"Buku '{loan.book.title}' kehabisan stok. Peminjaman ini dilewati.", level='warning')
+        approved, skipped = stock.approve_loans(queryset)
+        for loan in skipped:
+            self.message_user(request, f"Buku '{loan.book.title}' kehabisan stok. Peminjaman ini dilewati.", level='warning')
 
-        self.message_user(request, f"Total {loans_to_approve.count()} peminjaman berhasil disetujui.")
+        self.message_user(request, f"Total {approved} peminjaman berhasil disetujui.")
     approve_loan.short_description = "Setujui Peminjaman (Kurangi Stok)"
     
     # Action Kustom: Menolak Peminjaman
     def reject_loan(self, request, queryset):
-        loans_to_reject = queryset.filter(status='pending')
-        loans_to_reject.update(status='rejected')
-        self.message_user(request, f"Total {loans_to_reject.count()} pengajuan berhasil ditolak.")
+        rejected = stock.reject_loans(queryset)
+        self.message_user(request, f"Total {rejected} pengajuan berhasil ditolak.")
     reject_loan.short_description = "Tolak Pengajuan"
 
     # Action Kustom: Pengembalian
     def mark_as_returned(self, request, queryset):
-        loans_to_return = queryset.filter(status__in=['approved'])
-        
-        for loan in loans_to_return:
-            if not loan.return_date:
-                loan.return_date = timezone.now().date()
-            
-            loan.status = 'returned'
-            loan.save() 
-            
-            loan.book.stock =F('stock') + 1
-            loan.book.save()
-            
-        self.message_user(request, f"Total {loans_to_return.count()} peminjaman berhasil dikembalikan. Denda telah dihitung.")
+        returned = stock.return_loans(queryset)
+        self.message_user(request, f"Total {returned} peminjaman berhasil dikembalikan. Denda telah dihitung.")
     
     mark_as_returned.short_description = "Tandai sebagai Dikembalikan"
 
     def mark_fine_as_paid(self, request, queryset):
+        member_ids = list(queryset.values_list('member_id', flat=True))
         updated = queryset.update(is_paid=True)
+        invalidate_account_state(member_ids)
         self.message_user(request, f"{updated} peminjaman telah ditandai lunas.")
     mark_fine_as_paid.short_description = "Tandai denda sudah lunas"
\ No newline at end of file
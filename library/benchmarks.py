@@ -0,0 +1,225 @@
+# library/benchmarks.py
+
+"""Helper benchmark: data sintetis, pengukuran waktu & rencana query.
+
+Dipakai oleh management command ``bench_*`` dan ``seed_bench``. Semua data
+dibuat dengan ``bulk_create`` sehingga ratusan ribu baris bisa di-seed dalam
+hitungan detik; ``bench_loan_indexes`` menjalankan seed di dalam transaksi
+yang di-rollback, ``seed_bench`` menyimpannya untuk ``bench_views``.
+"""
+
+import random
+import statistics
+import subprocess
+import time
+from collections import defaultdict
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.contrib.sessions.backends.db import SessionStore
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from .models import Author, Book, Genre, Loan, Location, Review
+
+LOAN_STATUS_WEIGHTS = {'returned': 70, 'approved': 15, 'pending': 10, 'rejected': 5}
+RATING_WEIGHTS = (5, 10, 20, 35, 30)  # Rating 1..5
+# Kosakata deskripsi sintetis agar pencarian teks penuh punya hasil bervariasi
+WORDS = (
+    'sejarah', 'nusantara', 'algoritma', 'laut', 'kota', 'hujan', 'perang', 'cinta', 'sains',
+    'ekonomi', 'petualangan', 'misteri', 'gunung', 'bahasa', 'politik', 'musik', 'keluarga',
+    'teknologi', 'hutan', 'desa', 'filsafat', 'bintang', 'pasar', 'sungai',
+)
+
+
+# --- 1. Seed Data ---
+
+def seed_members(count, prefix='bench'):
+    """ID anggota yang baru dibuat saja (bukan user lain yang namanya berawalan sama)."""
+    password = make_password(None)
+    users = User.objects.bulk_create(
+        [User(username=f'{prefix}{i}', password=password) for i in range(count)],
+        batch_size=1000,
+    )
+    # PostgreSQL & SQLite >= 3.35 mengisi pk dari bulk_create (RETURNING)
+    return [user.pk for user in users]
+
+
+def seed_books(count, prefix='Bench'):
+    location = Location.objects.create(shelf_name=f'{prefix}-RAK', description='Rak benchmark')
+    Book.objects.bulk_create(
+        [
+            Book(title=f'{prefix} {i:06d}', description='-', publication_year=2000,
+                 stock=5, location=location)
+            for i in range(count)
+        ],
+        batch_size=1000,
+    )
+    return list(Book.objects.filter(location=location).values_list('pk', flat=True))
+
+
+def seed_catalogue(books, authors, genres, locations, prefix='Bench', seed=0, batch_size=2000):
+    """Katalog lengkap: penulis, genre, rak, lalu buku dengan 1-3 penulis dan 1-2 genre.
+
+    Baris tabel perantara M2M dibuat dengan ``bulk_create`` model ``through``.
+    Mengembalikan ID buku yang dibuat.
+    """
+    rng = random.Random(seed)
+    Author.objects.bulk_create([Author(name=f'{prefix} Penulis {i}') for i in range(authors)], batch_size=batch_size)
+    Genre.objects.bulk_create([Genre(name=f'{prefix} Genre {i}') for i in range(genres)], batch_size=batch_size)
+    Location.objects.bulk_create(
+        [Location(shelf_name=f'{prefix} Rak {i}', description='Rak benchmark') for i in range(locations)],
+        batch_size=batch_size,
+    )
+    author_ids = list(Author.objects.filter(name__startswith=f'{prefix} Penulis ').values_list('pk', flat=True))
+    genre_ids = list(Genre.objects.filter(name__startswith=f'{prefix} Genre ').values_list('pk', flat=True))
+    location_ids = list(Location.objects.filter(shelf_name__startswith=f'{prefix} Rak ').values_list('pk', flat=True))
+
+    book_ids = []
+    for start in range(0, books, batch_size):
+        batch = [
+            Book(
+                title=f'{prefix} {i:06d} {rng.choice(WORDS).title()}',
+                isbn=f'{i:013d}',
+                description=' '.join(rng.sample(WORDS, 6)),
+                publication_year=rng.randint(1950, 2025),
+                stock=rng.randint(0, 10),
+                location_id=rng.choice(location_ids) if location_ids else None,
+            )
+            for i in range(start, min(start + batch_size, books))
+        ]
+        created = Book.objects.bulk_create(batch)
+        Book.authors.through.objects.bulk_create([
+            Book.authors.through(book_id=book.pk, author_id=pk)
+            for book in created for pk in rng.sample(author_ids, min(len(author_ids), rng.randint(1, 3)))
+        ])
+        Book.genre.through.objects.bulk_create([
+            Book.genre.through(book_id=book.pk, genre_id=pk)
+            for book in created for pk in rng.sample(genre_ids, min(len(genre_ids), rng.randint(1, 2)))
+        ])
+        book_ids.extend(book.pk for book in created)
+    return book_ids
+
+
+def seed_reviews(count, member_ids, book_ids, seed=0, batch_size=2000):
+    """Review acak (unik per buku & anggota); agregat rating buku tidak diperbarui di sini."""
+    rng = random.Random(seed)
+    count = min(count, len(member_ids) * len(book_ids))
+    pairs = set()
+    while len(pairs) < count:
+        pairs.add((rng.choice(book_ids), rng.choice(member_ids)))
+    reviews = [
+        Review(book_id=book_id, user_id=user_id, rating=rng.choices(range(1, 6), RATING_WEIGHTS)[0],
+               comment=' '.join(rng.sample(WORDS, 8)))
+        for book_id, user_id in pairs
+    ]
+    Review.objects.bulk_create(reviews, batch_size=batch_size)
+
+
+def seed_loans(count, member_ids, book_ids, today=None, seed=0, batch_size=2000):
+    """Membuat ``count`` pinjaman acak dengan sebaran status mirip data produksi."""
+    today = today or date.today()
+    rng = random.Random(seed)
+    statuses = list(LOAN_STATUS_WEIGHTS)
+    weights = list(LOAN_STATUS_WEIGHTS.values())
+    batch = []
+    for _ in range(count):
+        status = rng.choices(statuses, weights)[0]
+        loan = Loan(member_id=rng.choice(member_ids), book_id=rng.choice(book_ids), status=status)
+        if status in ('approved', 'returned'):
+            loan.borrow_date = today - timedelta(days=rng.randint(0, 365))
+            loan.due_date = loan.borrow_date + timedelta(days=7)
+        if status == 'returned':
+            loan.return_date = loan.borrow_date + timedelta(days=rng.randint(1, 14))
+            late = (loan.return_date - loan.due_date).days
+            loan.fine_amount = loan.accrued_fine = max(late, 0) * Loan.FINE_PER_DAY
+            loan.is_paid = loan.fine_amount == 0 or rng.random() < 0.8
+        batch.append(loan)
+        if len(batch) >= batch_size:
+            Loan.objects.bulk_create(batch)
+            batch = []
+    if batch:
+        Loan.objects.bulk_create(batch)
+
+
+# --- 2. Pengukuran ---
+
+def login(client, user):
+    """Sesi login langsung di SessionStore (``client.login()`` memicu receiver yang butuh MessageMiddleware)."""
+    session = SessionStore()
+    session.update({
+        SESSION_KEY: str(user.pk), BACKEND_SESSION_KEY: 'django.contrib.auth.backends.ModelBackend',
+        HASH_SESSION_KEY: user.get_session_auth_hash(),
+    })
+    session.save()
+    client.cookies[settings.SESSION_COOKIE_NAME] = session.session_key
+
+
+def explain(sql, using=connection):
+    """Rencana eksekusi untuk SQL yang sudah di-interpolasi (dari ``captured_queries``)."""
+    prefix = 'EXPLAIN QUERY PLAN ' if using.vendor == 'sqlite' else 'EXPLAIN '
+    with using.cursor() as cursor:
+        cursor.execute(prefix + sql)
+        return [' '.join(str(col) for col in row) for row in cursor.fetchall()]
+
+
+def measure(func, repeat=20, using=connection, setup=None, plans=True):
+    """Menjalankan ``func`` berulang kali; mengembalikan waktu (ms), jumlah query & rencana query.
+
+    ``setup`` (mis. mengosongkan cache) dipanggil sebelum setiap run dan tidak ikut diukur.
+    """
+    timings = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+
+    if setup:
+        setup()
+    with CaptureQueriesContext(using) as ctx:
+        func()
+    timings.sort()
+    result = {
+        'p50_ms': round(statistics.median(timings), 3),
+        'p95_ms': round(timings[min(len(timings) - 1, int(len(timings) * 0.95))], 3),
+        'queries': len(ctx.captured_queries),
+    }
+    if plans:
+        result['plans'] = [explain(query['sql'], using) for query in ctx.captured_queries]
+    return result
+
+
+def git_commit():
+    """Commit yang sedang di-checkout (untuk laporan yang dibandingkan antar commit)."""
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR,
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def parse_importtime(text):
+    """Baris stderr ``python -X importtime`` -> ``[(kedalaman, modul, self_ms, kumulatif_ms), ...]``."""
+    rows = []
+    for line in text.splitlines():
+        if not line.startswith('import time:') or line.rstrip().endswith('imported package'):
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        rows.append((depth, name.strip(), int(self_us) / 1000, int(cumulative_us) / 1000))
+    return rows
+
+
+def import_cost_by_package(rows):
+    """Waktu impor (ms) per paket teratas, dari jumlah waktu *self* modul-modulnya."""
+    packages = defaultdict(float)
+    for _, name, self_ms, _ in rows:
+        packages[name.split('.')[0]] += self_ms
+    return dict(packages)
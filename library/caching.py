@@ -0,0 +1,190 @@
+# library/caching.py
+
+"""Cache berversi.
+
+Setiap namespace punya nomor versi di cache; kunci data menyertakan versi
+tersebut, jadi invalidasi cukup dengan menaikkan versinya (entri lama
+dibiarkan kedaluwarsa sendiri).
+
+Selain namespace biasa, setiap buku punya versi sendiri (``book:<id>``)
+yang dipakai fragmen & halaman ter-render; versi ``books`` menginvalidasi
+semua buku sekaligus (operasi massal) dan ``catalogue`` berubah setiap ada
+buku yang berubah (daftar buku).
+
+Untuk GET bersyarat, ``conditional_page`` menghitung ETag/Last-Modified
+dari stempel yang murah (``updated_at`` satu buku, atau versi ``catalogue``
+untuk daftar buku) sehingga revalidasi browser/CDN cukup dijawab 304 tanpa
+menjalankan view. Versi baru dimulai dari waktu sekarang, bukan 1, agar
+cache yang dikosongkan tidak mengulang nomor versi (dan ETag) lama.
+"""
+
+import hashlib
+import time
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date, parse_http_date_safe, quote_etag
+
+from .routing import primary_reads
+
+# Header validator yang ikut disimpan bersama halaman ter-cache
+VALIDATOR_HEADERS = ('ETag', 'Last-Modified', 'Cache-Control', 'Vary')
+
+
+def _new_version():
+    return time.time_ns() // 1000
+
+
+def get_version(namespace):
+    key = f'version:{namespace}'
+    version = cache.get(key)
+    if version is None:
+        version = _new_version()
+        cache.add(key, version, None)
+        version = cache.get(key, version)
+    return version
+
+
+def bump_version(namespace):
+    key = f'version:{namespace}'
+    try:
+        return cache.incr(key)
+    except ValueError:
+        # Versi belum ada (atau cache baru dikosongkan)
+        version = _new_version()
+        cache.set(key, version, None)
+        return version
+
+
+def versioned_key(namespace, *parts):
+    digest = hashlib.md5('|'.join(str(p) for p in parts).encode()).hexdigest()
+    return f'{namespace}:{get_version(namespace)}:{digest}'
+
+
+def get_versions(namespaces):
+    """Versi beberapa namespace sekaligus (satu ``get_many``)."""
+    keys = {f'version:{namespace}': namespace for namespace in namespaces}
+    found = cache.get_many(list(keys))
+    missing = [key for key in keys if key not in found]
+    if missing:
+        version = _new_version()
+        for key in missing:
+            cache.add(key, version, None)
+        found.update(dict.fromkeys(missing, version))
+        found.update(cache.get_many(missing))
+    return {namespace: found[key] for key, namespace in keys.items()}
+
+
+# --- Versi per Buku ---
+
+def book_versions(book_ids):
+    """``{book_id: 'versi'}`` untuk kunci fragmen; menyertakan versi global ``books``."""
+    versions = get_versions(['books', *[f'book:{pk}' for pk in book_ids]])
+    return {pk: f"{versions['books']}.{versions[f'book:{pk}']}" for pk in book_ids}
+
+
+def bump_books(book_ids=None):
+    """Menginvalidasi cache buku tertentu (``None`` = semua buku) setelah transaksi commit.
+
+    Dijalankan lewat ``on_commit`` agar request lain tidak sempat menyimpan
+    data lama dengan versi yang baru.
+    """
+    book_ids = None if book_ids is None else set(book_ids)
+
+    def bump():
+        for namespace in ['books'] if book_ids is None else [f'book:{pk}' for pk in book_ids]:
+            bump_version(namespace)
+        bump_version('catalogue')
+    if book_ids is None or book_ids:
+        transaction.on_commit(bump)
+
+
+# --- Cache Halaman Anonim ---
+
+def is_anonymous_request(request):
+    """Tanpa cookie sesi/pesan: halaman tidak punya bagian per-user dan tidak perlu DB."""
+    return (
+        request.method in ('GET', 'HEAD')
+        and settings.SESSION_COOKIE_NAME not in request.COOKIES
+        and 'messages' not in request.COOKIES
+    )
+
+
+def cache_anonymous_page(key_parts, timeout=None):
+    """Decorator view async: menyimpan respons utuh untuk pengunjung anonim.
+
+    ``key_parts(request, *args, **kwargs)`` (sinkron) mengembalikan bagian
+    kunci, termasuk versi data yang relevan. Pengunjung yang login atau punya
+    sesi selalu dilayani view aslinya.
+    """
+    def decorator(view):
+        @wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            if not is_anonymous_request(request):
+                return await view(request, *args, **kwargs)
+            parts = await sync_to_async(key_parts)(request, *args, **kwargs)
+            key = 'anon-page:' + hashlib.md5('|'.join(str(p) for p in parts).encode()).hexdigest()
+            cached = await cache.aget(key)
+            if cached is not None:
+                content, content_type, headers = cached
+                response = HttpResponse(content, content_type=content_type, headers=headers)
+                # Validator tersimpan milik konten yang sama: revalidasi tanpa query
+                return get_conditional_response(
+                    request, etag=headers.get('ETag'),
+                    last_modified=parse_http_date_safe(headers.get('Last-Modified', '')),
+                    response=response,
+                )
+
+            # Halaman akan disimpan dengan versi terbaru: render dari primary, bukan replika
+            with primary_reads():
+                response = await view(request, *args, **kwargs)
+            # Respons yang menulis cookie (mis. CSRF) bersifat per-user: tidak disimpan
+            if response.status_code == 200 and not response.streaming and not response.cookies:
+                headers = {name: response[name] for name in VALIDATOR_HEADERS if response.has_header(name)}
+                await cache.aset(
+                    key, (response.content, response['Content-Type'], headers),
+                    settings.PAGE_CACHE_TIMEOUT if timeout is None else timeout,
+                )
+            return response
+        return wrapper
+    return decorator
+
+
+def conditional_page(validators):
+    """Decorator view async: ETag/Last-Modified untuk pengunjung anonim.
+
+    ``validators(request, *args, **kwargs)`` (sinkron, dijalankan di thread)
+    mengembalikan ``(etag, last_modified)`` dari stempel yang murah, bukan
+    dari query halaman. Pengganti ``django.views.decorators.http.condition``
+    yang memanggil fungsi validatornya secara sinkron di event loop. Pasang
+    di bawah ``cache_anonymous_page`` agar header ikut tersimpan.
+    """
+    def decorator(view):
+        @wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            if not is_anonymous_request(request):
+                return await view(request, *args, **kwargs)
+            etag, last_modified = await sync_to_async(validators)(request, *args, **kwargs)
+            etag = quote_etag(etag) if etag else None
+            timestamp = int(last_modified.timestamp()) if last_modified else None
+
+            response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+            if response is None:
+                response = await view(request, *args, **kwargs)
+                if response.status_code != 200:
+                    return response
+                if etag:
+                    response.headers.setdefault('ETag', etag)
+                if timestamp and not response.has_header('Last-Modified'):
+                    response.headers['Last-Modified'] = http_date(timestamp)
+            # Boleh disimpan browser/CDN, tetapi selalu divalidasi ulang (stok bisa berubah)
+            patch_cache_control(response, max_age=0, must_revalidate=True)
+            patch_vary_headers(response, ['Cookie'])
+            return response
+        return wrapper
+    return decorator
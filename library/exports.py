@@ -0,0 +1,330 @@
+# library/exports.py
+
+"""Ekspor CSV/XLSX dari changelist admin secara streaming.
+
+Baris dibaca dengan ``iterator(chunk_size=...)`` (server-side cursor di
+PostgreSQL) dan langsung ditulis ke ``StreamingHttpResponse``, jadi memori
+tetap konstan berapa pun jumlah barisnya. Di belakang pgbouncer mode
+transaksi (``DISABLE_SERVER_SIDE_CURSORS``) ``iterator()`` akan memuat
+seluruh hasil ke memori, jadi ``iterate`` membaca per potongan pk (lihat di
+bawah). XLSX ditulis sebagai zip
+streaming (tanpa seek) berisi XML sheet minimal; lebih dari batas baris
+Excel otomatis dipecah ke sheet berikutnya.
+"""
+
+import csv
+import re
+import zipfile
+from datetime import date, datetime
+from decimal import Decimal
+from itertools import islice
+from xml.sax.saxutils import escape
+
+from asgiref.sync import sync_to_async
+from django.core.exceptions import FieldDoesNotExist, ImproperlyConfigured, PermissionDenied
+from django.core.handlers.asgi import ASGIRequest
+from django.db import connections, router
+from django.db.models import Q
+from django.http import Http404, StreamingHttpResponse
+from django.urls import path
+from django.utils import timezone
+
+EXPORT_CHUNK_SIZE = 2000
+XLSX_MAX_ROWS = 1048575  # Batas Excel 1.048.576 baris per sheet, dikurangi header
+FLUSH_EVERY = 500
+
+
+def iterate(queryset, chunk_size=EXPORT_CHUNK_SIZE):
+    """Baris ``queryset`` per potongan; urutan harus total (changelist admin selalu menambah pk).
+
+    Tanpa server-side cursor (pooler mode transaksi) potongan dibaca dengan
+    keyset: kunci urutan ``chunk_size`` baris berikutnya setelah baris
+    terakhir, lalu barisnya lewat ``pk IN (...)`` dengan ORDER BY yang sama.
+    Memori konstan dan tanpa OFFSET; baris yang dibuat selama ekspor tidak
+    menggeser potongan berikutnya. Keyset hanya dipakai jika urutan terdiri
+    dari kolom model yang tidak nullable dan diakhiri pk (lihat
+    ``_keyset_ordering``). Urutan lain (ekspresi, kolom relasi/nullable dari
+    klik kolom admin) memakai daftar pk yang diambil sekali di awal, jadi
+    memorinya linear terhadap jumlah baris.
+    """
+    if not connections[queryset.db].settings_dict.get('DISABLE_SERVER_SIDE_CURSORS'):
+        yield from queryset.iterator(chunk_size=chunk_size)
+        return
+    keys = _keyset_ordering(queryset)
+    if keys is None:
+        pks = list(queryset.values_list('pk', flat=True))
+        for start in range(0, len(pks), chunk_size):
+            yield from queryset.filter(pk__in=pks[start:start + chunk_size])
+        return
+    page = queryset.values_list(*[name for name, _ in keys])
+    last = None
+    while True:
+        rows = list((page if last is None else page.filter(_after(keys, last)))[:chunk_size])
+        if not rows:
+            return
+        yield from queryset.filter(pk__in=[row[-1] for row in rows])
+        if len(rows) < chunk_size:
+            return
+        last = rows[-1]
+
+
+def _keyset_ordering(queryset):
+    """``[(kolom, menurun), ...]`` jika urutan ``queryset`` bisa dipaginasi keyset, selain itu ``None``."""
+    opts = queryset.model._meta
+    query = queryset.query
+    ordering = query.order_by or (query.default_ordering and opts.ordering) or ()
+    keys = []
+    for item in ordering:
+        if not isinstance(item, str) or item == '?':
+            return None
+        name = item.lstrip('-')
+        try:
+            field = opts.pk if name == 'pk' else opts.get_field(name)
+        except FieldDoesNotExist:
+            return None
+        # Relasi diurutkan lewat ordering model tujuannya; NULL tidak bisa dibandingkan
+        if not field.concrete or field.null or (field.is_relation and name != field.attname):
+            return None
+        keys.append(('pk' if field.primary_key else name, item.startswith('-')))
+    return keys if keys and keys[-1][0] == 'pk' else None
+
+
+def _after(keys, values):
+    """Kondisi "setelah ``values``" untuk urutan ``keys`` (perbandingan leksikografis)."""
+    condition = Q()
+    for i, (name, descending) in enumerate(keys):
+        step = Q(**{f"{name}__{'lt' if descending else 'gt'}": values[i]})
+        for (previous, _), value in zip(keys[:i], values):
+            step &= Q(**{previous: value})
+        condition |= step
+    return condition
+
+
+# --- 1. CSV ---
+
+class _Echo:
+    """Pseudo-buffer untuk csv.writer: writerow() mengembalikan barisnya."""
+
+    def write(self, value):
+        return value
+
+
+def _csv_value(value):
+    if value is None:
+        return ''
+    if isinstance(value, bool):
+        return 'Ya' if value else 'Tidak'
+    if isinstance(value, str) and len(value) > 1 and value[0] in ('=', '+', '-', '@'):
+        # Mencegah teks dari pengguna dijalankan sebagai formula spreadsheet
+        return "'" + value
+    return value
+
+
+def csv_stream(header, rows):
+    writer = csv.writer(_Echo())
+    yield '\ufeff'.encode()  # BOM agar Excel membaca UTF-8
+    yield writer.writerow(header).encode()
+    lines = []
+    for row in rows:
+        lines.append(writer.writerow([_csv_value(value) for value in row]))
+        if len(lines) >= FLUSH_EVERY:
+            yield ''.join(lines).encode()
+            lines = []
+    if lines:
+        yield ''.join(lines).encode()
+
+
+# --- 2. XLSX ---
+
+class _ZipSink:
+    """Tujuan tulis ZipFile tanpa ``seek``: byte yang ditulis diambil lewat ``drain``."""
+
+    def __init__(self):
+        self._chunks = []
+        self._offset = 0
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._offset += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._offset
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+_ILLEGAL_XML = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+_EXCEL_EPOCH = date(1899, 12, 30)
+
+_CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '<Override PartName="/xl/styles.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+    '{sheets}</Types>'
+)
+_SHEET_CONTENT_TYPE = (
+    '<Override PartName="/xl/worksheets/sheet{n}.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+)
+_ROOT_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+    'Target="xl/workbook.xml"/></Relationships>'
+)
+_WORKBOOK = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+    'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+    '<sheets>{sheets}</sheets></workbook>'
+)
+_WORKBOOK_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '{sheets}<Relationship Id="rIdStyles" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" '
+    'Target="styles.xml"/></Relationships>'
+)
+# Gaya 1 = format tanggal bawaan Excel (numFmtId 14)
+_STYLES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+    '<fonts count="1"><font><sz val="11"/><name val="Calibri"/></font></fonts>'
+    '<fills count="1"><fill><patternFill patternType="none"/></fill></fills>'
+    '<borders count="1"><border/></borders>'
+    '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+    '<cellXfs count="2"><xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>'
+    '<xf numFmtId="14" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/></cellXfs>'
+    '</styleSheet>'
+)
+_SHEET_HEAD = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+)
+_SHEET_TAIL = '</sheetData></worksheet>'
+
+
+def _xlsx_cell(value):
+    if value is None:
+        return '<c/>'
+    if isinstance(value, bool):
+        return f'<c t="b"><v>{int(value)}</v></c>'
+    if isinstance(value, (int, float, Decimal)):
+        return f'<c><v>{value}</v></c>'
+    if isinstance(value, datetime):
+        value = timezone.localtime(value).date() if timezone.is_aware(value) else value.date()
+    if isinstance(value, date):
+        return f'<c s="1"><v>{(value - _EXCEL_EPOCH).days}</v></c>'
+    text = escape(_ILLEGAL_XML.sub('', str(value)))
+    return f'<c t="inlineStr"><is><t xml:space="preserve">{text}</t></is></c>'
+
+
+def _xlsx_row(number, values):
+    return f'<row r="{number}">{"".join(_xlsx_cell(value) for value in values)}</row>'.encode()
+
+
+def xlsx_stream(header, rows, title='Data'):
+    sink = _ZipSink()
+    rows = iter(rows)
+    sheets = 0
+    with zipfile.ZipFile(sink, 'w', zipfile.ZIP_DEFLATED) as archive:
+        while True:
+            sheets += 1
+            written = 0
+            with archive.open(f'xl/worksheets/sheet{sheets}.xml', 'w') as sheet:
+                sheet.write(_SHEET_HEAD.encode())
+                sheet.write(_xlsx_row(1, header))
+                for written, row in enumerate(islice(rows, XLSX_MAX_ROWS), start=1):
+                    sheet.write(_xlsx_row(written + 1, row))
+                    if written % FLUSH_EVERY == 0:
+                        yield sink.drain()
+                sheet.write(_SHEET_TAIL.encode())
+            yield sink.drain()
+            if written < XLSX_MAX_ROWS:
+                break
+
+        numbers = range(1, sheets + 1)
+        names = [escape(title[:28]) + (f' {n}' if sheets > 1 else '') for n in numbers]
+        archive.writestr('[Content_Types].xml', _CONTENT_TYPES.format(
+            sheets=''.join(_SHEET_CONTENT_TYPE.format(n=n) for n in numbers)))
+        archive.writestr('_rels/.rels', _ROOT_RELS)
+        archive.writestr('xl/workbook.xml', _WORKBOOK.format(sheets=''.join(
+            f'<sheet name="{name}" sheetId="{n}" r:id="rId{n}"/>' for n, name in zip(numbers, names))))
+        archive.writestr('xl/_rels/workbook.xml.rels', _WORKBOOK_RELS.format(sheets=''.join(
+            f'<Relationship Id="rId{n}" '
+            f'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+            f'Target="worksheets/sheet{n}.xml"/>' for n in numbers)))
+        archive.writestr('xl/styles.xml', _STYLES)
+    yield sink.drain()
+
+
+FORMATS = {
+    'csv': (csv_stream, 'text/csv; charset=utf-8'),
+    'xlsx': (xlsx_stream, 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'),
+}
+
+
+# --- 3. Admin ---
+
+async def _aiterate(chunks):
+    # Di ASGI, iterator sinkron akan dikumpulkan seluruhnya oleh Django sebelum dikirim.
+    # Setiap potongan diambil di thread sinkron yang sama (cursor database ikut thread itu).
+    next_chunk = sync_to_async(next)
+    while True:
+        chunk = await next_chunk(chunks, None)
+        if chunk is None:
+            return
+        yield chunk
+
+
+class StreamingExportMixin:
+    """Tombol "Ekspor CSV/XLSX" di changelist; mengikuti filter & pencarian yang sedang aktif.
+
+    Subclass wajib mengisi ``export_header`` dan ``export_rows(queryset)``;
+    keduanya diperiksa saat URL admin dibangun.
+    """
+
+    change_list_template = 'admin/export_change_list.html'
+    export_header = ()
+
+    def get_urls(self):
+        if not self.export_header or not callable(getattr(self, 'export_rows', None)):
+            raise ImproperlyConfigured(
+                f"{type(self).__name__} harus mendefinisikan export_header dan export_rows(queryset)."
+            )
+        opts = self.model._meta
+        return [
+            path('export/<str:fmt>/', self.admin_site.admin_view(self.export_view),
+                 name=f'{opts.app_label}_{opts.model_name}_export'),
+        ] + super().get_urls()
+
+    def export_view(self, request, fmt):
+        if fmt not in FORMATS:
+            raise Http404
+        if not self.has_view_or_change_permission(request):
+            raise PermissionDenied
+        # Queryset changelist yang sama (list_filter, search, urutan) tanpa pagination
+        queryset = self.get_changelist_instance(request).queryset
+        # Baris dibaca setelah view selesai: database (replika/primary) dipilih sekarang
+        queryset = queryset.using(router.db_for_read(self.model))
+        write, content_type = FORMATS[fmt]
+        chunks = write(self.export_header, self.export_rows(queryset))
+        if isinstance(request, ASGIRequest):
+            chunks = _aiterate(chunks)
+        response = StreamingHttpResponse(chunks, content_type=content_type)
+        filename = f'{self.model._meta.model_name}-{timezone.localdate():%Y%m%d}.{fmt}'
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
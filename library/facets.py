@@ -0,0 +1,88 @@
+# library/facets.py
+
+"""Facet filter katalog (genre, penulis, lokasi) beserta jumlah bukunya.
+
+Jumlah per facet dihitung terhadap hasil pencarian dengan semua filter
+*lain* diterapkan, sehingga pilihan di dropdown tetap lengkap walaupun
+salah satu filter sedang aktif. Hasil disimpan di cache berversi
+``facets`` yang dinaikkan setiap Genre/Author/Location/Book berubah.
+"""
+
+from django.core.cache import cache
+from django.db.models import Count
+
+from .caching import versioned_key
+from .models import Author, Book, Location
+from .routing import primary_reads
+
+FACET_CACHE_TIMEOUT = 300  # detik
+TOP_AUTHORS = 20
+AUTHOR_LOOKUP_LIMIT = 10
+
+
+def _scope(books, filters, dimension):
+    others = [q for name, q in filters.items() if name != dimension]
+    return books.filter(*others).order_by().values('pk')
+
+
+def _compute(books, filters):
+    genres = (
+        Book.genre.through.objects
+        .filter(book__in=_scope(books, filters, 'genre'))
+        .values_list('genre_id', 'genre__name')
+        .annotate(count=Count('book_id'))
+        .order_by('genre__name')
+    )
+    authors = (
+        Book.authors.through.objects
+        .filter(book__in=_scope(books, filters, 'author'))
+        .values_list('author_id', 'author__name')
+        .annotate(count=Count('book_id'))
+        .order_by('-count', 'author__name')[:TOP_AUTHORS]
+    )
+    locations = (
+        Location.objects
+        .filter(books__in=_scope(books, filters, 'location'))
+        .values('id', 'shelf_name', 'description')
+        .annotate(count=Count('books'))
+        .order_by('shelf_name')
+    )
+    return {
+        'genres': [{'id': pk, 'name': name, 'count': count} for pk, name, count in genres],
+        'authors': [{'id': pk, 'name': name, 'count': count} for pk, name, count in authors],
+        'locations': list(locations),
+    }
+
+
+def get_facets(books, filters, cache_parts):
+    """Mengembalikan dict ``genres``/``authors``/``locations`` (id, nama, count).
+
+    ``books`` adalah queryset sebelum filter facet, ``filters`` berisi
+    ``{'genre'|'author'|'location': Q(...)}``, dan ``cache_parts`` adalah
+    parameter request yang menentukan hasil (untuk kunci cache).
+    """
+    key = versioned_key('facets', *cache_parts)
+    facets = cache.get(key)
+    if facets is None:
+        # Disimpan dengan versi terbaru: dihitung dari primary, bukan replika
+        with primary_reads():
+            facets = _compute(books, filters)
+        cache.set(key, facets, FACET_CACHE_TIMEOUT)
+    return facets
+
+
+def lookup_authors(term, limit=AUTHOR_LOOKUP_LIMIT):
+    """Pencarian nama penulis untuk typeahead."""
+    term = (term or '').strip()
+    if not term:
+        return []
+    key = versioned_key('facets', 'author-lookup', term.lower(), limit)
+    results = cache.get(key)
+    if results is None:
+        with primary_reads():
+            results = list(
+                Author.objects.filter(name__icontains=term)
+                .order_by('name').values('id', 'name')[:limit]
+            )
+        cache.set(key, results, FACET_CACHE_TIMEOUT)
+    return results
@@ -0,0 +1,28 @@
+# library/functions.py
+
+"""Fungsi database kustom yang dipakai untuk perhitungan di sisi SQL."""
+
+from django.db.models import Func, IntegerField
+
+
+class DaysBetween(Func):
+    """Selisih hari ``end - start`` antara dua nilai DATE, sebagai integer."""
+
+    arity = 2
+    output_field = IntegerField()
+    template = '(%(expressions)s)'
+    arg_joiner = ' - '  # PostgreSQL: date - date = integer
+
+    def __init__(self, end, start, **extra):
+        super().__init__(end, start, **extra)
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        return self.as_sql(
+            compiler, connection,
+            template='CAST(julianday(%(expressions)s) AS INTEGER)',
+            arg_joiner=') - julianday(',
+            **extra_context,
+        )
+
+    def as_mysql(self, compiler, connection, **extra_context):
+        return self.as_sql(compiler, connection, template='DATEDIFF(%(expressions)s)', arg_joiner=', ', **extra_context)
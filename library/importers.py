@@ -0,0 +1,306 @@
+# library/importers.py
+
+"""Impor katalog massal (CSV, JSON Lines, MARC 21 / ISO 2709).
+
+Pembaca format menghasilkan dict rekaman satu per satu (streaming), lalu
+``CatalogueImporter`` menulisnya per batch:
+
+* Author/Genre/Location dicari lewat nama (natural key) di cache memori;
+  nama baru dibuat dengan ``bulk_create(ignore_conflicts=True)``;
+* Book dibuat dengan ``bulk_create``; baris tabel perantara M2M (penulis,
+  genre) ditulis dengan ``executemany`` tanpa membuat instance model;
+* indeks pencarian diperbarui per batch, cache facet/halaman diinvalidasi
+  setelah batch commit.
+
+``bulk_create`` tidak memicu signal, jadi semua sinkronisasi di atas
+dilakukan di sini secara eksplisit.
+"""
+
+import csv
+import io
+import json
+import logging
+import re
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from . import search
+from .caching import bump_books, bump_version
+from .models import Author, Book, BookImport, Genre, Location
+
+FORMATS = ('csv', 'jsonl', 'marc')
+EXTENSIONS = {'.csv': 'csv', '.jsonl': 'jsonl', '.ndjson': 'jsonl', '.mrc': 'marc', '.marc': 'marc'}
+
+logger = logging.getLogger(__name__)
+
+
+class ImportRecordError(ValueError):
+    """Rekaman tidak bisa dijadikan buku (dilewati dan dihitung)."""
+
+
+# --- 1. Pembaca Format ---
+
+def read_csv(stream, separator=';'):
+    """Kolom: title, isbn, description, publication_year, stock, authors, genres, location.
+
+    ``authors`` dan ``genres`` boleh berisi beberapa nama dipisah ``separator``.
+    """
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    for row in csv.DictReader(text):
+        row['authors'] = _split(row.get('authors'), separator)
+        row['genres'] = _split(row.get('genres'), separator)
+        yield row
+
+
+def read_jsonl(stream):
+    """Satu objek JSON per baris; ``authors``/``genres`` berupa list atau string.
+
+    Baris yang bukan objek JSON valid menjadi rekaman ``error`` (dilewati).
+    """
+    for number, line in enumerate(io.TextIOWrapper(stream, encoding='utf-8'), start=1):
+        if line.strip():
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError as exc:
+                yield {'error': f"Baris {number}: JSON tidak valid ({exc.msg})"}
+                continue
+            if not isinstance(record, dict):
+                yield {'error': f"Baris {number}: bukan objek JSON"}
+                continue
+            for key in ('authors', 'genres'):
+                if isinstance(record.get(key), str):
+                    record[key] = _split(record[key], ';')
+            yield record
+
+
+def _split(value, separator):
+    return [part.strip() for part in (value or '').split(separator) if part.strip()]
+
+
+def _text(value):
+    # Nilai JSON bisa berupa angka (mis. ISBN tanpa tanda kutip)
+    return '' if value is None else str(value).strip()
+
+
+# MARC 21 (ISO 2709): leader 24 byte, direktori entri 12 byte, lalu field
+FIELD_TERMINATOR = b'\x1e'
+RECORD_TERMINATOR = b'\x1d'
+SUBFIELD_DELIMITER = b'\x1f'
+_YEAR_RE = re.compile(r'\d{4}')
+_ISBN_RE = re.compile(r'[0-9Xx]{10,13}')
+
+
+def read_marc(stream):
+    """Parser MARC 21 minimal: hanya field yang dipakai katalog ini.
+
+    020$a ISBN, 100/700$a penulis, 245$a$b judul, 260/264$c tahun terbit,
+    520$a deskripsi, 650/655$a genre, 852$c atau $h lokasi rak. Hanya
+    rekaman UTF-8 (leader/09 = 'a') yang didekode dengan benar; MARC-8
+    dibaca sebagai Latin-1.
+    """
+    while True:
+        length = stream.read(5)
+        if not length or not length.strip():
+            return
+        try:
+            record = length + stream.read(int(length) - 5)
+        except ValueError:
+            raise ImportRecordError(f"Panjang rekaman MARC tidak valid: {length!r}")
+        try:
+            yield _parse_marc(record)
+        except (ValueError, IndexError) as exc:
+            # Rekaman rusak tetap dihitung agar posisi resume tidak bergeser
+            yield {'error': f"Rekaman MARC rusak: {exc}"}
+
+
+def _parse_marc(record):
+    leader = record[:24]
+    encoding = 'utf-8' if leader[9:10] == b'a' else 'latin-1'
+    base = int(leader[12:17])
+    directory = record[24:record.index(FIELD_TERMINATOR)]
+    fields = {}
+    for offset in range(0, len(directory) - 11, 12):
+        entry = directory[offset:offset + 12]
+        tag, size, start = entry[:3].decode(), int(entry[3:7]), int(entry[7:12])
+        data = record[base + start:base + start + size].rstrip(FIELD_TERMINATOR + RECORD_TERMINATOR)
+        if tag < '010':
+            continue  # Control field tidak dipakai
+        subfields = {}
+        for chunk in data.split(SUBFIELD_DELIMITER)[1:]:
+            if chunk:
+                code = chunk[:1].decode('ascii', 'replace')
+                subfields.setdefault(code, []).append(chunk[1:].decode(encoding, 'replace'))
+        fields.setdefault(tag, []).append(subfields)
+
+    def first(tags, code):
+        for tag in tags:
+            for subfields in fields.get(tag, []):
+                if subfields.get(code):
+                    return _clean(subfields[code][0])
+        return ''
+
+    def every(tags, code):
+        return [_clean(value) for tag in tags for subfields in fields.get(tag, []) for value in subfields.get(code, [])]
+
+    isbn = _ISBN_RE.search(first(['020'], 'a').replace('-', ''))
+    year = _YEAR_RE.search(first(['260', '264'], 'c'))
+    title = ' '.join(part for part in (first(['245'], 'a'), first(['245'], 'b')) if part)
+    return {
+        'title': title,
+        'isbn': isbn.group() if isbn else '',
+        'description': first(['520'], 'a'),
+        'publication_year': year.group() if year else '',
+        'authors': every(['100', '700'], 'a'),
+        'genres': every(['650', '655'], 'a'),
+        'location': first(['852'], 'c') or first(['852'], 'h'),
+    }
+
+
+def _clean(value):
+    # Tanda baca ISBD di akhir subfield ("Judul /", "Penulis,", "2001.")
+    return value.strip().rstrip(' /:;,.=').strip()
+
+
+READERS = {'csv': read_csv, 'jsonl': read_jsonl, 'marc': read_marc}
+
+
+# --- 2. Penulisan Batch ---
+
+class NameCache:
+    """Peta nama -> ID untuk satu model ber-natural-key (dimuat bertahap)."""
+
+    def __init__(self, model, field, max_length):
+        self.model = model
+        self.field = field
+        self.max_length = max_length
+        self.ids = {}
+
+    def normalize(self, name):
+        return _text(name)[:self.max_length]
+
+    def resolve(self, names):
+        """Memastikan semua ``names`` punya ID (query hanya untuk nama yang belum dikenal)."""
+        missing = {self.normalize(name) for name in names} - self.ids.keys() - {''}
+        if not missing:
+            return
+        self.ids.update(self.model.objects.filter(**{f'{self.field}__in': missing}).values_list(self.field, 'pk'))
+        new = missing - self.ids.keys()
+        if new:
+            # ignore_conflicts: aman jika proses lain membuat nama yang sama bersamaan
+            self.model.objects.bulk_create([self.model(**{self.field: name}) for name in new], ignore_conflicts=True)
+            self.ids.update(self.model.objects.filter(**{f'{self.field}__in': new}).values_list(self.field, 'pk'))
+
+    def get(self, name):
+        return self.ids.get(self.normalize(name))
+
+
+class CatalogueImporter:
+    def __init__(self, batch_size=1000):
+        self.batch_size = batch_size
+        self.authors = NameCache(Author, 'name', Author._meta.get_field('name').max_length)
+        self.genres = NameCache(Genre, 'name', Genre._meta.get_field('name').max_length)
+        self.locations = NameCache(Location, 'shelf_name', Location._meta.get_field('shelf_name').max_length)
+
+    def run(self, records, checkpoint, progress=None):
+        """Mengimpor ``records`` mulai dari ``checkpoint.position`` (rekaman sebelumnya dilewati)."""
+        for _ in range(checkpoint.position):
+            if next(records, None) is None:
+                break
+        batch = []
+        for record in records:
+            batch.append(record)
+            if len(batch) >= self.batch_size:
+                self.write_batch(batch, checkpoint)
+                batch = []
+                if progress:
+                    progress(checkpoint)
+        if batch:
+            self.write_batch(batch, checkpoint)
+            if progress:
+                progress(checkpoint)
+
+    def write_batch(self, records, checkpoint):
+        books, skipped = [], 0
+        for record in records:
+            try:
+                books.append((self.build_book(record), record))
+            except ImportRecordError as exc:
+                logger.warning("Rekaman dilewati: %s", exc)
+                skipped += 1
+
+        with transaction.atomic():
+            self.authors.resolve(name for _, record in books for name in record.get('authors') or [])
+            self.genres.resolve(name for _, record in books for name in record.get('genres') or [])
+            self.locations.resolve(record.get('location') for _, record in books)
+            for book, record in books:
+                book.location_id = self.locations.get(record.get('location'))
+
+            created = Book.objects.bulk_create([book for book, _ in books])
+            self.link(Book.authors.through, 'author_id', self.authors, 'authors', books)
+            self.link(Book.genre.through, 'genre_id', self.genres, 'genres', books)
+            # Dokumen dirakit dari rekaman, tanpa membaca ulang buku & relasinya
+            search.index_documents((book.pk, self.document(book, record)) for book, record in books)
+
+            checkpoint.position += len(records)
+            checkpoint.created_books += len(created)
+            checkpoint.skipped += skipped
+            checkpoint.save()
+            if created:
+                bump_books()
+                transaction.on_commit(lambda: bump_version('facets'))
+
+    def build_book(self, record):
+        if record.get('error'):
+            raise ImportRecordError(record['error'])
+        title = _text(record.get('title'))
+        try:
+            year = int(_text(record.get('publication_year')))
+        except ValueError:
+            raise ImportRecordError("Tahun terbit tidak valid")
+        if not title:
+            raise ImportRecordError("Judul kosong")
+        try:
+            stock = max(0, int(record.get('stock') or 0))
+        except (TypeError, ValueError):
+            stock = 0
+        return Book(
+            title=title[:200],
+            isbn=_text(record.get('isbn'))[:13] or '-',
+            description=_text(record.get('description')),
+            publication_year=year,
+            stock=stock,
+        )
+
+    def link(self, through, column, names, key, books):
+        """Baris tabel perantara M2M; ditulis dengan ``executemany`` tanpa membuat instance model."""
+        rows = []
+        for book, record in books:
+            ids = {names.get(name) for name in record.get(key) or []} - {None}
+            rows.extend((book.pk, pk) for pk in ids)
+        if not rows:
+            return
+        table = connection.ops.quote_name(through._meta.db_table)
+        sql = f"INSERT INTO {table} (book_id, {connection.ops.quote_name(column)}) VALUES (%s, %s)"
+        with connection.cursor() as cursor:
+            for start in range(0, len(rows), self.batch_size):
+                cursor.executemany(sql, rows[start:start + self.batch_size])
+
+    def document(self, book, record):
+        return {
+            'title': book.title,
+            'isbn': book.isbn,
+            'authors': ' '.join(name for name in record.get('authors') or [] if self.authors.get(name)),
+            'genres': ' '.join(name for name in record.get('genres') or [] if self.genres.get(name)),
+            'description': book.description,
+        }
+
+
+def import_file(path, fmt, checkpoint, batch_size=1000, progress=None, **reader_options):
+    """Mengimpor satu file mulai dari ``checkpoint.position`` (``BookImport``)."""
+    with open(path, 'rb') as stream:
+        records = iter(READERS[fmt](stream, **reader_options))
+        CatalogueImporter(batch_size).run(records, checkpoint, progress)
+    checkpoint.finished_at = timezone.now()
+    checkpoint.save()
+    return checkpoint
@@ -0,0 +1,248 @@
+# library/instrumentation.py
+
+"""Instrumentasi request: jumlah & waktu query SQL, query duplikat (indikasi
+N+1), waktu render template dan ukuran respons.
+
+* ``InstrumentationMiddleware`` memilih sampel request
+  (``INSTRUMENTATION_SAMPLE_RATE``), mengisi header ``Server-Timing`` dan
+  mencatat ringkasan per nama URL di memori proses ini
+  (``metrics.snapshot()``, endpoint staf ``request_metrics``).
+* Query dihitung lewat ``connection.execute_wrapper`` yang dipasang di
+  setiap koneksi baru (signal ``connection_created``). Request aktif dibawa
+  ``ContextVar`` sehingga query di thread ``sync_to_async`` milik view async
+  ikut tercatat; request yang tidak disampel hanya membayar satu pembacaan
+  ContextVar per query.
+* Waktu template diukur oleh backend ``InstrumentedTemplates`` (hanya
+  render tingkat atas; query yang dievaluasi di template ikut terhitung di
+  keduanya).
+"""
+
+import logging
+import random
+import threading
+import time
+from collections import Counter, deque
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.template.backends.django import DjangoTemplates, Template
+
+logger = logging.getLogger(__name__)
+
+# Batas atas bucket histogram durasi request (ms); bucket terakhir tak terbatas
+DURATION_BUCKETS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+# Statement SQL yang sama (tanpa parameter) dijalankan sebanyak ini = dicurigai N+1
+DUPLICATE_THRESHOLD = 5
+
+_current = ContextVar('request_metrics', default=None)
+
+
+class RequestMetrics:
+    __slots__ = ('started', 'queries', 'sql_ms', 'template_ms', 'statements')
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.sql_ms = 0.0
+        self.template_ms = 0.0
+        self.statements = Counter()
+
+    def duplicates(self):
+        """``[(sql, jumlah), ...]`` untuk statement yang berulang melewati ambang."""
+        return [(sql, count) for sql, count in self.statements.most_common() if count >= DUPLICATE_THRESHOLD]
+
+
+# --- 1. Pengumpul Data ---
+
+def record_query(execute, sql, params, many, context):
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.sql_ms += (time.perf_counter() - start) * 1000
+        metrics.queries += 1
+        metrics.statements[sql] += 1
+
+
+def _install(connection):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+@receiver(connection_created)
+def instrument_connection(sender, connection, **kwargs):
+    _install(connection)
+
+
+class InstrumentedTemplate(Template):
+    def render(self, context=None, request=None):
+        metrics = _current.get()
+        if metrics is None:
+            return super().render(context, request)
+        start = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            metrics.template_ms += (time.perf_counter() - start) * 1000
+
+
+class InstrumentedTemplates(DjangoTemplates):
+    """Backend ``DjangoTemplates`` yang mengukur waktu render tingkat atas."""
+
+    def from_string(self, template_code):
+        return InstrumentedTemplate(super().from_string(template_code).template, self)
+
+    def get_template(self, template_name):
+        return InstrumentedTemplate(super().get_template(template_name).template, self)
+
+
+# --- 2. Agregasi per Nama URL ---
+
+class ViewStats:
+    def __init__(self, size):
+        self.count = 0
+        self.histogram = [0] * (len(DURATION_BUCKETS) + 1)
+        self.durations = deque(maxlen=size)
+        self.queries = deque(maxlen=size)
+        self.sql_ms = deque(maxlen=size)
+        self.template_ms = deque(maxlen=size)
+        self.bytes = deque(maxlen=size)
+        self.duplicate_requests = 0
+        self.over_budget = 0
+        self.worst_duplicate = None
+
+    def snapshot(self):
+        def percentile(samples, p):
+            samples = sorted(samples)
+            return round(samples[min(len(samples) - 1, int(len(samples) * p))], 1) if samples else None
+
+        def summary(samples):
+            return {'p50': percentile(samples, 0.50), 'p95': percentile(samples, 0.95)}
+        labels = [f'<={bound}ms' for bound in DURATION_BUCKETS] + [f'>{DURATION_BUCKETS[-1]}ms']
+        return {
+            'requests': self.count,
+            'histogram_ms': dict(zip(labels, self.histogram)),
+            'duration_ms': summary(self.durations),
+            'queries': summary(self.queries),
+            'sql_ms': summary(self.sql_ms),
+            'template_ms': summary(self.template_ms),
+            'response_bytes': summary(self.bytes),
+            'duplicate_requests': self.duplicate_requests,
+            'over_budget': self.over_budget,
+            'worst_duplicate': self.worst_duplicate,
+        }
+
+
+class MetricsRegistry:
+    def __init__(self, size=500):
+        self.size = size
+        self._lock = threading.Lock()
+        self._views = {}
+
+    def record(self, name, metrics, duration_ms, size, budget):
+        duplicates = metrics.duplicates()
+        with self._lock:
+            stats = self._views.get(name)
+            if stats is None:
+                stats = self._views[name] = ViewStats(self.size)
+            stats.count += 1
+            stats.histogram[sum(duration_ms > bound for bound in DURATION_BUCKETS)] += 1
+            stats.durations.append(duration_ms)
+            stats.queries.append(metrics.queries)
+            stats.sql_ms.append(metrics.sql_ms)
+            stats.template_ms.append(metrics.template_ms)
+            if size is not None:
+                stats.bytes.append(size)
+            if duplicates:
+                stats.duplicate_requests += 1
+                sql, count = duplicates[0]
+                if stats.worst_duplicate is None or count > stats.worst_duplicate['count']:
+                    stats.worst_duplicate = {'sql': sql[:300], 'count': count}
+            if budget is not None and metrics.queries > budget:
+                stats.over_budget += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {name: stats.snapshot() for name, stats in sorted(self._views.items())}
+
+    def reset(self):
+        with self._lock:
+            self._views.clear()
+
+
+metrics = MetricsRegistry()
+
+
+# --- 3. Middleware ---
+
+def _finish(request, response, current):
+    duration_ms = (time.perf_counter() - current.started) * 1000
+    match = getattr(request, 'resolver_match', None)
+    name = (match.view_name if match else None) or 'unresolved'
+    size = None if response.streaming else len(response.content)
+    budget = settings.INSTRUMENTATION_QUERY_BUDGETS.get(name)
+
+    metrics.record(name, current, duration_ms, size, budget)
+    response['Server-Timing'] = ', '.join([
+        f'db;dur={current.sql_ms:.1f};desc="SQL {current.queries} query"',
+        f'tpl;dur={current.template_ms:.1f};desc="Template"',
+        f'total;dur={duration_ms:.1f}',
+    ])
+    for sql, count in current.duplicates():
+        logger.warning("Query berulang %sx di %s (kemungkinan N+1): %s", count, name, sql[:300])
+    if budget is not None and current.queries > budget:
+        logger.warning("%s menjalankan %s query (anggaran %s)", name, current.queries, budget)
+
+
+def _sampled():
+    rate = settings.INSTRUMENTATION_SAMPLE_RATE
+    return rate > 0 and (rate >= 1 or random.random() < rate)
+
+
+class InstrumentationMiddleware:
+    """Sinkron dan async: di ASGI view async tidak dibungkus thread tambahan."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+        # Koneksi yang sudah terbuka sebelum middleware dimuat
+        for connection in connections.all(initialized_only=True):
+            _install(connection)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        if not _sampled():
+            return self.get_response(request)
+        current = RequestMetrics()
+        token = _current.set(current)
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        _finish(request, response, current)
+        return response
+
+    async def __acall__(self, request):
+        if not _sampled():
+            return await self.get_response(request)
+        current = RequestMetrics()
+        token = _current.set(current)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        _finish(request, response, current)
+        return response
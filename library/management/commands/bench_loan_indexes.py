@@ -0,0 +1,100 @@
+import json
+import random
+from datetime import date
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from library.account import compute_account_state
+from library.benchmarks import measure, seed_books, seed_loans, seed_members
+from library.models import Loan
+
+
+class Command(BaseCommand):
+    help = (
+        "Membandingkan waktu & rencana query akses Loan dengan dan tanpa indeks komposit "
+        "(Loan.Meta.indexes). Data sintetis dibuat di dalam transaksi yang di-rollback, "
+        "jadi aman dijalankan di database pengembangan."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loans', type=int, default=200000)
+        parser.add_argument('--members', type=int, default=5000)
+        parser.add_argument('--books', type=int, default=2000)
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--output', default=None, help="Simpan hasil sebagai JSON ke file ini.")
+
+    def handle(self, *args, **options):
+        today = date.today()
+        with transaction.atomic():
+            self.stdout.write(f"Seed {options['loans']} pinjaman...")
+            # Prefix sendiri: tidak bertabrakan dengan anggota dari seed_bench
+            member_ids = seed_members(options['members'], 'bench-index-')
+            book_ids = seed_books(options['books'])
+            seed_loans(options['loans'], member_ids, book_ids, today)
+            self._analyze()
+
+            scenarios = self._scenarios(member_ids, book_ids, today)
+            results = {name: {} for name in scenarios}
+            for name, func in scenarios.items():
+                results[name]['with_indexes'] = measure(func, options['repeat'])
+
+            self._drop_indexes()
+            for name, func in scenarios.items():
+                results[name]['without_indexes'] = measure(func, options['repeat'])
+
+            transaction.set_rollback(True)
+
+        report = {
+            'vendor': connection.vendor,
+            'loans': options['loans'],
+            'members': options['members'],
+            'indexes': [index.name for index in Loan._meta.indexes],
+            'scenarios': results,
+        }
+        for name, result in results.items():
+            before, after = result['without_indexes'], result['with_indexes']
+            self.stdout.write(
+                f"{name:<24} tanpa indeks p50 {before['p50_ms']:>9.3f} ms | "
+                f"dengan indeks p50 {after['p50_ms']:>9.3f} ms"
+            )
+        if options['output']:
+            with open(options['output'], 'w') as fh:
+                json.dump(report, fh, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Hasil disimpan ke {options['output']}"))
+
+    def _scenarios(self, member_ids, book_ids, today):
+        rng = random.Random(1)
+        member = lambda: rng.choice(member_ids)
+        loans = Loan.objects.all()
+        return {
+            # Halaman profil, pengajuan pinjaman & my_loans
+            'account_state': lambda: compute_account_state(member(), today),
+            'profile_current_loans': lambda: list(
+                loans.filter(member_id=member(), status='approved').order_by('due_date')
+            ),
+            'my_loans_page': lambda: list(loans.filter(member_id=member()).order_by('-id')[:9]),
+            'my_loans_not_paid': lambda: list(
+                loans.filter(member_id=member(), accrued_fine__gt=0, is_paid=False).order_by('-id')[:9]
+            ),
+            'request_loan_duplicate': lambda: loans.filter(
+                member_id=member(), status__in=['pending', 'approved'], book_id=rng.choice(book_ids)
+            ).exists(),
+            # LoanAdmin & job terjadwal
+            'admin_status_by_due': lambda: list(
+                loans.filter(status='approved').order_by('due_date')[:100]
+            ),
+            'overdue_scan': lambda: loans.filter(status='approved', due_date__lt=today).count(),
+        }
+
+    def _analyze(self):
+        # Statistik planner diperbarui agar indeks baru dipertimbangkan
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def _drop_indexes(self):
+        # DROP INDEX biasa (bukan schema_editor) agar tetap di dalam transaksi yang di-rollback
+        with connection.cursor() as cursor:
+            for index in Loan._meta.indexes:
+                cursor.execute(f'DROP INDEX {connection.ops.quote_name(index.name)}')
+        self._analyze()
@@ -0,0 +1,105 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from library.benchmarks import git_commit, import_cost_by_package, parse_importtime
+
+# Yang dikerjakan lambda sebelum request pertama: settings, app registry, handler
+# WSGI (middleware) dan URLconf (impor semua modul view)
+STARTUP = (
+    "import json, os, time\n"
+    "start = time.perf_counter()\n"
+    "os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'mysite.settings')\n"
+    "from mysite.wsgi import application\n"
+    "from django.urls import get_resolver\n"
+    "get_resolver().url_patterns\n"
+    "print(json.dumps({'startup_ms': (time.perf_counter() - start) * 1000}))\n"
+)
+FIRST_PARTY = ('mysite', 'library', 'midtrans')
+
+
+class Command(BaseCommand):
+    help = (
+        "Mengukur waktu cold start (proses Python baru sampai URLconf siap) dengan "
+        "python -X importtime. Laporan JSON berisi waktu startup dan biaya impor per paket "
+        "sehingga bisa dibandingkan antar commit (--output, --compare). --serverless meniru "
+        "lingkungan Vercel (VERCEL=1)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--runs', type=int, default=5)
+        parser.add_argument('--top', type=int, default=15, help="Jumlah paket termahal di laporan.")
+        parser.add_argument('--serverless', action='store_true', help="Jalankan dengan VERCEL=1.")
+        parser.add_argument('--output', default=None, help="Simpan laporan JSON ke file ini.")
+        parser.add_argument('--compare', default=None, help="Laporan JSON sebelumnya untuk dibandingkan.")
+
+    def handle(self, *args, **options):
+        env = dict(os.environ, PYTHONDONTWRITEBYTECODE='1')
+        if options['serverless']:
+            env['VERCEL'] = '1'
+
+        walls, startups, imports, packages, modules = [], [], [], {}, {}
+        for _ in range(options['runs']):
+            started = time.perf_counter()
+            result = subprocess.run(
+                [sys.executable, '-X', 'importtime', '-c', STARTUP],
+                cwd=settings.BASE_DIR, env=env, capture_output=True, text=True,
+            )
+            walls.append((time.perf_counter() - started) * 1000)
+            if result.returncode:
+                raise CommandError(f"Startup gagal:\n{result.stderr[-2000:]}")
+            startups.append(json.loads(result.stdout.strip().splitlines()[-1])['startup_ms'])
+            rows = parse_importtime(result.stderr)
+            imports.append(sum(cumulative for depth, _, _, cumulative in rows if depth == 0))
+            for name, cost in import_cost_by_package(rows).items():
+                packages.setdefault(name, []).append(cost)
+            for _, name, _, cumulative in rows:
+                if name.split('.')[0] in FIRST_PARTY:
+                    modules.setdefault(name, []).append(cumulative)
+
+        median = lambda values: round(statistics.median(values), 1)
+        top = sorted(packages, key=lambda name: median(packages[name]), reverse=True)[:options['top']]
+        report = {
+            'commit': git_commit(),
+            'python': sys.version.split()[0],
+            'serverless': options['serverless'],
+            'runs': options['runs'],
+            'wall_ms': {'p50': median(walls), 'min': round(min(walls), 1)},
+            'startup_ms': {'p50': median(startups), 'min': round(min(startups), 1)},
+            'import_ms': median(imports),
+            'packages_ms': {name: median(packages[name]) for name in top},
+            'first_party_ms': {name: median(values) for name, values in sorted(modules.items())},
+        }
+        self._print(report, self._load(options['compare']))
+        if options['output']:
+            with open(options['output'], 'w') as fh:
+                json.dump(report, fh, indent=2, sort_keys=True)
+                fh.write('\n')
+            self.stdout.write(self.style.SUCCESS(f"Laporan disimpan ke {options['output']}"))
+
+    def _load(self, path):
+        if not path:
+            return None
+        with open(path) as fh:
+            return json.load(fh)
+
+    def _print(self, report, before):
+        def delta(value, old):
+            return f"  ({value - old:+.1f} ms)" if old is not None else ''
+
+        before = before or {}
+        self.stdout.write(
+            f"Proses baru p50 {report['wall_ms']['p50']} ms, Django siap p50 {report['startup_ms']['p50']} ms"
+            f"{delta(report['startup_ms']['p50'], before.get('startup_ms', {}).get('p50'))}, "
+            f"impor {report['import_ms']} ms{delta(report['import_ms'], before.get('import_ms'))}"
+        )
+        for name, cost in report['packages_ms'].items():
+            self.stdout.write(f"  {name:<28} {cost:>7.1f} ms{delta(cost, before.get('packages_ms', {}).get(name))}")
+        for name in sorted(set(before.get('packages_ms', {})) - set(report['packages_ms'])):
+            self.stdout.write(f"  {name:<28} (tidak lagi termahal; sebelumnya {before['packages_ms'][name]} ms)")
@@ -0,0 +1,220 @@
+import json
+from datetime import timedelta
+from itertools import combinations
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Count
+from django.test import Client, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from library.benchmarks import git_commit, login, measure
+from library.models import Book, Loan, Review
+from midtrans.models import PaymentOrder
+from midtrans.notifications import signature_for
+from midtrans.payments import new_order_id
+
+SORTS = ('', 'rating', 'newest')
+BENCH_SERVER_KEY = 'bench-server-key'  # Webhook ditandatangani dengan key ini (lihat _payload)
+ADMIN_ACTIONS = {
+    'approve_loan': {'status': 'pending'},
+    'reject_loan': {'status': 'pending'},
+    'mark_as_returned': {'status': 'approved'},
+    'mark_fine_as_paid': {'status': 'returned', 'is_paid': False, 'fine_amount__gt': 0},
+}
+
+
+class Scenario:
+    """Satu request lewat test client; ``rollback`` = dijalankan di savepoint yang dibatalkan."""
+
+    def __init__(self, client, method, url, data=None, rollback=False, settings=None, **extra):
+        self.client = client
+        self.method = method
+        self.url = url
+        self.data = data
+        self.rollback = rollback
+        self.settings = settings or {}
+        self.extra = extra
+        self.status = None
+
+    def __call__(self):
+        if self.rollback:
+            with transaction.atomic():
+                self._send()
+                transaction.set_rollback(True)
+        else:
+            self._send()
+
+    def _send(self):
+        response = getattr(self.client, self.method)(self.url, self.data, **self.extra)
+        self.status = response.status_code
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark halaman lewat Django test client di atas data seed_bench: book_list (semua "
+        "kombinasi filter & sort), detail buku, profile, my_loans, request_loan, action LoanAdmin "
+        "dan webhook Midtrans. Mencatat p50/p95 (ms) dan jumlah query ke laporan JSON yang bisa "
+        "di-diff antar commit (--output, --compare). Semua perubahan data di-rollback."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--warm', action='store_true',
+                            help="Pertahankan cache antar run (default: cache dikosongkan sebelum setiap run).")
+        parser.add_argument('--only', action='append', default=None,
+                            help="Hanya skenario yang namanya memuat teks ini; boleh diulang.")
+        parser.add_argument('--admin-batch', type=int, default=20,
+                            help="Jumlah pinjaman yang dipilih per action LoanAdmin.")
+        parser.add_argument('--output', default=None, help="Simpan laporan JSON ke file ini.")
+        parser.add_argument('--compare', default=None, help="Laporan JSON sebelumnya untuk dibandingkan.")
+
+    def handle(self, *args, **options):
+        if not Book.objects.exists():
+            raise CommandError("Database kosong; jalankan seed_bench dulu.")
+        baseline = None
+        if options['compare']:
+            with open(options['compare']) as fh:
+                baseline = json.load(fh)['scenarios']
+
+        setup = None if options['warm'] else cache.clear
+        results = {}
+        # Sampling instrumentasi dimatikan agar overhead-nya tidak membuat hasil acak
+        with override_settings(INSTRUMENTATION_SAMPLE_RATE=0), transaction.atomic():
+            scenarios = self._scenarios(options['admin_batch'])
+            for name, scenario in scenarios.items():
+                if options['only'] and not any(part in name for part in options['only']):
+                    continue
+                with override_settings(**scenario.settings):
+                    result = measure(scenario, options['repeat'], setup=setup, plans=False)
+                result['status'] = scenario.status
+                results[name] = result
+                self._print(name, result, (baseline or {}).get(name))
+            transaction.set_rollback(True)
+        if setup:
+            setup()
+
+        report = {
+            'commit': git_commit(),
+            'vendor': connection.vendor,
+            'created_at': timezone.now().isoformat(timespec='seconds'),
+            'repeat': options['repeat'],
+            'cache': 'warm' if options['warm'] else 'cold',
+            'data': {
+                'books': Book.objects.count(),
+                'members': User.objects.count(),
+                'loans': Loan.objects.count(),
+                'reviews': Review.objects.count(),
+            },
+            'scenarios': results,
+        }
+        if options['output']:
+            with open(options['output'], 'w') as fh:
+                json.dump(report, fh, indent=2, sort_keys=True)
+                fh.write('\n')
+            self.stdout.write(self.style.SUCCESS(f"Laporan disimpan ke {options['output']}"))
+
+    def _scenarios(self, admin_batch):
+        scenarios = {}
+        anonymous = Client()
+
+        # --- Katalog: setiap kombinasi filter x sort, memakai nilai dari satu buku acuan ---
+        pivot = (
+            Book.objects.filter(location__isnull=False, genre__isnull=False, authors__isnull=False)
+            .order_by('pk').first()
+        ) or Book.objects.order_by('pk').first()
+        filters = {
+            'q': (pivot.description or pivot.title).split()[0],
+            'genre': pivot.genre.values_list('pk', flat=True).first(),
+            'author': pivot.authors.values_list('pk', flat=True).first(),
+            'location': pivot.location_id,
+        }
+        filters = {key: value for key, value in filters.items() if value}
+        url = reverse('book_list')
+        for size in range(len(filters) + 1):
+            for keys in combinations(filters, size):
+                for sort in SORTS:
+                    params = {key: filters[key] for key in keys}
+                    if sort:
+                        params['sort'] = sort
+                    label = '+'.join(keys) or 'semua'
+                    name = f"book_list[{label}{f',sort={sort}' if sort else ''}]"
+                    scenarios[name] = Scenario(anonymous, 'get', url, params)
+
+        # --- Halaman anggota (anggota dengan pinjaman terbanyak) ---
+        member_id = (
+            Loan.objects.values('member').annotate(n=Count('id')).order_by('-n')
+            .values_list('member', flat=True).first()
+        )
+        member = User.objects.get(pk=member_id) if member_id else User.objects.create_user('bench_views_member')
+        member_client = Client()
+        login(member_client, member)
+
+        book = Book.objects.order_by('-rating_count', 'pk').first()
+        scenarios['detail_book'] = Scenario(anonymous, 'get', reverse('detail_book', args=[book.pk]))
+        scenarios['detail_book[anggota]'] = Scenario(member_client, 'get', reverse('detail_book', args=[book.pk]))
+        scenarios['profile'] = Scenario(member_client, 'get', reverse('profile'))
+        scenarios['my_loans'] = Scenario(member_client, 'get', reverse('my_loans'))
+        scenarios['my_loans[not-paid]'] = Scenario(member_client, 'get', reverse('my_loans'), {'status': 'not-paid'})
+
+        # Anggota baru tanpa pinjaman/denda agar pengajuan benar-benar membuat Loan
+        borrower_client = Client()
+        login(borrower_client, User.objects.create_user('bench_views_borrower'))
+        available = Book.objects.filter(stock__gt=0).order_by('pk').first() or book
+        scenarios['request_loan'] = Scenario(
+            borrower_client, 'get', reverse('request_loan', args=[available.pk]), rollback=True,
+        )
+
+        # --- Action LoanAdmin ---
+        admin_client = Client()
+        login(admin_client, User.objects.create_superuser('bench_views_admin', 'bench@example.com', None))
+        changelist = reverse('admin:library_loan_changelist')
+        for action, lookup in ADMIN_ACTIONS.items():
+            ids = list(Loan.objects.filter(**lookup).order_by('pk').values_list('pk', flat=True)[:admin_batch])
+            if ids:
+                scenarios[f'admin[{action}]'] = Scenario(
+                    admin_client, 'post', changelist,
+                    {'action': action, '_selected_action': ids, 'index': 0}, rollback=True,
+                )
+
+        # --- Webhook Midtrans (order lokal untuk satu denda yang belum lunas) ---
+        loan = Loan.objects.filter(**ADMIN_ACTIONS['mark_fine_as_paid']).order_by('pk').first()
+        if loan:
+            order = PaymentOrder.objects.create(
+                order_id=new_order_id(), member_id=loan.member_id, amount=loan.fine_amount,
+                snap_token=f'bench-{loan.pk}', expires_at=timezone.now() + timedelta(hours=1),
+            )
+            order.loans.add(loan)
+            payload = self._payload(order.order_id, f'{order.amount:.2f}')
+            webhook = reverse('midtrans_webhook')
+            for name, inline in (('midtrans_webhook', False), ('midtrans_webhook[inline]', True)):
+                scenarios[name] = Scenario(
+                    Client(), 'post', webhook, json.dumps(payload), rollback=True,
+                    settings={'MIDTRANS_PROCESS_INLINE': inline, 'MIDTRANS_SERVER_KEY': BENCH_SERVER_KEY},
+                    content_type='application/json',
+                )
+        return scenarios
+
+    def _payload(self, order_id, gross_amount):
+        return {
+            'order_id': order_id,
+            'transaction_status': 'settlement',
+            'status_code': '200',
+            'gross_amount': gross_amount,
+            'fraud_status': 'accept',
+            'payment_type': 'bank_transfer',
+            'signature_key': signature_for(order_id, '200', gross_amount, BENCH_SERVER_KEY),
+        }
+
+    def _print(self, name, result, before):
+        line = f"{name:<44} p50 {result['p50_ms']:>9.2f} ms  p95 {result['p95_ms']:>9.2f} ms  {result['queries']:>3} query"
+        if before:
+            change = (result['p50_ms'] - before['p50_ms']) / before['p50_ms'] * 100 if before['p50_ms'] else 0
+            line += f"  (p50 {change:+.0f}%, query {before['queries']} -> {result['queries']})"
+        if result['status'] is None or result['status'] >= 400:
+            self.stderr.write(f"{line}  HTTP {result['status']}")
+        else:
+            self.stdout.write(line)
@@ -0,0 +1,69 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from library import thumbnails
+from library.models import Book
+
+
+def _render(data):
+    # Dijalankan di proses worker: error dikembalikan agar satu sampul rusak tidak menghentikan batch
+    try:
+        return thumbnails.render_variants(data), None
+    except Exception as exc:
+        return None, str(exc)
+
+
+class Command(BaseCommand):
+    help = (
+        "Membuat thumbnail WebP/JPEG untuk sampul buku yang belum punya varian. "
+        "Resize dikerjakan paralel di process pool; baca/tulis storage tetap di proses utama."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help="Buat ulang varian semua sampul.")
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                            help="Jumlah proses resize (1 = tanpa process pool).")
+        parser.add_argument('--batch-size', type=int, default=50)
+
+    def handle(self, *args, **options):
+        books = (
+            Book.objects.exclude(Q(cover_image='') | Q(cover_image__isnull=True))
+            .only('id', 'cover_image', 'cover_variants').order_by('pk')
+        )
+        pool = ProcessPoolExecutor(options['workers']) if options['workers'] > 1 else None
+        render = pool.map if pool else map
+        done = failed = 0
+        last_pk = 0
+        try:
+            while True:
+                batch = list(books.filter(pk__gt=last_pk)[:options['batch_size']])
+                if not batch:
+                    break
+                last_pk = batch[-1].pk
+                pending, sources = [], []
+                for book in batch:
+                    if not (options['all'] or thumbnails.needs_variants(book)):
+                        continue
+                    try:
+                        sources.append(thumbnails.read_cover(book))
+                    except Exception as exc:
+                        failed += 1
+                        self.stderr.write(f"Buku {book.pk}: sampul tidak terbaca ({exc})")
+                        continue
+                    pending.append(book)
+
+                for book, (variants, error) in zip(pending, render(_render, sources)):
+                    if error:
+                        failed += 1
+                        self.stderr.write(f"Buku {book.pk}: {error}")
+                        continue
+                    thumbnails.store_variants(book, variants)
+                    done += 1
+                self.stdout.write(f"  sampai buku #{last_pk}: {done} selesai, {failed} gagal")
+        finally:
+            if pool:
+                pool.shutdown()
+        self.stdout.write(self.style.SUCCESS(f"Thumbnail {done} sampul berhasil dibuat ({failed} gagal)."))
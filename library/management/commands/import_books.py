@@ -0,0 +1,65 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from library import importers
+from library.models import BookImport
+
+
+class Command(BaseCommand):
+    help = (
+        "Mengimpor katalog buku dari file CSV, JSON Lines atau MARC 21 (.mrc) secara streaming. "
+        "Buku ditulis per batch dengan bulk_create; impor yang terputus dilanjutkan otomatis "
+        "dari batch terakhir yang sudah commit saat command dijalankan lagi dengan file yang sama."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="File sumber.")
+        parser.add_argument('--format', choices=importers.FORMATS, default=None,
+                            help="Default ditebak dari ekstensi (.csv, .jsonl/.ndjson, .mrc/.marc).")
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--separator', default=';',
+                            help="Pemisah beberapa penulis/genre dalam satu kolom CSV.")
+        parser.add_argument('--restart', action='store_true',
+                            help="Abaikan posisi tersimpan dan impor dari awal file.")
+
+    def handle(self, *args, **options):
+        path = os.path.abspath(options['path'])
+        if not os.path.exists(path):
+            raise CommandError(f"File tidak ditemukan: {path}")
+        fmt = options['format'] or importers.EXTENSIONS.get(os.path.splitext(path)[1].lower())
+        if fmt is None:
+            raise CommandError("Format tidak dikenali dari ekstensi; gunakan --format.")
+
+        checkpoint, _ = BookImport.objects.get_or_create(source=path)
+        if options['restart']:
+            checkpoint.position = checkpoint.created_books = checkpoint.skipped = 0
+            checkpoint.finished_at = None
+        elif checkpoint.finished_at:
+            raise CommandError(
+                f"{path} sudah selesai diimpor ({checkpoint.created_books} buku). "
+                "Gunakan --restart untuk mengimpor ulang (buku akan tergandakan)."
+            )
+        elif checkpoint.position:
+            self.stdout.write(f"Melanjutkan dari rekaman ke-{checkpoint.position}...")
+
+        started = time.perf_counter()
+        resumed_from = checkpoint.position
+
+        def progress(state):
+            rate = (state.position - resumed_from) / max(time.perf_counter() - started, 1e-6)
+            self.stdout.write(
+                f"  {state.position} rekaman, {state.created_books} buku, "
+                f"{state.skipped} dilewati ({rate:.0f} rekaman/s)"
+            )
+
+        reader_options = {'separator': options['separator']} if fmt == 'csv' else {}
+        try:
+            importers.import_file(path, fmt, checkpoint, options['batch_size'], progress, **reader_options)
+        except importers.ImportRecordError as exc:
+            raise CommandError(f"{exc} (posisi tersimpan: rekaman ke-{checkpoint.position})")
+        self.stdout.write(self.style.SUCCESS(
+            f"Impor selesai: {checkpoint.created_books} buku dibuat, {checkpoint.skipped} rekaman dilewati "
+            f"dalam {time.perf_counter() - started:.1f} s."
+        ))
@@ -0,0 +1,110 @@
+import json
+import statistics
+import threading
+import time
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = (
+        "Uji beban HTTP sederhana untuk membandingkan profil Procfile web (WSGI) dan web-asgi "
+        "pada mesin yang sama. Contoh (tiga terminal, database & data yang sama):\n"
+        "  python manage.py fake_snap_server --latency 2\n"
+        "  MIDTRANS_SNAP_URL=http://127.0.0.1:8765/snap/v1 MIDTRANS_ORDER_EXPIRY_MINUTES=0 "
+        "gunicorn mysite.wsgi:app -w 2 -b :8000\n"
+        "  MIDTRANS_SNAP_URL=http://127.0.0.1:8765/snap/v1 MIDTRANS_ORDER_EXPIRY_MINUTES=0 CONN_MAX_AGE=0 "
+        "uvicorn mysite.asgi:application --port 8001 --workers 2 --lifespan off\n"
+        "lalu: python manage.py loadtest --target wsgi=http://127.0.0.1:8000 "
+        "--target asgi=http://127.0.0.1:8001 --checkout-path /payment/checkout/all/ "
+        "--cookie sessionid=<sesi anggota berdenda>\n"
+        "MIDTRANS_ORDER_EXPIRY_MINUTES=0 mematikan pemakaian ulang token agar setiap checkout "
+        "benar-benar memanggil Snap (palsu)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--target', action='append', required=True, metavar='NAMA=URL',
+                            help="Server yang diuji; boleh diulang.")
+        parser.add_argument('--path', action='append', default=None,
+                            help="Halaman katalog yang diminta bergiliran (default /books).")
+        parser.add_argument('--concurrency', type=int, default=16, help="Klien katalog paralel.")
+        parser.add_argument('--checkout-path', default=None,
+                            help="Endpoint lambat (checkout) yang diminta klien terpisah.")
+        parser.add_argument('--checkout-concurrency', type=int, default=8)
+        parser.add_argument('--cookie', action='append', default=[], metavar='NAMA=NILAI')
+        parser.add_argument('--duration', type=float, default=15.0, help="Durasi per target (detik).")
+        parser.add_argument('--output', default=None, help="Simpan hasil sebagai JSON ke file ini.")
+
+    def handle(self, *args, **options):
+        try:
+            targets = [target.split('=', 1) for target in options['target']]
+            cookies = dict(cookie.split('=', 1) for cookie in options['cookie'])
+        except ValueError:
+            raise CommandError("Format --target/--cookie harus NAMA=NILAI.")
+        paths = options['path'] or ['/books']
+
+        report = {}
+        for name, base_url in targets:
+            self.stdout.write(f"[{name}] {base_url} selama {options['duration']:.0f} s...")
+            report[name] = self._run(base_url.rstrip('/'), paths, cookies, options)
+            for group, result in report[name].items():
+                self.stdout.write(
+                    f"  {group:<9} {result['requests']:>6} req  {result['rps']:>8.1f}/s  "
+                    f"p50 {result['p50_ms']} ms  p95 {result['p95_ms']} ms  error {result['errors']}"
+                )
+
+        if options['output']:
+            with open(options['output'], 'w') as fh:
+                json.dump(report, fh, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Hasil disimpan ke {options['output']}"))
+
+    def _run(self, base_url, paths, cookies, options):
+        import requests
+
+        deadline = time.monotonic() + options['duration']
+        samples = defaultdict(list)
+        errors = defaultdict(int)
+        lock = threading.Lock()
+
+        def worker(group, worker_paths, offset):
+            session = requests.Session()
+            session.cookies.update(cookies)
+            i = offset
+            while time.monotonic() < deadline:
+                url = base_url + worker_paths[i % len(worker_paths)]
+                i += 1
+                start = time.perf_counter()
+                try:
+                    ok = session.get(url, timeout=30).status_code < 400
+                except requests.RequestException:
+                    ok = False
+                elapsed = (time.perf_counter() - start) * 1000
+                with lock:
+                    samples[group].append(elapsed)
+                    errors[group] += not ok
+
+        threads = [
+            threading.Thread(target=worker, args=('katalog', paths, i)) for i in range(options['concurrency'])
+        ]
+        if options['checkout_path']:
+            threads += [
+                threading.Thread(target=worker, args=('checkout', [options['checkout_path']], 0))
+                for _ in range(options['checkout_concurrency'])
+            ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        result = {}
+        for group, timings in samples.items():
+            timings.sort()
+            result[group] = {
+                'requests': len(timings),
+                'rps': round(len(timings) / options['duration'], 1),
+                'p50_ms': round(statistics.median(timings), 1),
+                'p95_ms': round(timings[min(len(timings) - 1, int(len(timings) * 0.95))], 1),
+                'errors': errors[group],
+            }
+        return result
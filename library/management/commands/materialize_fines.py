@@ -0,0 +1,41 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from library.models import Loan
+
+
+class Command(BaseCommand):
+    help = (
+        "Menyimpan denda berjalan pinjaman approved yang terlambat ke kolom accrued_fine. "
+        "Idempoten: hanya baris yang nilainya berubah sejak run sebelumnya yang ditulis, "
+        "jadi aman dijadwalkan setiap beberapa menit (cron / scheduler platform)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=2000)
+        parser.add_argument('--date', type=date.fromisoformat, default=None,
+                            help="Tanggal acuan (YYYY-MM-DD), default hari ini.")
+
+    def handle(self, *args, **options):
+        today = options['date'] or date.today()
+        batch_size = options['batch_size']
+        expected = Loan.running_fine_expression(today)
+        stale = (
+            Loan.objects
+            .filter(status='approved', due_date__lt=today)
+            .exclude(accrued_fine=expected)
+        )
+
+        updated = 0
+        last_pk = 0
+        while True:
+            batch = list(stale.filter(pk__gt=last_pk).order_by('pk').values_list('pk', flat=True)[:batch_size])
+            if not batch:
+                break
+            with transaction.atomic():
+                updated += stale.filter(pk__in=batch).update(accrued_fine=expected)
+            last_pk = batch[-1]
+
+        self.stdout.write(self.style.SUCCESS(f"{updated} denda berjalan diperbarui ({today})."))
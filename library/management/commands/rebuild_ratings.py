@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from library.caching import bump_books
+from library.models import Book
+
+
+class Command(BaseCommand):
+    help = "Menghitung ulang kolom agregat rating (rating_sum/rating_count/rating_avg) semua buku."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        ids = Book.objects.order_by('pk').values_list('pk', flat=True)
+        total = 0
+        last_pk = 0
+        while True:
+            batch = list(ids.filter(pk__gt=last_pk)[:batch_size])
+            if not batch:
+                break
+            total += Book.refresh_ratings(batch)
+            last_pk = batch[-1]
+        bump_books()  # rating tampil di kartu & halaman detail yang di-cache
+        self.stdout.write(self.style.SUCCESS(f"Rating {total} buku berhasil dihitung ulang."))
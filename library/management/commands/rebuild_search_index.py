@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from library import search
+
+
+class Command(BaseCommand):
+    help = "Membangun ulang indeks pencarian full-text katalog buku."
+
+    def handle(self, *args, **options):
+        total = search.rebuild()
+        self.stdout.write(self.style.SUCCESS(f"{total} buku berhasil diindeks."))
@@ -0,0 +1,63 @@
+import time
+from datetime import date
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from library import search
+from library.benchmarks import seed_catalogue, seed_loans, seed_members, seed_reviews
+from library.caching import bump_books, bump_version
+from library.models import Book
+
+
+class Command(BaseCommand):
+    help = (
+        "Mengisi database dengan data sintetis untuk bench_views: penulis, genre, rak, buku, "
+        "anggota, pinjaman di semua status, review dan rekomendasi. Data disimpan (tidak di-rollback); "
+        "gunakan --prefix berbeda untuk menambah set data kedua. Hasil dengan --seed yang sama "
+        "selalu identik sehingga laporan benchmark antar commit bisa dibandingkan."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--books', type=int, default=5000)
+        parser.add_argument('--authors', type=int, default=800)
+        parser.add_argument('--genres', type=int, default=30)
+        parser.add_argument('--locations', type=int, default=40)
+        parser.add_argument('--members', type=int, default=2000)
+        parser.add_argument('--loans', type=int, default=50000)
+        parser.add_argument('--reviews', type=int, default=20000)
+        parser.add_argument('--seed', type=int, default=0, help="Seed generator acak.")
+        parser.add_argument('--prefix', default='bench', help="Awalan username & nama data.")
+
+    def handle(self, *args, **options):
+        prefix = options['prefix']
+        if options['books'] < 1 or options['members'] < 1:
+            raise CommandError("--books dan --members minimal 1.")
+        if User.objects.filter(username__startswith=prefix).exists():
+            raise CommandError(f"Data dengan prefix '{prefix}' sudah ada; gunakan --prefix lain.")
+
+        started = time.perf_counter()
+        seed = options['seed']
+        with transaction.atomic():
+            member_ids = seed_members(options['members'], prefix)
+            book_ids = seed_catalogue(
+                options['books'], options['authors'], options['genres'], options['locations'],
+                prefix.title(), seed,
+            )
+            seed_loans(options['loans'], member_ids, book_ids, date.today(), seed)
+            seed_reviews(options['reviews'], member_ids, book_ids, seed)
+
+            # bulk_create tidak memicu signal: agregat rating, indeks pencarian & cache disinkronkan di sini
+            Book.refresh_ratings(book_ids)
+            search.index_books(book_ids)
+            bump_books()
+            transaction.on_commit(lambda: bump_version('facets'))
+        call_command('materialize_fines', stdout=self.stdout)
+        call_command('build_recommendations', full=True, stdout=self.stdout)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Seed selesai dalam {time.perf_counter() - started:.1f} s: {len(book_ids)} buku, "
+            f"{len(member_ids)} anggota, {options['loans']} pinjaman, {options['reviews']} review."
+        ))
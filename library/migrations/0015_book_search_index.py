@@ -0,0 +1,27 @@
+from django.db import migrations
+
+from library import search
+
+
+def create_search_index(apps, schema_editor):
+    search.create_index(schema_editor)
+    Book = apps.get_model('library', 'Book')
+    search.reindex_queryset(
+        Book.objects.using(schema_editor.connection.alias).all(),
+        connection=schema_editor.connection,
+    )
+
+
+def drop_search_index(apps, schema_editor):
+    search.drop_index(schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0014_author_remove_book_author_book_authors'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 5.2.8 on 2026-10-17 21:50
+
+from django.db import migrations, models
+from django.db.models import Avg, Count, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def fill_rating_aggregates(apps, schema_editor):
+    Book = apps.get_model('library', 'Book')
+    Review = apps.get_model('library', 'Review')
+    reviews = Review.objects.filter(book=OuterRef('pk')).order_by().values('book')
+    Book.objects.using(schema_editor.connection.alias).update(
+        rating_sum=Coalesce(Subquery(reviews.annotate(s=Sum('rating')).values('s')), Value(0)),
+        rating_count=Coalesce(Subquery(reviews.annotate(c=Count('id')).values('c')), Value(0)),
+        rating_avg=Coalesce(
+            Subquery(reviews.annotate(a=Avg('rating')).values('a')), Value(0),
+            output_field=models.DecimalField(max_digits=3, decimal_places=2)
+        ),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0015_book_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='book',
+            name='rating_avg',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=3, verbose_name='Rata-rata Rating'),
+        ),
+        migrations.AddField(
+            model_name='book',
+            name='rating_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Jumlah Review'),
+        ),
+        migrations.AddField(
+            model_name='book',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Total Nilai Rating'),
+        ),
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(fields=['-rating_avg', 'title'], name='book_rating_idx'),
+        ),
+        migrations.RunPython(fill_rating_aggregates, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.8 on 2026-10-17 21:56
+
+from datetime import date
+
+from django.db import migrations, models
+from django.db.models import F, Value
+from django.db.models.functions import Coalesce, Greatest
+
+from library.functions import DaysBetween
+
+FINE_PER_DAY = 1000
+
+
+def fill_accrued_fine(apps, schema_editor):
+    Loan = apps.get_model('library', 'Loan')
+    loans = Loan.objects.using(schema_editor.connection.alias)
+    today = date.today()
+    loans.filter(status='returned').update(accrued_fine=F('fine_amount'))
+    loans.filter(status='approved', due_date__lt=today).update(
+        accrued_fine=Greatest(Coalesce(DaysBetween(Value(today), F('due_date')), Value(0)), Value(0)) * Value(FINE_PER_DAY)
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0016_book_rating_aggregates'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='loan',
+            name='accrued_fine',
+            field=models.DecimalField(db_index=True, decimal_places=2, default=0, editable=False, max_digits=10, verbose_name='Denda Berjalan (Rp)'),
+        ),
+        migrations.RunPython(fill_accrued_fine, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.8 on 2026-10-17 21:58
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0017_loan_accrued_fine'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='loan',
+            index=models.Index(fields=['member', 'status', 'due_date'], name='loan_member_status_due_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='loan',
+            index=models.Index(fields=['member', '-id'], name='loan_member_recent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='loan',
+            index=models.Index(condition=models.Q(('accrued_fine__gt', 0), ('is_paid', False)), fields=['member', '-id'], name='loan_member_unpaid_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='loan',
+            index=models.Index(fields=['status', 'due_date'], name='loan_status_due_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='loan',
+            index=models.Index(fields=['borrow_date'], name='loan_borrow_date_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-17 22:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0019_book_review_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='book',
+            name='cover_variants',
+            field=models.JSONField(blank=True, default=dict, editable=False, verbose_name='Varian Sampul'),
+        ),
+    ]
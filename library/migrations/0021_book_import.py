@@ -0,0 +1,30 @@
+# Generated by Django 5.2.8 on 2026-10-17 22:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0020_book_cover_variants'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BookImport',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(max_length=255, unique=True, verbose_name='File Sumber')),
+                ('position', models.PositiveBigIntegerField(default=0, verbose_name='Rekaman Dibaca')),
+                ('created_books', models.PositiveBigIntegerField(default=0, verbose_name='Buku Dibuat')),
+                ('skipped', models.PositiveBigIntegerField(default=0, verbose_name='Rekaman Dilewati')),
+                ('started_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'Impor Katalog',
+                'verbose_name_plural': 'Riwayat Impor Katalog',
+            },
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 5.2.8 on 2026-10-17 22:37
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0021_book_import'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecommendationRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('full', models.BooleanField(default=False, verbose_name='Bangun Ulang Penuh')),
+                ('last_loan_id', models.PositiveBigIntegerField(default=0, verbose_name='Pinjaman Terakhir')),
+                ('last_review_id', models.PositiveBigIntegerField(default=0, verbose_name='Review Terakhir')),
+                ('books_scanned', models.PositiveIntegerField(default=0, verbose_name='Buku Dihitung')),
+                ('books_changed', models.PositiveIntegerField(default=0, verbose_name='Buku Berubah')),
+                ('started_at', models.DateTimeField(auto_now_add=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'Proses Rekomendasi',
+                'verbose_name_plural': 'Riwayat Proses Rekomendasi',
+            },
+        ),
+        migrations.CreateModel(
+            name='BookRecommendation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rank', models.PositiveSmallIntegerField(verbose_name='Urutan')),
+                ('score', models.FloatField(verbose_name='Skor')),
+                ('book', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='recommendations', to='library.book', verbose_name='Buku')),
+                ('recommended', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='library.book', verbose_name='Buku Direkomendasikan')),
+            ],
+            options={
+                'verbose_name': 'Rekomendasi Buku',
+                'verbose_name_plural': 'Rekomendasi Buku',
+                'constraints': [models.UniqueConstraint(fields=('book', 'rank'), name='book_recommendation_rank_uniq')],
+            },
+        ),
+    ]
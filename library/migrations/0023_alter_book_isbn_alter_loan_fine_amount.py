@@ -0,0 +1,23 @@
+# Generated by Django 5.2.8 on 2026-10-17 23:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0022_recommendations'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='book',
+            name='isbn',
+            field=models.CharField(default='-', max_length=13, verbose_name='ISBN'),
+        ),
+        migrations.AlterField(
+            model_name='loan',
+            name='fine_amount',
+            field=models.DecimalField(decimal_places=2, default=0.0, max_digits=10, verbose_name='Jumlah Denda (Rp)'),
+        ),
+    ]
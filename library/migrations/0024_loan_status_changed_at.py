@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-17 23:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0023_alter_book_isbn_alter_loan_fine_amount'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='loan',
+            name='status_changed_at',
+            field=models.DateTimeField(blank=True, db_index=True, editable=False, null=True),
+        ),
+    ]
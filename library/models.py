@@ -3,7 +3,11 @@
 from datetime import date
 from django.db import models
 from django.contrib.auth.models import User
-from django.db.models import Avg
+from django.utils import timezone
+from django.db.models import Avg, Sum, Count, OuterRef, Subquery, Value, F
+from django.db.models.functions import Coalesce, Greatest
+
+from .functions import DaysBetween
 
 # --- 1. Master Data Models ---
 
@@ -46,6 +50,8 @@ class Author(models.Model):
 class Book(models.Model):
     title = models.CharField(max_length=200, verbose_name="Judul Buku")
     cover_image = models.ImageField(upload_to='book_covers/', null=True, blank=True, verbose_name="Sampul Buku")
+    # Thumbnail WebP/JPEG hasil library.thumbnails: {'source': ..., 'webp': [[lebar, nama], ...], 'jpeg': [...]}
+    cover_variants = models.JSONField(default=dict, blank=True, editable=False, verbose_name="Varian Sampul")
     genre = models.ManyToManyField(Genre, related_name='books', verbose_name="Genre") 
     authors = models.ManyToManyField(Author, related_name='books', verbose_name="Penulis")
     location = models.ForeignKey(
@@ -57,21 +63,52 @@ class Book(models.Model):
     publication_year = models.IntegerField(verbose_name="Tahun Terbit")
     stock = models.IntegerField(default=0, verbose_name="Stok Tersedia")
 
+    # Agregat rating yang disimpan (diperbarui setiap Review berubah)
+    rating_sum = models.PositiveIntegerField(default=0, editable=False, verbose_name="Total Nilai Rating")
+    rating_count = models.PositiveIntegerField(default=0, editable=False, verbose_name="Jumlah Review")
+    rating_avg = models.DecimalField(max_digits=3, decimal_places=2, default=0, editable=False, verbose_name="Rata-rata Rating")
+    # Stempel ETag/Last-Modified; UPDATE massal (stok, rating) wajib ikut mengisinya
+    updated_at = models.DateTimeField(auto_now=True, db_index=True, verbose_name="Terakhir Diubah")
+
     class Meta:
         verbose_name = "Buku"
         verbose_name_plural = "Daftar Buku"
+        indexes = [
+            # Untuk sort=rating di book_list
+            models.Index(fields=['-rating_avg', 'title'], name='book_rating_idx'),
+        ]
 
     def __str__(self):
         return self.title
 
     @property
     def average_rating(self):
-        avg = self.reviews.aggregate(Avg('rating'))['rating__avg']
-        return round(avg, 1) if avg else 0.0
+        return round(float(self.rating_avg), 1)
 
     @property
     def total_reviews(self):
-        return self.reviews.count()
+        return self.rating_count
+
+    @property
+    def first_author(self):
+        """Penulis pertama; memakai hasil prefetch_related('authors') bila ada."""
+        authors = list(self.authors.all())
+        return authors[0] if authors else None
+
+    @staticmethod
+    def refresh_ratings(book_ids=None):
+        """Menghitung ulang agregat rating dalam satu UPDATE (atomik per statement)."""
+        reviews = Review.objects.filter(book=OuterRef('pk')).order_by().values('book')
+        books = Book.objects.all() if book_ids is None else Book.objects.filter(pk__in=book_ids)
+        return books.update(
+            updated_at=timezone.now(),
+            rating_sum=Coalesce(Subquery(reviews.annotate(s=Sum('rating')).values('s')), Value(0)),
+            rating_count=Coalesce(Subquery(reviews.annotate(c=Count('id')).values('c')), Value(0)),
+            rating_avg=Coalesce(
+                Subquery(reviews.annotate(a=Avg('rating')).values('a')), Value(0),
+                output_field=models.DecimalField(max_digits=3, decimal_places=2)
+            ),
+        )
 
 
 # --- 3. Interaction Models ---
@@ -84,6 +121,7 @@ class Review(models.Model):
     rating = models.PositiveSmallIntegerField(choices=RATING_CHOICES, default=5, verbose_name="Rating")
     comment = models.TextField(verbose_name="Isi Review")
     created_at = models.DateTimeField(auto_now_add=True, verbose_name="Tanggal Review")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Terakhir Diubah")
 
     class Meta:
         verbose_name = "Review Buku"
@@ -114,11 +152,32 @@ class Loan(models.Model):
     
     fine_amount = models.DecimalField(max_digits=10, decimal_places=2, default=0.00, verbose_name="Jumlah Denda (Rp)")
     is_paid = models.BooleanField(default=False, verbose_name="Denda Sudah Dibayar")
+    # Denda berjalan yang dimaterialisasi oleh command materialize_fines
+    accrued_fine = models.DecimalField(
+        max_digits=10, decimal_places=2, default=0, editable=False, db_index=True,
+        verbose_name="Denda Berjalan (Rp)"
+    )
     created_at = models.DateTimeField(auto_now_add=True)
+    # Diisi setiap transisi status; run rekomendasi inkremental membaca ulang pinjaman yang berubah
+    status_changed_at = models.DateTimeField(null=True, blank=True, editable=False, db_index=True)
 
     class Meta:
         verbose_name = "Peminjaman"
         verbose_name_plural = "Daftar Peminjaman"
+        indexes = [
+            # profile (approved per anggota urut jatuh tempo), status akun, request_loan
+            models.Index(fields=['member', 'status', 'due_date'], name='loan_member_status_due_idx'),
+            # my_loans (urut terbaru per anggota)
+            models.Index(fields=['member', '-id'], name='loan_member_recent_idx'),
+            # my_loans ?status=not-paid (indeks parsial: hanya baris berdenda yang belum lunas)
+            models.Index(
+                fields=['member', '-id'], name='loan_member_unpaid_idx',
+                condition=models.Q(is_paid=False, accrued_fine__gt=0),
+            ),
+            # LoanAdmin (filter status, urut jatuh tempo) & pemindaian pinjaman terlambat
+            models.Index(fields=['status', 'due_date'], name='loan_status_due_idx'),
+            models.Index(fields=['borrow_date'], name='loan_borrow_date_idx'),
+        ]
 
     def __str__(self):
         return f"{self.member.username} - {self.book.title} ({self.get_status_display()})"
@@ -143,15 +202,102 @@ class Loan(models.Model):
             return delay * self.FINE_PER_DAY
         return 0
 
+    @classmethod
+    def final_fine_expression(cls, return_date=None):
+        """Versi SQL dari calculate_final_fine() untuk UPDATE massal."""
+        delay = DaysBetween(return_date if return_date is not None else F('return_date'), F('due_date'))
+        return Greatest(Coalesce(delay, Value(0)), Value(0)) * Value(cls.FINE_PER_DAY)
+
+    @classmethod
+    def running_fine_expression(cls, today):
+        """Versi SQL dari current_fine untuk pinjaman approved per tanggal ``today``."""
+        delay = DaysBetween(Value(today), F('due_date'))
+        return Greatest(Coalesce(delay, Value(0)), Value(0)) * Value(cls.FINE_PER_DAY)
+
     def save(self, *args, **kwargs):
         # Otomatis hitung denda jika status berubah jadi returned
         if self.status == 'returned' and self.return_date:
             self.fine_amount = self.calculate_final_fine()
+        self.accrued_fine = self.current_fine
         super().save(*args, **kwargs)
 
     @staticmethod
     def can_user_borrow(user):
         """Cek kelayakan user: tidak ada denda unpaid dan tidak ada buku overdue."""
-        has_unpaid = Loan.objects.filter(member=user, is_paid=False, fine_amount__gt=0).exists()
-        has_overdue = Loan.objects.filter(member=user, status='approved', due_date__lt=date.today()).exists()
-        return not (has_unpaid or has_overdue)
\ No newline at end of file
+        from .account import compute_account_state
+        return compute_account_state(user.pk).can_borrow
+
+# --- 4. Impor Katalog ---
+
+class BookImport(models.Model):
+    """Posisi terakhir command ``import_books`` untuk satu file sumber.
+
+    ``position`` (jumlah rekaman yang sudah dibaca) ditulis di transaksi yang
+    sama dengan batch bukunya, jadi impor yang terputus bisa dilanjutkan
+    tanpa menggandakan buku.
+    """
+
+    source = models.CharField(max_length=255, unique=True, verbose_name="File Sumber")
+    position = models.PositiveBigIntegerField(default=0, verbose_name="Rekaman Dibaca")
+    created_books = models.PositiveBigIntegerField(default=0, verbose_name="Buku Dibuat")
+    skipped = models.PositiveBigIntegerField(default=0, verbose_name="Rekaman Dilewati")
+    started_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = "Impor Katalog"
+        verbose_name_plural = "Riwayat Impor Katalog"
+
+    def __str__(self):
+        return self.source
+
+
+# --- 5. Rekomendasi ---
+
+class BookRecommendation(models.Model):
+    """Tetangga teratas satu buku ("pembaca juga meminjam") hasil ``build_recommendations``.
+
+    Dibaca halaman detail dengan satu query lewat indeks unik (book, rank).
+    """
+
+    book = models.ForeignKey(Book, on_delete=models.CASCADE, related_name='recommendations', verbose_name="Buku")
+    recommended = models.ForeignKey(Book, on_delete=models.CASCADE, related_name='+', verbose_name="Buku Direkomendasikan")
+    rank = models.PositiveSmallIntegerField(verbose_name="Urutan")
+    # Kemiripan kosinus: anggota yang sama / sqrt(pembaca buku ini x pembaca rekomendasi)
+    score = models.FloatField(verbose_name="Skor")
+
+    class Meta:
+        verbose_name = "Rekomendasi Buku"
+        verbose_name_plural = "Rekomendasi Buku"
+        constraints = [
+            models.UniqueConstraint(fields=['book', 'rank'], name='book_recommendation_rank_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.book_id} -> {self.recommended_id} (#{self.rank})"
+
+
+class RecommendationRun(models.Model):
+    """Satu eksekusi ``build_recommendations``.
+
+    ``last_loan_id``/``last_review_id`` adalah pk tertinggi yang sudah
+    diperhitungkan; run inkremental berikutnya hanya memproses anggota yang
+    punya pinjaman/review setelahnya, ditambah pinjaman yang
+    ``status_changed_at``-nya setelah ``started_at`` run ini.
+    """
+
+    full = models.BooleanField(default=False, verbose_name="Bangun Ulang Penuh")
+    last_loan_id = models.PositiveBigIntegerField(default=0, verbose_name="Pinjaman Terakhir")
+    last_review_id = models.PositiveBigIntegerField(default=0, verbose_name="Review Terakhir")
+    books_scanned = models.PositiveIntegerField(default=0, verbose_name="Buku Dihitung")
+    books_changed = models.PositiveIntegerField(default=0, verbose_name="Buku Berubah")
+    started_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = "Proses Rekomendasi"
+        verbose_name_plural = "Riwayat Proses Rekomendasi"
+
+    def __str__(self):
+        return f"{'Penuh' if self.full else 'Inkremental'} {self.started_at:%Y-%m-%d %H:%M}"
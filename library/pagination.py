@@ -0,0 +1,186 @@
+# library/pagination.py
+
+"""Pagination berbasis cursor (keyset/seek).
+
+Berbeda dengan ``Paginator`` bawaan Django yang memakai ``COUNT(*)`` dan
+``OFFSET``, halaman diambil dengan ``WHERE (kolom urut) > (nilai terakhir)``
+sehingga halaman ke-5000 sama murahnya dengan halaman pertama.
+"""
+
+import base64
+import binascii
+import hashlib
+import json
+
+from django.core.cache import cache
+from django.core.exceptions import EmptyResultSet, ValidationError
+from django.core.paginator import Paginator
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+
+COUNT_CACHE_TIMEOUT = 60  # detik
+
+
+# --- 1. Cursor ---
+
+def encode_cursor(values, direction):
+    raw = json.dumps({'v': values, 'd': direction}, cls=DjangoJSONEncoder, separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Mengembalikan ``(values, direction)``; cursor rusak dianggap halaman pertama."""
+    if not cursor:
+        return None, 'next'
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        data = json.loads(raw)
+        values, direction = data['v'], data['d']
+    except (binascii.Error, ValueError, TypeError, KeyError):
+        return None, 'next'
+    if direction not in ('next', 'prev') or not isinstance(values, list):
+        return None, 'next'
+    return values, direction
+
+
+# --- 2. Paginator ---
+
+class CursorPage:
+    is_cursor = True
+
+    def __init__(self, object_list, next_cursor, previous_cursor):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class CursorPaginator:
+    """Paginator keyset. Kolom terakhir pada ``ordering`` harus unik (mis. ``id``)."""
+
+    def __init__(self, queryset, per_page, ordering):
+        self.queryset = queryset
+        self.per_page = per_page
+        self.ordering = list(ordering)
+        self.fields = [(f.lstrip('-'), f.startswith('-')) for f in self.ordering]
+
+    def _seek_filter(self, values, backwards):
+        # (a, b, c) > (x, y, z)  ==  a > x OR (a = x AND b > y) OR (a = x AND b = y AND c > z)
+        condition = Q()
+        for i, (name, descending) in enumerate(self.fields):
+            lookup = {self.fields[j][0]: values[j] for j in range(i)}
+            lookup[f"{name}__{'lt' if descending != backwards else 'gt'}"] = values[i]
+            condition |= Q(**lookup)
+        return condition
+
+    def _key(self, obj):
+        return [getattr(obj, name) for name, _ in self.fields]
+
+    def _field(self, name):
+        annotation = self.queryset.query.annotations.get(name)
+        if annotation is not None:
+            return annotation.output_field
+        return self.queryset.model._meta.get_field(name)
+
+    def _clean(self, values):
+        """Nilai cursor sesuai tipe kolom urut; ``None`` jika cursor rusak/dipalsukan."""
+        if len(values) != len(self.fields):
+            return None
+        cleaned = []
+        try:
+            for (name, _), value in zip(self.fields, values):
+                if value is None:
+                    return None
+                field = self._field(name)
+                value = field.to_python(value)
+                field.run_validators(value)
+                cleaned.append(value)
+        except (ValidationError, ValueError, TypeError):
+            return None
+        return cleaned
+
+    def get_page(self, cursor):
+        values, direction = decode_cursor(cursor)
+        if values is not None:
+            values = self._clean(values)
+            if values is None:
+                direction = 'next'
+        backwards = direction == 'prev'
+
+        queryset = self.queryset
+        if values is not None:
+            queryset = queryset.filter(self._seek_filter(values, backwards))
+        if backwards:
+            queryset = queryset.order_by(*[
+                name if descending else f'-{name}' for name, descending in self.fields
+            ])
+        else:
+            queryset = queryset.order_by(*self.ordering)
+
+        rows = list(queryset[:self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if backwards:
+            rows.reverse()
+            has_next, has_previous = values is not None, has_more
+        else:
+            has_next, has_previous = has_more, values is not None
+
+        next_cursor = encode_cursor(self._key(rows[-1]), 'next') if rows and has_next else None
+        previous_cursor = encode_cursor(self._key(rows[0]), 'prev') if rows and has_previous else None
+        return CursorPage(rows, next_cursor, previous_cursor)
+
+
+# --- 3. Total (di-cache) ---
+
+def cached_count(queryset, timeout=COUNT_CACHE_TIMEOUT):
+    """``COUNT(*)`` yang disimpan sementara di cache, kunci berdasarkan SQL query."""
+    try:
+        sql, params = queryset.order_by().query.sql_with_params()
+    except EmptyResultSet:
+        # Mis. filter id__in=[] (pencarian tanpa hasil): tidak perlu query
+        return 0
+    key = 'count:' + hashlib.md5(f'{sql}|{params!r}'.encode()).hexdigest()
+    total = cache.get(key)
+    if total is None:
+        total = queryset.count()
+        cache.set(key, total, timeout)
+    return total
+
+
+# --- 4. Helper untuk View ---
+
+def paginate(request, queryset, per_page, ordering):
+    """Mode cursor (``?cursor=``) secara default; ``?page=`` tetap didukung untuk tautan lama."""
+    queryset = queryset.order_by(*ordering)
+    page_number = request.GET.get('page')
+    if page_number:
+        page = Paginator(queryset, per_page).get_page(page_number)
+        # Dievaluasi di sini (bukan saat render) agar aman dipakai view async
+        page.object_list = list(page.object_list)
+        return page
+    return CursorPaginator(queryset, per_page, ordering).get_page(request.GET.get('cursor'))
+
+
+def page_total(page, queryset):
+    """Total baris: dari Paginator jika mode nomor halaman, selain itu dari cache."""
+    if getattr(page, 'is_cursor', False):
+        return cached_count(queryset)
+    return page.paginator.count
@@ -0,0 +1,214 @@
+# library/recommendations.py
+
+"""Rekomendasi "pembaca juga meminjam" dari riwayat pinjaman dan review.
+
+* Sinyal: pasangan (anggota, buku) dari pinjaman yang tidak ditolak dan
+  review dengan rating ``MIN_RATING`` ke atas. Pinjaman berulang dihitung
+  sekali.
+* Kemiripan dua buku adalah kosinus kolom matriks anggota x buku:
+  ``anggota yang sama / sqrt(pembaca A x pembaca B)``. Matriksnya tidak
+  pernah dibentuk utuh. Buku target diproses per potongan ``chunk_size``:
+  keranjang anggota yang pernah membaca buku di potongan itu dibaca sekali
+  (urut anggota, dua sumber digabung dengan ``heapq.merge``), ko-okurensinya
+  dihitung dengan ``Counter``, lalu skornya ditulis dan Counter dibuang.
+  Memori dibatasi oleh pasangan buku milik satu potongan, bukan seluruh
+  katalog atau jumlah pinjaman.
+* Jumlah pembaca per buku dihitung di database (dua agregat), jadi potongan
+  tidak perlu memindai seluruh riwayat.
+* Run inkremental hanya menghitung ulang buku milik anggota yang punya
+  pinjaman/review baru sejak run terakhir (``RecommendationRun``) atau
+  pinjaman yang statusnya berubah sejak run terakhir dimulai
+  (``Loan.status_changed_at``, misalnya penolakan), ditambah buku dari
+  pinjaman itu sendiri. Skor tetangga lain yang hanya bergeser karena jumlah
+  pembaca bertambah, serta pinjaman/review yang dihapus, baru terlihat di
+  ``--full``.
+* Hanya buku yang daftar tetangganya berubah yang ditulis ulang. Buku itu
+  juga mendapat ``updated_at`` baru dan cache-nya diinvalidasi agar ETag
+  halaman detail ikut berubah.
+"""
+
+import heapq
+import math
+from collections import Counter, defaultdict
+from itertools import groupby
+from operator import itemgetter
+
+from django.db import transaction
+from django.db.models import Count, Exists, Max, OuterRef, Q
+from django.utils import timezone
+
+from .caching import bump_books
+from .exports import iterate
+from .models import Book, BookRecommendation, Loan, RecommendationRun, Review
+
+TOP_K = 8
+MIN_RATING = 4
+MIN_SUPPORT = 2       # Minimal anggota yang sama agar pasangan dianggap bermakna
+CHUNK_SIZE = 500
+
+
+def _chunks(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+# --- 1. Sumber Sinyal ---
+
+def _sources():
+    """``(queryset, kolom anggota)`` untuk setiap sumber interaksi."""
+    return (
+        (Loan.objects.exclude(status='rejected'), 'member_id'),
+        (Review.objects.filter(rating__gte=MIN_RATING), 'user_id'),
+    )
+
+
+def members_of(book_ids):
+    """Subquery id anggota yang pernah meminjam/mereview salah satu buku."""
+    return [queryset.filter(book_id__in=book_ids).values(column) for queryset, column in _sources()]
+
+
+def baskets(members=None, chunk_size=CHUNK_SIZE):
+    """``(member_id, {book_id, ...})`` urut anggota; ``members`` = daftar subquery (``None`` = semua)."""
+    streams = []
+    for queryset, column in _sources():
+        if members is not None:
+            condition = Q()
+            for subquery in members:
+                condition |= Q(**{f'{column}__in': subquery})
+            queryset = queryset.filter(condition)
+        rows = queryset.order_by(column, 'book_id', 'pk').values_list(column, 'book_id')
+        streams.append(iterate(rows, chunk_size))
+    for member, rows in groupby(heapq.merge(*streams), key=itemgetter(0)):
+        yield member, {book for _, book in rows}
+
+
+def readers(book_ids, chunk_size=CHUNK_SIZE):
+    """``{book_id: jumlah anggota berbeda}`` lintas pinjaman dan review."""
+    counts = Counter()
+    borrowed = Loan.objects.exclude(status='rejected').filter(book_id=OuterRef('book_id'), member_id=OuterRef('user_id'))
+    for chunk in _chunks(sorted(book_ids), chunk_size):
+        loans = (
+            Loan.objects.exclude(status='rejected').filter(book_id__in=chunk)
+            .order_by().values('book_id').annotate(n=Count('member_id', distinct=True))
+        )
+        # Review dari anggota yang juga meminjam sudah terhitung di atas
+        reviews = (
+            Review.objects.filter(book_id__in=chunk, rating__gte=MIN_RATING).exclude(Exists(borrowed))
+            .order_by().values('book_id').annotate(n=Count('id'))
+        )
+        for row in [*loans, *reviews]:
+            counts[row['book_id']] += row['n']
+    return counts
+
+
+# --- 2. Perhitungan ---
+
+def cooccurrence(targets, members=None, chunk_size=CHUNK_SIZE):
+    """``{book_id: Counter({other_id: anggota yang sama})}`` dalam satu lintasan keranjang.
+
+    ``members``: subquery anggota yang dibaca (``None`` = semua anggota).
+    Dipanggil per potongan target agar jumlah Counter yang hidup terbatas.
+    """
+    targets = set(targets)
+    co = defaultdict(Counter)
+    for _, books in baskets(members, chunk_size):
+        for book in books & targets:
+            counts = co[book]
+            for other in books:
+                if other != book:
+                    counts[other] += 1
+    return co
+
+
+def neighbours(targets, co, top_k=TOP_K, min_support=MIN_SUPPORT, chunk_size=CHUNK_SIZE):
+    """``{book_id: [(recommended_id, skor), ...]}`` untuk setiap buku di ``targets``."""
+    co = {book: co.get(book, Counter()) for book in targets}
+    totals = readers(set(targets).union(*co.values()), chunk_size)
+    result = {}
+    for book, counts in co.items():
+        scored = [
+            (count / math.sqrt(max(totals[book], 1) * max(totals[other], 1)), count, other)
+            for other, count in counts.items() if count >= min_support
+        ]
+        best = heapq.nsmallest(top_k, scored, key=lambda item: (-item[0], -item[1], item[2]))
+        result[book] = [(other, score) for score, _, other in best]
+    return result
+
+
+def save(recommendations, invalidate=True):
+    """Menulis ulang buku yang daftar tetangganya berubah; mengembalikan id-nya.
+
+    ``invalidate=False``: cache per buku tidak dinaikkan (run penuh menaikkan
+    versi semua buku sekali di akhir).
+    """
+    current = defaultdict(list)
+    rows = (
+        BookRecommendation.objects.filter(book_id__in=list(recommendations))
+        .order_by('book_id', 'rank').values_list('book_id', 'recommended_id')
+    )
+    for book, recommended in rows:
+        current[book].append(recommended)
+    changed = [
+        book for book, items in recommendations.items()
+        if [other for other, _ in items] != current[book]
+    ]
+    if not changed:
+        return changed
+    with transaction.atomic():
+        BookRecommendation.objects.filter(book_id__in=changed).delete()
+        BookRecommendation.objects.bulk_create([
+            BookRecommendation(book_id=book, recommended_id=other, rank=rank, score=score)
+            for book in changed
+            for rank, (other, score) in enumerate(recommendations[book], start=1)
+        ])
+        Book.objects.filter(pk__in=changed).update(updated_at=timezone.now())
+        if invalidate:
+            bump_books(changed)
+    return changed
+
+
+# --- 3. Run Penuh & Inkremental ---
+
+def build(full=False, top_k=TOP_K, min_support=MIN_SUPPORT, chunk_size=CHUNK_SIZE, progress=None):
+    """Menjalankan satu ``RecommendationRun``; inkremental jika ada run sebelumnya yang selesai."""
+    previous = RecommendationRun.objects.filter(finished_at__isnull=False).order_by('-pk').first()
+    full = full or previous is None
+    # Batas atas ditentukan di awal: pinjaman/review yang masuk selama run diproses run berikutnya.
+    run = RecommendationRun.objects.create(
+        full=full,
+        last_loan_id=Loan.objects.aggregate(last=Max('pk'))['last'] or 0,
+        last_review_id=Review.objects.aggregate(last=Max('pk'))['last'] or 0,
+    )
+
+    if full:
+        targets = list(Book.objects.order_by('pk').values_list('pk', flat=True))
+    else:
+        # Semua status: pinjaman yang kini ditolak tetap menandai anggota & bukunya.
+        # Perubahan status diukur dari awal run sebelumnya, jadi yang terjadi selama run itu ikut.
+        loans = Loan.objects.filter(
+            Q(pk__gt=previous.last_loan_id, pk__lte=run.last_loan_id)
+            | Q(status_changed_at__gte=previous.started_at)
+        )
+        new = [
+            loans.values('member_id'),
+            Review.objects.filter(rating__gte=MIN_RATING)
+            .filter(pk__gt=previous.last_review_id, pk__lte=run.last_review_id).values('user_id'),
+        ]
+        targets = {book for _, books in baskets(new, chunk_size) for book in books}
+        targets.update(loans.values_list('book_id', flat=True))
+        targets = sorted(targets)
+
+    for chunk in _chunks(targets, chunk_size):
+        co = cooccurrence(chunk, members_of(chunk), chunk_size)
+        changed = save(neighbours(chunk, co, top_k, min_support, chunk_size), invalidate=not full)
+        run.books_scanned += len(chunk)
+        run.books_changed += len(changed)
+        run.save(update_fields=['books_scanned', 'books_changed'])
+        if progress:
+            progress(run, len(targets))
+
+    if full and run.books_changed:
+        bump_books()
+    run.finished_at = timezone.now()
+    run.save(update_fields=['finished_at'])
+    return run
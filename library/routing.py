@@ -0,0 +1,183 @@
+# library/routing.py
+
+"""Pembacaan dari replika database untuk katalog dan laporan.
+
+* ``DATABASE_REPLICAS`` (dari ``REPLICA_DATABASE_URLS``) berisi alias
+  replika. Tanpa replika semua fungsi di sini tidak berpengaruh.
+* View yang boleh membaca dari replika ditandai ``@replica_reads``; satu
+  replika dipilih per request dan dibawa ``ContextVar`` (ikut ke thread
+  ``sync_to_async`` seperti instrumentasi). Di luar view bertanda, semua
+  query tetap ke primary.
+* Hanya model di ``REPLICA_APPS`` yang dibaca dari replika. Sesi, user dan
+  cache database selalu dari primary agar login & invalidasi versi tidak
+  terlambat.
+* Replika yang menunjuk database yang sama dengan primary dilewati. Saat
+  test, replika menjadi mirror database test (``TEST.MIRROR``) lewat koneksi
+  terpisah yang tidak melihat transaksi ``TestCase``; baca tetap ke default.
+* Read-your-writes: ``ReplicaMiddleware`` memberi cookie sticky selama
+  ``REPLICA_STICKY_SECONDS`` setelah request yang menulis model tersebut,
+  sehingga redirect berikutnya (mis. setelah kirim review) membaca primary.
+* Pengisian cache bersama selalu membaca primary (``primary_reads``). Versi
+  cache dinaikkan saat commit di primary; data dari replika yang tertinggal
+  tidak boleh tersimpan dengan versi baru. Ini berlaku untuk halaman anonim
+  (``cache_anonymous_page``), fragmen detail buku dan facet. Fragmen kartu
+  katalog tidak memakai primary karena kuncinya memuat ``updated_at`` baris
+  yang dirender. Dengan begitu, hasil dari replika hanya bisa basi selama
+  lag replika, bukan selama TTL cache.
+"""
+
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+REPLICA_APPS = {'library'}
+
+_replica = ContextVar('replica_alias', default=None)
+_request = ContextVar('replica_request_state', default=None)
+
+
+class RequestState:
+    __slots__ = ('pinned', 'wrote')
+
+    def __init__(self, pinned):
+        self.pinned = pinned
+        self.wrote = False
+
+
+# --- 1. Router ---
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        alias = _replica.get()
+        if alias and model._meta.app_label in REPLICA_APPS:
+            return alias
+        return None
+
+    def db_for_write(self, model, **hints):
+        state = _request.get()
+        if state is not None and model._meta.app_label in REPLICA_APPS:
+            state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replika berisi data yang sama dengan primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db not in settings.DATABASE_REPLICAS
+
+
+# --- 2. Penanda View ---
+
+def _database(settings_dict):
+    return settings_dict['NAME'], settings_dict.get('HOST'), settings_dict.get('PORT')
+
+
+def replica_aliases():
+    primary = _database(connections[DEFAULT_DB_ALIAS].settings_dict)
+    return [
+        alias for alias in settings.DATABASE_REPLICAS
+        if alias not in connections.settings or _database(connections[alias].settings_dict) != primary
+    ]
+
+
+def choose_replica():
+    """Alias replika untuk request ini, atau ``None`` (tanpa replika / sticky ke primary)."""
+    state = _request.get()
+    if not settings.DATABASE_REPLICAS or (state is not None and state.pinned):
+        return None
+    aliases = replica_aliases()
+    return random.choice(aliases) if aliases else None
+
+
+def replica_reads(view):
+    """Decorator view (sinkron atau async): query baca model katalog ke replika."""
+    if iscoroutinefunction(view):
+        @wraps(view)
+        async def wrapper(*args, **kwargs):
+            token = _replica.set(choose_replica())
+            try:
+                return await view(*args, **kwargs)
+            finally:
+                _replica.reset(token)
+    else:
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            token = _replica.set(choose_replica())
+            try:
+                return view(*args, **kwargs)
+            finally:
+                _replica.reset(token)
+    return wrapper
+
+
+@contextmanager
+def primary_reads():
+    """Query baca di dalam blok ke primary, juga di dalam view ``@replica_reads``."""
+    token = _replica.set(None)
+    try:
+        yield
+    finally:
+        _replica.reset(token)
+
+
+class ReplicaChangelistMixin:
+    """ModelAdmin: changelist (GET) dan ekspor dibaca dari replika; action tetap ke primary."""
+
+    def changelist_view(self, request, extra_context=None):
+        if request.method != 'GET':
+            return super().changelist_view(request, extra_context)
+        return replica_reads(super().changelist_view)(request, extra_context)
+
+    def export_view(self, request, fmt):
+        return replica_reads(super().export_view)(request, fmt)
+
+
+# --- 3. Sticky Setelah Menulis ---
+
+def _finish(request, response, state):
+    if state.wrote and settings.DATABASE_REPLICAS:
+        response.set_cookie(
+            settings.REPLICA_STICKY_COOKIE, '1', max_age=settings.REPLICA_STICKY_SECONDS,
+            httponly=True, samesite='Lax', secure=request.is_secure(),
+        )
+
+
+class ReplicaMiddleware:
+    """Mencatat apakah request menulis; pasang sebelum middleware yang menulis (sesi, pesan)."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        state = RequestState(settings.REPLICA_STICKY_COOKIE in request.COOKIES)
+        token = _request.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _request.reset(token)
+        _finish(request, response, state)
+        return response
+
+    async def __acall__(self, request):
+        state = RequestState(settings.REPLICA_STICKY_COOKIE in request.COOKIES)
+        token = _request.set(state)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _request.reset(token)
+        _finish(request, response, state)
+        return response
@@ -0,0 +1,243 @@
+# library/search.py
+
+"""Indeks pencarian full-text untuk katalog buku.
+
+PostgreSQL memakai tabel bayangan berisi kolom ``tsvector`` dengan indeks GIN,
+SQLite memakai tabel virtual FTS5. Backend lain (atau SQLite tanpa FTS5)
+otomatis kembali ke pencarian ``icontains`` biasa di ``book_list``.
+
+Hasil pencarian tidak diambil sebagai daftar ID: ``search_books``
+menambahkan subquery indeks ke queryset buku (filter ``id IN`` dan
+anotasi ``search_rank``), sehingga filter facet, jumlah hasil dan
+pagination keyset berjalan di SQL yang sama tanpa batas jumlah hasil.
+"""
+
+import re
+
+from django.db import DatabaseError, connection as default_connection, connections
+from django.db.models import FloatField, Value
+from django.db.models.expressions import RawSQL
+
+SEARCH_TABLE = 'library_book_search'
+INDEX_BATCH_SIZE = 500
+MAX_QUERY_TOKENS = 8
+
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+# Bobot kolom: judul & ISBN paling penting, deskripsi paling ringan
+_PG_WEIGHTS = (('title', 'A'), ('isbn', 'A'), ('authors', 'B'), ('genres', 'C'), ('description', 'D'))
+_FTS5_BM25 = 'bm25({table}, 10.0, 10.0, 5.0, 2.0, 1.0)'.format(table=SEARCH_TABLE)
+
+
+# --- 1. Skema (dipanggil dari migrasi) ---
+
+def create_index(schema_editor):
+    """Membuat tabel indeks sesuai vendor database."""
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute(
+            f"CREATE TABLE {SEARCH_TABLE} ("
+            f" book_id bigint PRIMARY KEY REFERENCES library_book(id) ON DELETE CASCADE DEFERRABLE INITIALLY DEFERRED,"
+            f" document tsvector NOT NULL)"
+        )
+        schema_editor.execute(f"CREATE INDEX {SEARCH_TABLE}_document_gin ON {SEARCH_TABLE} USING GIN (document)")
+    elif vendor == 'sqlite':
+        try:
+            schema_editor.execute(
+                f"CREATE VIRTUAL TABLE {SEARCH_TABLE} USING fts5("
+                f"title, isbn, authors, genres, description, tokenize='unicode61 remove_diacritics 2')"
+            )
+        except DatabaseError:
+            # SQLite dikompilasi tanpa FTS5: pencarian tetap jalan lewat LIKE
+            pass
+
+
+def drop_index(schema_editor):
+    if schema_editor.connection.vendor in ('postgresql', 'sqlite'):
+        schema_editor.execute(f"DROP TABLE IF EXISTS {SEARCH_TABLE}")
+
+
+# --- 2. Sinkronisasi Dokumen ---
+
+def _document(book):
+    return {
+        'title': book.title or '',
+        'isbn': book.isbn or '',
+        'authors': ' '.join(a.name for a in book.authors.all()),
+        'genres': ' '.join(g.name for g in book.genre.all()),
+        'description': book.description or '',
+    }
+
+
+def _write_documents(cursor, vendor, documents):
+    """``documents``: list ``(book_id, dict _document)``."""
+    if vendor == 'postgresql':
+        vector = ' || '.join(f"setweight(to_tsvector('simple', %s), '{w}')" for _, w in _PG_WEIGHTS)
+        sql = (
+            f"INSERT INTO {SEARCH_TABLE} (book_id, document) VALUES (%s, {vector}) "
+            f"ON CONFLICT (book_id) DO UPDATE SET document = EXCLUDED.document"
+        )
+        rows = [[pk] + [doc[name] for name, _ in _PG_WEIGHTS] for pk, doc in documents]
+        cursor.executemany(sql, rows)
+    else:
+        ids = [pk for pk, _ in documents]
+        cursor.execute(
+            f"DELETE FROM {SEARCH_TABLE} WHERE rowid IN ({', '.join(['%s'] * len(ids))})", ids
+        )
+        rows = [
+            [pk, doc['title'], doc['isbn'], doc['authors'], doc['genres'], doc['description']]
+            for pk, doc in documents
+        ]
+        cursor.executemany(
+            f"INSERT INTO {SEARCH_TABLE} (rowid, title, isbn, authors, genres, description) "
+            f"VALUES (%s, %s, %s, %s, %s, %s)",
+            rows,
+        )
+
+
+def index_documents(documents, connection=None):
+    """Menulis dokumen yang sudah dirakit pemanggil (impor massal) tanpa membaca ulang buku.
+
+    ``documents``: iterable ``(book_id, {'title', 'isbn', 'authors', 'genres', 'description'})``
+    dengan ``authors``/``genres`` berupa string nama dipisah spasi.
+    """
+    connection = connection or default_connection
+    documents = list(documents)
+    if not documents or connection.vendor not in ('postgresql', 'sqlite'):
+        return 0
+    with connection.cursor() as cursor:
+        for start in range(0, len(documents), INDEX_BATCH_SIZE):
+            try:
+                _write_documents(cursor, connection.vendor, documents[start:start + INDEX_BATCH_SIZE])
+            except DatabaseError:
+                if connection.vendor == 'sqlite':
+                    return 0  # Tabel FTS5 tidak tersedia
+                raise
+    return len(documents)
+
+
+def reindex_queryset(queryset, connection=None):
+    """Menulis ulang dokumen indeks untuk semua buku pada queryset (per batch)."""
+    connection = connection or default_connection
+    if connection.vendor not in ('postgresql', 'sqlite'):
+        return 0
+
+    total = 0
+    queryset = queryset.order_by('pk').prefetch_related('authors', 'genre')
+    last_pk = None
+    with connection.cursor() as cursor:
+        while True:
+            batch_qs = queryset if last_pk is None else queryset.filter(pk__gt=last_pk)
+            batch = list(batch_qs[:INDEX_BATCH_SIZE])
+            if not batch:
+                break
+            try:
+                _write_documents(cursor, connection.vendor, [(book.pk, _document(book)) for book in batch])
+            except DatabaseError:
+                if connection.vendor == 'sqlite':
+                    return total  # Tabel FTS5 tidak tersedia
+                raise
+            total += len(batch)
+            last_pk = batch[-1].pk
+    return total
+
+
+def index_books(book_ids):
+    """Memperbarui indeks untuk buku tertentu (dipanggil dari signal)."""
+    from .models import Book
+
+    book_ids = list(book_ids)
+    for start in range(0, len(book_ids), INDEX_BATCH_SIZE):
+        reindex_queryset(Book.objects.filter(pk__in=book_ids[start:start + INDEX_BATCH_SIZE]))
+
+
+def remove_books(book_ids):
+    book_ids = list(book_ids)
+    if not book_ids or default_connection.vendor not in ('postgresql', 'sqlite'):
+        return
+    column = 'book_id' if default_connection.vendor == 'postgresql' else 'rowid'
+    with default_connection.cursor() as cursor:
+        try:
+            cursor.execute(
+                f"DELETE FROM {SEARCH_TABLE} WHERE {column} IN ({', '.join(['%s'] * len(book_ids))})",
+                book_ids,
+            )
+        except DatabaseError:
+            if default_connection.vendor != 'sqlite':
+                raise
+
+
+def rebuild():
+    """Mengosongkan lalu membangun ulang seluruh indeks."""
+    from .models import Book
+
+    vendor = default_connection.vendor
+    if vendor not in ('postgresql', 'sqlite'):
+        return 0
+    with default_connection.cursor() as cursor:
+        try:
+            cursor.execute(f"DELETE FROM {SEARCH_TABLE}")
+        except DatabaseError:
+            if vendor == 'sqlite':
+                return 0
+            raise
+    return reindex_queryset(Book.objects.all())
+
+
+# --- 3. Query ---
+
+def tokenize(query):
+    return [t.lower() for t in _TOKEN_RE.findall(query or '')][:MAX_QUERY_TOKENS]
+
+
+def _has_index(connection):
+    if connection.vendor == 'postgresql':
+        return True
+    if connection.vendor != 'sqlite':
+        return False
+    # SQLite tanpa FTS5 tidak punya tabelnya (lihat create_index); diperiksa sekali per koneksi
+    available = getattr(connection, '_book_search_available', None)
+    if available is None:
+        available = SEARCH_TABLE in connection.introspection.table_names()
+        connection._book_search_available = available
+    return available
+
+
+def search_books(queryset, query):
+    """``queryset`` buku yang dibatasi ke hasil full-text, dengan anotasi ``search_rank``.
+
+    ``search_rank`` makin kecil makin relevan (urutkan ``['search_rank', 'id']``).
+    Mengembalikan ``None`` jika indeks tidak tersedia, sehingga pemanggil
+    bisa memakai pencarian LIKE sebagai cadangan.
+    """
+    # Ikut router: replika di view katalog (library.routing)
+    connection = connections[queryset.db]
+    if not _has_index(connection):
+        return None
+
+    tokens = tokenize(query)
+    if not tokens:
+        return queryset.none().annotate(search_rank=Value(0.0, output_field=FloatField()))
+
+    book_id = '{}.{}'.format(
+        connection.ops.quote_name(queryset.model._meta.db_table), connection.ops.quote_name('id'),
+    )
+    if connection.vendor == 'postgresql':
+        terms = ' & '.join(f'{t}:*' for t in tokens)
+        matches = RawSQL(
+            f"SELECT book_id FROM {SEARCH_TABLE} WHERE document @@ to_tsquery('simple', %s)", [terms],
+        )
+        rank = RawSQL(
+            f"SELECT -ts_rank(s.document, to_tsquery('simple', %s)) FROM {SEARCH_TABLE} s "
+            f"WHERE s.book_id = {book_id}",
+            [terms], output_field=FloatField(),
+        )
+    else:
+        # Setiap token sebagai prefix agar cocok untuk pencarian sambil mengetik
+        terms = ' '.join(f'"{t}"*' for t in tokens)
+        matches = RawSQL(f"SELECT rowid FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH %s", [terms])
+        rank = RawSQL(
+            f"SELECT {_FTS5_BM25} FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH %s AND rowid = {book_id}",
+            [terms], output_field=FloatField(),
+        )
+    return queryset.filter(id__in=matches).annotate(search_rank=rank)
@@ -0,0 +1,168 @@
+# library/signals.py
+
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete, m2m_changed
+from django.dispatch import receiver
+from django.utils import timezone
+
+import logging
+
+from . import search, thumbnails
+from .account import invalidate_account_state
+from .caching import bump_books, bump_version
+from .models import Book, Author, Genre, Location, Loan, Review
+
+logger = logging.getLogger(__name__)
+
+# --- Sinkronisasi Indeks Pencarian ---
+
+@receiver(post_save, sender=Book)
+def reindex_saved_book(sender, instance, raw=False, **kwargs):
+    if not raw:
+        search.index_books([instance.pk])
+
+@receiver(post_delete, sender=Book)
+def unindex_deleted_book(sender, instance, **kwargs):
+    search.remove_books([instance.pk])
+
+@receiver(m2m_changed, sender=Book.authors.through)
+@receiver(m2m_changed, sender=Book.genre.through)
+def reindex_book_relations(sender, instance, action, reverse, pk_set, **kwargs):
+    if not reverse:
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            search.index_books([instance.pk])
+        return
+
+    # Perubahan dari sisi Author/Genre: pk_set berisi ID buku
+    if action == 'pre_clear':
+        instance._search_cleared_books = list(instance.books.values_list('pk', flat=True))
+    elif action in ('post_add', 'post_remove'):
+        search.index_books(pk_set)
+    elif action == 'post_clear':
+        search.index_books(getattr(instance, '_search_cleared_books', []))
+
+@receiver(post_save, sender=Author)
+@receiver(post_save, sender=Genre)
+def reindex_renamed_books(sender, instance, created, raw=False, **kwargs):
+    # Nama penulis/genre ikut diindeks, jadi buku terkait perlu ditulis ulang
+    if not created and not raw:
+        search.index_books(instance.books.values_list('pk', flat=True))
+
+# --- Thumbnail Sampul ---
+
+@receiver(post_save, sender=Book)
+def build_cover_variants(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    if thumbnails.needs_variants(instance):
+        try:
+            thumbnails.generate_for_book(instance)
+        except Exception:
+            # Sampul rusak, format tak dikenal, storage gagal: penyimpanan buku tidak ikut gagal.
+            # Varian sampul sebelumnya dibuang agar halaman memakai file asli yang baru.
+            logger.warning("Thumbnail sampul buku %s gagal dibuat", instance.pk, exc_info=True)
+            thumbnails.clear_variants(instance)
+    elif not instance.cover_image and instance.cover_variants:
+        thumbnails.clear_variants(instance)
+
+@receiver(post_delete, sender=Book)
+def delete_cover_variants(sender, instance, **kwargs):
+    thumbnails.delete_variants(instance)
+
+# --- Agregat Rating ---
+
+@receiver(pre_save, sender=Review)
+def remember_review_book(sender, instance, raw=False, **kwargs):
+    # Review yang dipindah ke buku lain (admin) juga mengubah agregat buku lamanya
+    if not raw and not instance._state.adding:
+        instance._rating_previous_book = (
+            Review.objects.filter(pk=instance.pk).values_list('book_id', flat=True).first()
+        )
+
+@receiver(post_save, sender=Review)
+@receiver(post_delete, sender=Review)
+def refresh_book_rating(sender, instance, raw=False, **kwargs):
+    if not raw:
+        book_ids = {instance.book_id, getattr(instance, '_rating_previous_book', None)} - {None}
+        Book.refresh_ratings(book_ids)
+        bump_books(book_ids)  # rating & daftar ulasan di halaman detail
+
+# --- Invalidasi Cache Facet ---
+
+@receiver(post_save, sender=Book)
+@receiver(post_delete, sender=Book)
+@receiver(post_save, sender=Author)
+@receiver(post_delete, sender=Author)
+@receiver(post_save, sender=Genre)
+@receiver(post_delete, sender=Genre)
+@receiver(post_save, sender=Location)
+@receiver(post_delete, sender=Location)
+def invalidate_facets(sender, **kwargs):
+    bump_version('facets')
+
+@receiver(m2m_changed, sender=Book.authors.through)
+@receiver(m2m_changed, sender=Book.genre.through)
+def invalidate_facets_on_relations(sender, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        bump_version('facets')
+
+# --- Invalidasi Fragmen / Halaman Buku ---
+
+def touch_books(book_ids):
+    """Perubahan yang tidak menyimpan Book (relasi, nama penulis/genre/rak).
+
+    Menaikkan ``updated_at`` (stempel ETag) sekaligus versi cache buku.
+    """
+    book_ids = set(book_ids)
+    if book_ids:
+        Book.objects.filter(pk__in=book_ids).update(updated_at=timezone.now())
+        bump_books(book_ids)
+
+@receiver(post_save, sender=Book)
+@receiver(post_delete, sender=Book)
+def invalidate_book_pages(sender, instance, raw=False, **kwargs):
+    if not raw:
+        bump_books([instance.pk])
+
+@receiver(m2m_changed, sender=Book.authors.through)
+@receiver(m2m_changed, sender=Book.genre.through)
+def invalidate_book_pages_on_relations(sender, instance, action, reverse, pk_set, **kwargs):
+    if not reverse:
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            touch_books([instance.pk])
+        return
+
+    if action == 'pre_clear':
+        instance._page_cleared_books = list(instance.books.values_list('pk', flat=True))
+    elif action in ('post_add', 'post_remove'):
+        touch_books(pk_set)
+    elif action == 'post_clear':
+        touch_books(getattr(instance, '_page_cleared_books', []))
+
+@receiver(post_save, sender=Author)
+@receiver(post_save, sender=Genre)
+@receiver(post_save, sender=Location)
+def invalidate_renamed_book_pages(sender, instance, created, raw=False, **kwargs):
+    # Nama penulis/genre/rak dirender di kartu & halaman detail buku terkait
+    if not created and not raw:
+        touch_books(instance.books.values_list('pk', flat=True))
+
+@receiver(pre_delete, sender=Author)
+@receiver(pre_delete, sender=Genre)
+@receiver(pre_delete, sender=Location)
+def touch_books_of_deleted_relation(sender, instance, **kwargs):
+    # Selagi relasinya masih ada: stempel buku terkait ikut berubah
+    Book.objects.filter(pk__in=instance.books.values('pk')).update(updated_at=timezone.now())
+
+@receiver(post_delete, sender=Author)
+@receiver(post_delete, sender=Genre)
+@receiver(post_delete, sender=Location)
+def invalidate_all_book_pages(sender, **kwargs):
+    # Relasinya sudah terhapus, buku terkait tidak bisa dicari lagi
+    bump_books()
+
+# --- Invalidasi Status Akun Anggota ---
+
+@receiver(post_save, sender=Loan)
+@receiver(post_delete, sender=Loan)
+def invalidate_member_account(sender, instance, **kwargs):
+    invalidate_account_state([instance.member_id])
@@ -0,0 +1,123 @@
+# library/stock.py
+
+"""Reservasi stok buku untuk persetujuan & pengembalian pinjaman.
+
+Stok hanya diubah untuk pinjaman yang barisnya dikunci ``select_for_update``
+di dalam ``transaction.atomic`` (satu UPDATE per transisi), sehingga persetujuan bersamaan dari beberapa sesi admin / worker gunicorn
+tidak bisa membuat stok minus atau menyetujui satu pinjaman dua kali.
+"""
+
+from collections import Counter
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Case, F, Value, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .account import invalidate_account_state
+from .caching import bump_books
+from .models import Book, Loan
+
+LOAN_PERIOD_DAYS = 7
+
+
+# --- 1. Operasi Stok Dasar ---
+
+def adjust_many(deltas):
+    """Menerapkan perubahan stok banyak buku sekaligus (``{book_id: delta}``) dalam satu UPDATE."""
+    deltas = {book_id: delta for book_id, delta in deltas.items() if delta}
+    if not deltas:
+        return 0
+    updated = Book.objects.filter(pk__in=deltas).update(
+        stock=Case(
+            *[When(pk=book_id, then=F('stock') + delta) for book_id, delta in deltas.items()],
+            default=F('stock'),
+        ),
+        updated_at=timezone.now(),
+    )
+    bump_books(deltas)
+    return updated
+
+
+# --- 2. Transisi Massal ---
+
+def reject_loans(loans):
+    """Menolak pinjaman pending (stok belum pernah dikurangi untuk status ini)."""
+    with transaction.atomic():
+        pending = loans.filter(status='pending')
+        member_ids = list(pending.values_list('member_id', flat=True))
+        rejected = pending.update(status='rejected', status_changed_at=timezone.now())
+    invalidate_account_state(member_ids)
+    return rejected
+
+
+def approve_loans(loans, today=None):
+    """Menyetujui banyak pinjaman pending dengan jumlah query konstan.
+
+    Pinjaman dan buku terkait dikunci sekaligus, stok dialokasikan berurutan
+    (ID terkecil lebih dulu), lalu status pinjaman dan stok tiap buku ditulis
+    masing-masing dengan satu UPDATE. Mengembalikan ``(jumlah_disetujui,
+    daftar_loan_dilewati)``; loan yang dilewati sudah membawa ``loan.book``.
+    """
+    today = today or timezone.now().date()
+    with transaction.atomic():
+        pending = list(
+            loans.filter(status='pending')
+            .select_related('book')
+            .select_for_update()
+            .order_by('pk')
+        )
+        available = {loan.book_id: loan.book.stock for loan in pending}
+        approved, skipped = [], []
+        for loan in pending:
+            if available[loan.book_id] > 0:
+                available[loan.book_id] -= 1
+                approved.append(loan)
+            else:
+                skipped.append(loan)
+
+        if approved:
+            Loan.objects.filter(pk__in=[loan.pk for loan in approved]).update(
+                status='approved',
+                status_changed_at=timezone.now(),
+                borrow_date=today,
+                due_date=today + timedelta(days=LOAN_PERIOD_DAYS),
+            )
+            taken = Counter(loan.book_id for loan in approved)
+            adjust_many({book_id: -count for book_id, count in taken.items()})
+
+    invalidate_account_state(loan.member_id for loan in approved)
+    return len(approved), skipped
+
+
+def return_loans(loans, today=None):
+    """Mengembalikan banyak pinjaman approved dengan jumlah query konstan.
+
+    Tanggal kembali, status dan denda ditulis dalam satu UPDATE (denda
+    dihitung di SQL dengan aturan yang sama seperti
+    ``Loan.calculate_final_fine``), lalu stok dikembalikan per buku.
+    """
+    today = today or timezone.now().date()
+    with transaction.atomic():
+        rows = list(
+            loans.filter(status='approved')
+            .select_for_update()
+            .values_list('pk', 'book_id', 'member_id')
+        )
+        if not rows:
+            return 0
+        # Nilai kolom di sisi kanan SET adalah nilai sebelum UPDATE
+        return_date = Coalesce(F('return_date'), Value(today))
+        fine = Loan.final_fine_expression(return_date)
+        Loan.objects.filter(pk__in=[pk for pk, _, _ in rows]).update(
+            status='returned',
+            status_changed_at=timezone.now(),
+            return_date=return_date,
+            fine_amount=fine,
+            accrued_fine=fine,
+        )
+        adjust_many(Counter(book_id for _, book_id, _ in rows))
+
+    invalidate_account_state(member_id for _, _, member_id in rows)
+    return len(rows)
@@ -0,0 +1,24 @@
+# library/templatetags/covers.py
+
+from django import template
+
+from .. import thumbnails
+
+register = template.Library()
+
+
+@register.inclusion_tag('library/cover_picture.html')
+def cover_picture(book, sizes, css_class='', lazy=True):
+    """``<picture>`` sampul dengan srcset WebP/JPEG; ``sizes`` = lebar tampil di CSS.
+
+    Contoh: ``{% cover_picture book "(min-width: 1024px) 25vw, 100vw" "w-full h-full" %}``
+    """
+    return {
+        'alt': book.title,
+        'webp': thumbnails.srcset(book, 'webp'),
+        'jpeg': thumbnails.srcset(book, 'jpeg'),
+        'src': thumbnails.fallback_url(book, max_width=320),
+        'sizes': sizes,
+        'css_class': css_class,
+        'lazy': lazy,
+    }
@@ -1,3 +1,1117 @@
-from django.test import TestCase
+import json
+import os
+import shutil
+import tempfile
+import threading
+import zipfile
+from datetime import date, timedelta
+from io import BytesIO, StringIO
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib import admin
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY
+from django.contrib.auth.models import User
+from django.contrib.sessions.backends.db import SessionStore
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection, connections
+from django.http import HttpResponse
+from django.test import (
+    RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings, skipUnlessDBFeature,
+)
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils.connection import ConnectionDoesNotExist
+
+from PIL import Image
+
+from . import instrumentation, search, stock, thumbnails, views
+from .account import LOAN_LIMIT, get_account_state
+from .benchmarks import parse_importtime, seed_members
+from .exports import StreamingExportMixin, iterate
+from .pagination import encode_cursor
+from .instrumentation import DUPLICATE_THRESHOLD, RequestMetrics, metrics
+from .models import Author, Book, BookImport, BookRecommendation, Genre, Loan, Location, RecommendationRun, Review
+from .routing import ReplicaMiddleware, ReplicaRouter, replica_reads
+
+TEST_STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+}
+# Anggaran query di bawah mengasumsikan cache di memori (CACHE_BACKEND=db ikut menghitung query)
+TEST_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+def login_with_session(client, user):
+    # client.login() memicu receiver user_logged_in yang butuh MessageMiddleware
+    session = SessionStore()
+    session.update({
+        SESSION_KEY: str(user.pk), BACKEND_SESSION_KEY: 'django.contrib.auth.backends.ModelBackend',
+        HASH_SESSION_KEY: user.get_session_auth_hash(),
+    })
+    session.save()
+    client.cookies[settings.SESSION_COOKIE_NAME] = session.session_key
+
+
+@override_settings(STORAGES=TEST_STORAGES, CACHES=TEST_CACHES)
+class CatalogueQueryBudgetTests(TestCase):
+    """Jumlah query halaman katalog tidak boleh bergantung pada jumlah baris."""
+
+    BOOK_LIST_BUDGET = 8
+    DETAIL_BUDGET = 6  # termasuk stempel ETag (anonim) dan panel rekomendasi
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.location = Location.objects.create(shelf_name='A1', description='Rak A1')
+        cls.genres = [Genre.objects.create(name=f'Genre {i}') for i in range(3)]
+        cls.authors = [Author.objects.create(name=f'Penulis {i}') for i in range(3)]
+        cls.users = [User.objects.create_user(f'anggota{i}') for i in range(6)]
+
+    def make_books(self, count):
+        books = []
+        for i in range(count):
+            book = Book.objects.create(
+                title=f'Buku {i:03d}', description='Deskripsi', publication_year=2000,
+                stock=1, location=self.location, cover_image='book_covers/1692.jpg',
+                # Thumbnail dianggap sudah dibuat (tidak menulis ke MEDIA_ROOT)
+                cover_variants={'source': 'book_covers/1692.jpg'},
+            )
+            book.genre.set(self.genres)
+            book.authors.set(self.authors)
+            books.append(book)
+        return books
+
+    def count_queries(self, url):
+        cache.clear()
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries)
+
+    def test_book_list_budget_independent_of_page_size(self):
+        self.make_books(2)
+        small = self.count_queries(reverse('book_list'))
+        self.make_books(20)
+        full = self.count_queries(reverse('book_list'))
+        self.assertEqual(small, full)
+        self.assertLessEqual(full, self.BOOK_LIST_BUDGET)
+
+    def test_detail_budget_independent_of_review_count(self):
+        book = self.make_books(1)[0]
+        Review.objects.create(book=book, user=self.users[0], rating=4, comment='Bagus')
+        few = self.count_queries(reverse('detail_book', args=[book.pk]))
+        for user in self.users[1:]:
+            Review.objects.create(book=book, user=user, rating=5, comment='Mantap')
+        many = self.count_queries(reverse('detail_book', args=[book.pk]))
+        self.assertEqual(few, many)
+        self.assertLessEqual(many, self.DETAIL_BUDGET)
+
+
+class CursorWalkMixin:
+
+    def walk(self, url, params):
+        """Mengikuti cursor maju sampai habis lalu mundur satu halaman."""
+        seen, pages, cursor = [], [], None
+        while True:
+            response = self.client.get(url, {**params, **({'cursor': cursor} if cursor else {})})
+            page = response.context['books' if 'books' in response.context else 'loans']
+            pages.append([obj.pk for obj in page])
+            seen += pages[-1]
+            if not page.has_next():
+                break
+            cursor = page.next_cursor
+        if len(pages) > 1:
+            response = self.client.get(url, {**params, 'cursor': page.previous_cursor})
+            page = response.context['books' if 'books' in response.context else 'loans']
+            self.assertEqual([obj.pk for obj in page], pages[-2])
+        return seen
+
+
+@override_settings(STORAGES=TEST_STORAGES, CACHES=TEST_CACHES)
+class PaginationTests(CursorWalkMixin, TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.books = [
+            Book.objects.create(title=f'Buku {i % 7}', description='-', publication_year=2000, stock=1)
+            for i in range(30)
+        ]
+        cls.member = User.objects.create_user('anggota')
+        Loan.objects.bulk_create([Loan(book=book, member=cls.member) for book in cls.books[:20]])
+
+    def setUp(self):
+        cache.clear()
+
+    def test_cursor_walks_every_row_once(self):
+        url = reverse('book_list')
+        titles = sorted(self.books, key=lambda book: (book.title, book.pk))
+        self.assertEqual(self.walk(url, {}), [book.pk for book in titles])
+        self.assertEqual(self.walk(url, {'sort': 'newest'}), [book.pk for book in reversed(self.books)])
+        self.assertEqual(len(set(self.walk(url, {'sort': 'rating'}))), 30)
+
+        login_with_session(self.client, self.member)
+        loans = list(Loan.objects.filter(member=self.member).order_by('-id').values_list('pk', flat=True))
+        self.assertEqual(self.walk(reverse('my_loans'), {}), loans)
+
+    def test_forged_cursor_falls_back_to_first_page(self):
+        first = self.client.get(reverse('book_list')).context['books']
+        forged = [['abc', 'zz'], ['x'], [None], [[1]], ['Buku 1', None], ['Buku 1', 10 ** 30], [{'a': 1}, 1]]
+        for sort in ('', 'newest', 'rating'):
+            for values in forged:
+                for direction in ('next', 'prev'):
+                    cursor = encode_cursor(values, direction)
+                    response = self.client.get(reverse('book_list'), {'sort': sort, 'cursor': cursor})
+                    self.assertEqual(response.status_code, 200, (sort, values))
+        response = self.client.get(reverse('book_list'), {'cursor': encode_cursor(['abc', 'zz'], 'next')})
+        self.assertEqual([book.pk for book in response.context['books']], [book.pk for book in first])
+
+        login_with_session(self.client, self.member)
+        for values in forged:
+            response = self.client.get(reverse('my_loans'), {'cursor': encode_cursor(values, 'next')})
+            self.assertEqual(response.status_code, 200, values)
+            self.assertEqual(len(response.context['loans']), 8)
+
+
+@override_settings(STORAGES=TEST_STORAGES, CACHES=TEST_CACHES)
+class SearchTests(CursorWalkMixin, TestCase):
+    """Pencarian katalog: indeks full-text (FTS5 / tsvector sesuai database test) dan cadangan LIKE."""
+
+    @classmethod
+    def setUpTestData(cls):
+        Book.objects.bulk_create(
+            [Book(title=f'Sejarah Umum {i}', description='-', publication_year=2000) for i in range(1000)]
+            + [Book(title=f'Sejarah Jawa {i}', description='-', publication_year=2000) for i in range(20)]
+            + [Book(title='Catatan Lain', description='Catatan perjalanan di Jawa', publication_year=2000)]
+        )
+        search.rebuild()
+        cls.jawa = list(Book.objects.filter(title__startswith='Sejarah Jawa').order_by('pk'))
+        cls.catatan = Book.objects.get(title='Catatan Lain')
+
+    def setUp(self):
+        cache.clear()
+
+    def results(self, params):
+        return self.client.get(reverse('book_list'), params).context
+
+    def test_total_is_not_capped(self):
+        context = self.results({'q': 'sejarah'})
+        self.assertEqual(context['books_count'], 1020)
+        self.assertEqual(len(context['books']), 12)
+
+    def test_relevance_order_walks_every_match(self):
+        seen = self.walk(reverse('book_list'), {'q': 'jawa'})
+        self.assertEqual(len(seen), 21)
+        self.assertEqual(set(seen[:-1]), {book.pk for book in self.jawa})
+        self.assertEqual(seen[-1], self.catatan.pk)  # deskripsi berbobot paling ringan
+        self.assertEqual(
+            self.walk(reverse('book_list'), {'q': 'jawa', 'sort': 'newest'}),
+            [self.catatan.pk] + [book.pk for book in reversed(self.jawa)],
+        )
+        self.assertEqual(self.results({'q': 'jaw'})['books_count'], 21)  # prefix
+        self.assertEqual(self.results({'q': '!!!'})['books_count'], 0)
+
+    @skipUnless(connection.vendor == 'sqlite', "Indeks FTS5 hanya di SQLite")
+    def test_sqlite_uses_fts5(self):
+        self.assertIn('MATCH', str(search.search_books(Book.objects.all(), 'jawa').query))
+
+    @skipUnless(connection.vendor == 'postgresql', "Indeks tsvector hanya di PostgreSQL")
+    def test_postgresql_uses_tsvector(self):
+        self.assertIn('to_tsquery', str(search.search_books(Book.objects.all(), 'jawa').query))
+
+    def test_like_fallback_without_index(self):
+        with mock.patch.object(search, '_has_index', return_value=False):
+            self.assertIsNone(search.search_books(Book.objects.all(), 'jawa'))
+            seen = self.walk(reverse('book_list'), {'q': 'jawa'})
+        # icontains hanya di judul & ISBN, urut judul
+        self.assertEqual(seen, [book.pk for book in sorted(self.jawa, key=lambda book: (book.title, book.pk))])
+
+
+@override_settings(STORAGES=TEST_STORAGES, CACHES=TEST_CACHES)
+class FacetTests(TestCase):
+    """Setiap facet dihitung dengan semua filter lain aktif, kecuali filternya sendiri."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.fiksi, cls.sejarah = Genre.objects.create(name='Fiksi'), Genre.objects.create(name='Sejarah')
+        cls.ani, cls.budi = Author.objects.create(name='Ani'), Author.objects.create(name='Budi')
+        r1 = Location.objects.create(shelf_name='R1')
+        r2 = Location.objects.create(shelf_name='R2')
+        for title, genres, author, location in [
+            ('Laut Biru', [cls.fiksi], cls.ani, r1),
+            ('Laut Merah', [cls.fiksi], cls.budi, r1),
+            ('Gunung', [cls.sejarah], cls.ani, r2),
+            ('Laut Sejarah', [cls.fiksi, cls.sejarah], cls.ani, r2),
+            ('Kota', [cls.sejarah], cls.budi, r1),
+        ]:
+            book = Book.objects.create(title=title, description='-', publication_year=2000, location=location)
+            book.genre.set(genres)
+            book.authors.set([author])
+
+    def setUp(self):
+        cache.clear()
+
+    def facets(self, params):
+        context = self.client.get(reverse('book_list'), params).context
+        return (
+            {item['name']: item['count'] for item in context['genres']},
+            {item['name']: item['count'] for item in context['authors']},
+            {item['shelf_name']: item['count'] for item in context['locations']},
+            context['books_count'],
+        )
+
+    def test_combined_filters(self):
+        genres, authors, locations, total = self.facets({'genre': self.fiksi.pk, 'author': self.ani.pk})
+        self.assertEqual(genres, {'Fiksi': 2, 'Sejarah': 2})    # hanya filter penulis
+        self.assertEqual(authors, {'Ani': 2, 'Budi': 1})        # hanya filter genre
+        self.assertEqual(locations, {'R1': 1, 'R2': 1})         # genre & penulis
+        self.assertEqual(total, 2)
+
+    def test_search_with_filter(self):
+        genres, authors, locations, total = self.facets({'q': 'laut', 'genre': self.fiksi.pk})
+        self.assertEqual(genres, {'Fiksi': 3, 'Sejarah': 1})
+        self.assertEqual(authors, {'Ani': 2, 'Budi': 1})
+        self.assertEqual(locations, {'R1': 2, 'R2': 1})
+        self.assertEqual(total, 3)
+
+    def test_relation_change_invalidates_cached_counts(self):
+        params = {'author': self.budi.pk}
+        self.assertEqual(self.facets(params)[0], {'Fiksi': 1, 'Sejarah': 1})
+        with self.captureOnCommitCallbacks(execute=True):
+            Book.objects.get(title='Kota').genre.add(self.fiksi)
+        self.assertEqual(self.facets(params)[0], {'Fiksi': 2, 'Sejarah': 1})
+
+
+@override_settings(STORAGES=TEST_STORAGES, CACHES=TEST_CACHES)
+class AsyncCatalogueTests(TestCase):
+    """View katalog async tidak boleh memicu query sinkron saat dirender lewat ASGI."""
+
+    @classmethod
+    def setUpTestData(cls):
+        location = Location.objects.create(shelf_name='A1', description='Rak A1')
+        cls.book = Book.objects.create(
+            title='Buku Async', description='Deskripsi', publication_year=2000, stock=1, location=location,
+        )
+        cls.book.authors.add(Author.objects.create(name='Penulis'))
+        Review.objects.create(book=cls.book, user=User.objects.create_user('pembaca'), rating=5, comment='Bagus')
+
+    async def test_pages_render_under_asgi(self):
+        for url in [reverse('book_list'), reverse('book_list') + '?page=1',
+                    reverse('detail_book', args=[self.book.pk])]:
+            response = await self.async_client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertContains(response, 'Buku Async')
+
+
+@override_settings(STORAGES=TEST_STORAGES, CACHES=TEST_CACHES)
+class PageCacheTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        location = Location.objects.create(shelf_name='A1', description='Rak A1')
+        cls.book = Book.objects.create(
+            title='Buku Cache', description='Deskripsi', publication_year=2000, stock=3, location=location,
+        )
+        cls.member = User.objects.create_user('pembaca')
+
+    def setUp(self):
+        cache.clear()
+
+    def login(self, user):
+        login_with_session(self.client, user)
+
+    def test_anonymous_repeat_hits_skip_database(self):
+        url = reverse('detail_book', args=[self.book.pk])
+        self.client.get(url)
+        with self.assertNumQueries(0):
+            self.assertContains(self.client.get(url), '3 Buku')
+        self.client.get(reverse('book_list'))
+        with self.assertNumQueries(0):
+            self.assertContains(self.client.get(reverse('book_list')), 'Buku Cache')
+
+    def test_stock_and_review_changes_invalidate(self):
+        url = reverse('detail_book', args=[self.book.pk])
+        self.client.get(url)
+        with self.captureOnCommitCallbacks(execute=True):
+            stock.adjust_many({self.book.pk: -1})
+        self.assertContains(self.client.get(url), '2 Buku')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Review.objects.create(book=self.book, user=self.member, rating=4, comment='Ulasan baru')
+        self.assertContains(self.client.get(url), 'Ulasan baru')
+
+    def test_logged_in_user_not_served_anonymous_page(self):
+        url = reverse('detail_book', args=[self.book.pk])
+        self.client.get(url)
+        self.login(self.member)
+        self.assertContains(self.client.get(url), 'pembaca')
+
+    def test_revalidation_returns_not_modified(self):
+        url = reverse('detail_book', args=[self.book.pk])
+        response = self.client.get(url)
+        etag = response['ETag']
+        self.assertIn('Last-Modified', response)
+        self.assertIn('Cookie', response['Vary'])
+        # Halaman masih di cache: validator tersimpan, tanpa query
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        # Cache kosong: cukup satu query stempel
+        cache.clear()
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        with self.assertNumQueries(1):
+            response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(response.status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            stock.adjust_many({self.book.pk: -1})
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertContains(response, '2 Buku')
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_book_list_etag_follows_relation_changes(self):
+        url = reverse('book_list')
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.book.authors.add(Author.objects.create(name='Penulis Baru'))
+        self.assertContains(self.client.get(url, HTTP_IF_NONE_MATCH=etag), 'Penulis Baru')
+
+    @override_settings(PAGE_CACHE_TIMEOUT=0)
+    def test_book_list_etag_without_queries(self):
+        url = reverse('book_list')
+        etag = self.client.get(url)['ETag']
+        # Halaman tidak di cache: validator hanya membaca versi catalogue
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        other = Book.objects.create(title='Buku Lain', description='-', publication_year=2000, stock=1)
+        with self.captureOnCommitCallbacks(execute=True):
+            other.delete()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+        # Cache dikosongkan: nomor versi lama tidak terpakai lagi
+        etag = self.client.get(url)['ETag']
+        cache.clear()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_logged_in_user_gets_no_validators(self):
+        self.login(self.member)
+        response = self.client.get(reverse('detail_book', args=[self.book.pk]))
+        self.assertNotIn('ETag', response)
+
+
+@override_settings(STORAGES=TEST_STORAGES, CACHES=TEST_CACHES)
+class ThumbnailTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.media_root = tempfile.mkdtemp()
+        self.enterContext(override_settings(MEDIA_ROOT=self.media_root))
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+
+    def cover(self, width=500, height=750, mode='RGBA'):
+        buffer = BytesIO()
+        Image.new(mode, (width, height), 'green').save(buffer, 'PNG')
+        return SimpleUploadedFile('sampul.png', buffer.getvalue(), content_type='image/png')
+
+    def test_upload_creates_variants_without_upscaling(self):
+        book = Book.objects.create(
+            title='Bergambar', description='-', publication_year=2000, cover_image=self.cover(),
+        )
+        book.refresh_from_db()
+        self.assertEqual(book.cover_variants['source'], book.cover_image.name)
+        self.assertEqual([width for width, _ in book.cover_variants['webp']], [160, 320, 500])
+        with Image.open(default_storage.path(book.cover_variants['jpeg'][0][1])) as image:
+            self.assertEqual((image.format, image.size), ('JPEG', (160, 240)))
+
+        html = self.client.get(reverse('book_list')).content.decode()
+        self.assertIn('type="image/webp"', html)
+        self.assertIn('320w', html)
+        self.assertNotIn(book.cover_image.url + '"', html)
+
+    def test_backfill_command_builds_missing_variants(self):
+        book = Book.objects.create(title='Lama', description='-', publication_year=2000, cover_image=self.cover(200, 300))
+        Book.objects.filter(pk=book.pk).update(cover_variants={})
+        call_command('build_thumbnails', workers=1, stdout=StringIO())
+        book.refresh_from_db()
+        self.assertEqual([width for width, _ in book.cover_variants['jpeg']], [160, 200])
+        self.assertEqual(thumbnails.needs_variants(book), False)
+
+    def test_failed_variants_fall_back_to_original_cover(self):
+        book = Book.objects.create(title='Ganti', description='-', publication_year=2000, cover_image=self.cover())
+        self.assertTrue(book.cover_variants)
+        with mock.patch.object(thumbnails, 'render_variants', side_effect=RuntimeError('codec')), \
+                self.assertLogs('library.signals', 'WARNING'):
+            book.cover_image = self.cover(300, 450)
+            book.save()
+        book.refresh_from_db()
+        self.assertEqual(book.cover_variants, {})
+        self.assertTrue(thumbnails.needs_variants(book))  # dicoba lagi oleh build_thumbnails
+        self.assertEqual(thumbnails.fallback_url(book), book.cover_image.url)
+
+
+def marc_record(fields):
+    """Membuat satu rekaman MARC 21 (UTF-8) dari ``[(tag, [(kode, nilai), ...]), ...]``."""
+    directory, data = b'', b''
+    for tag, subfields in fields:
+        body = b'  ' + b''.join(b'\x1f' + code.encode() + value.encode() for code, value in subfields) + b'\x1e'
+        directory += tag.encode() + b'%04d%05d' % (len(body), len(data))
+        data += body
+    base = 24 + len(directory) + 1
+    length = base + len(data) + 1
+    leader = b'%05dnam a22%05d   4500' % (length, base)
+    return leader + directory + b'\x1e' + data + b'\x1d'
+
+
+@override_settings(CACHES=TEST_CACHES)
+class ImportBooksTests(TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp, ignore_errors=True)
+
+    def write(self, name, content):
+        path = f'{self.tmp}/{name}'
+        with open(path, 'wb') as fh:
+            fh.write(content)
+        return path
+
+    def test_csv_import_links_relations_and_resumes(self):
+        Author.objects.create(name='Tere Liye')
+        path = self.write('katalog.csv', (
+            "title,isbn,description,publication_year,stock,authors,genres,location\n"
+            "Bumi,9786020332956,Petualangan,2014,3,Tere Liye,Fantasi;Remaja,Rak A\n"
+            "Tanpa Tahun,,,,,,,\n"
+            "Bulan,9786020332949,Lanjutan,2015,2,Tere Liye;Penulis Tamu,Fantasi,Rak A\n"
+        ).encode())
+        call_command('import_books', path, batch_size=2, stdout=StringIO())
+
+        self.assertEqual(Author.objects.count(), 2)
+        self.assertEqual(Location.objects.get().books.count(), 2)
+        bulan = Book.objects.get(title='Bulan')
+        self.assertEqual(sorted(bulan.authors.values_list('name', flat=True)), ['Penulis Tamu', 'Tere Liye'])
+        self.assertEqual(list(Book.objects.get(title='Bumi').genre.order_by('name').values_list('name', flat=True)),
+                         ['Fantasi', 'Remaja'])
+        state = BookImport.objects.get()
+        self.assertEqual((state.position, state.created_books, state.skipped), (3, 2, 1))
+
+        # Posisi tersimpan: menjalankan ulang setelah batch pertama hanya menambah sisanya
+        BookImport.objects.update(position=2, finished_at=None)
+        Book.objects.filter(title='Bulan').delete()
+        call_command('import_books', path, batch_size=2, stdout=StringIO())
+        self.assertEqual(Book.objects.count(), 2)
+
+    def test_jsonl_skips_bad_lines_and_accepts_numbers(self):
+        path = self.write('katalog.jsonl', (
+            '{"title": "Laskar Pelangi", "isbn": 9789793062792, "publication_year": 2005, "authors": "Andrea Hirata"}\n'
+            '{"title": "Terpotong", "isbn": \n'
+            '\n'
+            '["bukan", "objek"]\n'
+            '{"title": 1984, "publication_year": "1949", "stock": 2}\n'
+        ).encode())
+        with self.assertLogs('library.importers', 'WARNING') as logs:
+            call_command('import_books', path, stdout=StringIO())
+        self.assertIn('Baris 2', logs.output[0])
+        self.assertIn('Baris 4', logs.output[1])
+        state = BookImport.objects.get()
+        self.assertEqual((state.position, state.created_books, state.skipped), (4, 2, 2))
+        book = Book.objects.get(title='Laskar Pelangi')
+        self.assertEqual((book.isbn, book.authors.get().name), ('9789793062792', 'Andrea Hirata'))
+        self.assertEqual(Book.objects.get(title='1984').stock, 2)
+
+    def test_marc_import(self):
+        record = marc_record([
+            ('020', [('a', '978-602-03-3295-6 (pbk.)')]),
+            ('100', [('a', 'Toer, Pramoedya Ananta,')]),
+            ('245', [('a', 'Bumi manusia /'), ('c', 'Pramoedya.')]),
+            ('260', [('b', 'Hasta Mitra,'), ('c', 'c1980.')]),
+            ('650', [('a', 'Sejarah.')]),
+        ])
+        corrupt = b'00030nam a22000XX   4500abcde\x1d'
+        path = self.write('katalog.mrc', record + corrupt)
+        call_command('import_books', path, stdout=StringIO())
+        self.assertEqual(BookImport.objects.get().skipped, 1)
+        book = Book.objects.get()
+        self.assertEqual((book.title, book.isbn, book.publication_year), ('Bumi manusia', '9786020332956', 1980))
+        self.assertEqual(book.authors.get().name, 'Toer, Pramoedya Ananta')
+        self.assertEqual(book.genre.get().name, 'Sejarah')
+
+
+@override_settings(CACHES=TEST_CACHES)
+class AdminExportTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.book = Book.objects.create(title='=SUM(A1)', description='-', publication_year=2001, stock=5)
+        cls.book.authors.add(Author.objects.create(name='Penulis Ekspor'))
+        member = User.objects.create_user('peminjam', email='p@example.com')
+        Loan.objects.create(book=cls.book, member=member, status='pending')
+        Loan.objects.create(
+            book=cls.book, member=member, status='returned', borrow_date=date(2024, 1, 1),
+            due_date=date(2024, 1, 8), return_date=date(2024, 1, 10), fine_amount=2000,
+        )
+
+    def setUp(self):
+        login_with_session(self.client, User.objects.create_superuser('admin', 'admin@example.com', 'x'))
+
+    def test_export_hooks_are_required(self):
+        class IncompleteAdmin(StreamingExportMixin, admin.ModelAdmin):
+            export_header = ('Judul',)
+
+        with self.assertRaises(ImproperlyConfigured):
+            IncompleteAdmin(Book, admin.site).get_urls()
+
+    def test_loan_csv_honours_changelist_filters(self):
+        changelist = self.client.get(reverse('admin:library_loan_changelist'), {'status__exact': 'returned'})
+        self.assertContains(changelist, reverse('admin:library_loan_export', args=['csv']) + '?status__exact=returned')
+        response = self.client.get(reverse('admin:library_loan_export', args=['csv']), {'status__exact': 'returned'})
+        self.assertTrue(response.streaming)
+        lines = b''.join(response.streaming_content).decode('utf-8-sig').splitlines()
+        self.assertEqual(len(lines), 2)
+        self.assertIn('Sudah Dikembalikan', lines[1])
+        self.assertIn("'=SUM(A1)", lines[1])
+        self.assertTrue(lines[1].endswith(',-,Sudah Dikembalikan,2024-01-01,2024-01-08,2024-01-10,2000.00,2000.00,Tidak'))
+
+    def test_xlsx_is_valid_workbook(self):
+        response = self.client.get(reverse('admin:library_book_export', args=['xlsx']))
+        with zipfile.ZipFile(BytesIO(b''.join(response.streaming_content))) as archive:
+            self.assertIsNone(archive.testzip())
+            sheet = archive.read('xl/worksheets/sheet1.xml').decode()
+            self.assertIn('xl/workbook.xml', archive.namelist())
+        self.assertEqual(sheet.count('<row '), 2)
+        self.assertIn('Penulis Ekspor', sheet)
+
+    def test_iterate_without_server_side_cursors(self):
+        # pgbouncer mode transaksi: potongan keyset (kunci urutan, lalu pk IN (...) dengan urutan yang sama)
+        member = User.objects.get(username='peminjam')
+        Loan.objects.bulk_create([Loan(book=self.book, member=member) for _ in range(5)])
+        loans = Loan.objects.order_by('-pk')
+        expected = list(loans.values_list('pk', flat=True))
+        with mock.patch.dict(connection.settings_dict, DISABLE_SERVER_SIDE_CURSORS=True):
+            with CaptureQueriesContext(connection) as ctx:
+                chunked = [loan.pk for loan in iterate(loans, chunk_size=3)]
+            self.assertEqual(chunked, expected)
+            self.assertEqual(len(ctx.captured_queries), 2 * -(-len(expected) // 3))
+            self.assertTrue(all('LIMIT 3' in query['sql'] for query in ctx.captured_queries[::2]))
+
+            # Urutan multi-kolom campuran arah, termasuk kolom FK mentah
+            mixed = Loan.objects.order_by('status', '-member_id', 'pk')
+            self.assertEqual([loan.pk for loan in iterate(mixed, chunk_size=2)],
+                             list(mixed.values_list('pk', flat=True)))
+
+            # Kolom nullable: kembali ke daftar pk sekali di awal
+            by_due = Loan.objects.order_by('due_date', 'pk')
+            with CaptureQueriesContext(connection) as ctx:
+                chunked = [loan.pk for loan in iterate(by_due, chunk_size=3)]
+            self.assertEqual(chunked, list(by_due.values_list('pk', flat=True)))
+            self.assertEqual(len(ctx.captured_queries), 1 + -(-len(expected) // 3))
+
+            # Pinjaman baru di tengah ekspor (urut terbaru dulu) tidak menggeser potongan berikutnya
+            rows = iterate(loans.values_list('pk', 'status'), chunk_size=3)
+            first = [next(rows) for _ in range(3)]
+            Loan.objects.bulk_create([Loan(book=self.book, member=member) for _ in range(2)])
+            self.assertEqual([pk for pk, _ in first + list(rows)], expected)
+
+
+@override_settings(STORAGES=TEST_STORAGES, CACHES=TEST_CACHES, INSTRUMENTATION_SAMPLE_RATE=1)
+class InstrumentationTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.book = Book.objects.create(title='Terukur', description='-', publication_year=2000, stock=1)
+        cls.staff = User.objects.create_user('staf', is_staff=True)
+
+    def setUp(self):
+        metrics.reset()
+        cache.clear()
+
+    def test_server_timing_and_per_view_stats(self):
+        response = self.client.get(reverse('detail_book', args=[self.book.pk]))
+        self.assertRegex(response['Server-Timing'], r'db;dur=[\d.]+;desc="SQL [1-9]\d* query", tpl;dur=')
+        login_with_session(self.client, self.staff)
+        for url in (reverse('my_loans'), reverse('profile')):
+            self.client.get(url)
+        snapshot = self.client.get(reverse('request_metrics')).json()['views']
+        self.assertEqual(snapshot['detail_book']['requests'], 1)
+        self.assertGreater(snapshot['detail_book']['template_ms']['p50'], 0)
+        self.assertEqual(sum(snapshot['detail_book']['histogram_ms'].values()), 1)
+        self.assertEqual(sum(view['over_budget'] for view in snapshot.values()), 0)
+
+    async def test_async_view_queries_are_counted(self):
+        response = await self.async_client.get(reverse('book_list'))
+        self.assertIn('db;dur=', response['Server-Timing'])
+        self.assertGreater(metrics.snapshot()['book_list']['queries']['p50'], 0)
+
+    def test_repeated_statement_flagged(self):
+        current = RequestMetrics()
+        token = instrumentation._current.set(current)
+        try:
+            for _ in range(DUPLICATE_THRESHOLD):
+                list(Book.objects.filter(pk=self.book.pk))
+        finally:
+            instrumentation._current.reset(token)
+        self.assertEqual(current.duplicates()[0][1], DUPLICATE_THRESHOLD)
+
+
+@override_settings(DATABASE_REPLICAS=['replica'])
+class ReplicaRouterTests(SimpleTestCase):
+
+    def read_aliases(self, cookies=None):
+        router = ReplicaRouter()
+
+        @replica_reads
+        def view(request):
+            return HttpResponse(f'{router.db_for_read(Book)},{router.db_for_read(User)}')
+        request = RequestFactory().get('/books')
+        request.COOKIES.update(cookies or {})
+        return ReplicaMiddleware(view)(request).content.decode()
+
+    def test_only_catalogue_models_in_marked_views_use_replica(self):
+        self.assertEqual(self.read_aliases(), 'replica,None')
+        self.assertIsNone(ReplicaRouter().db_for_read(Book))
+
+    def test_sticky_cookie_pins_to_primary(self):
+        self.assertEqual(self.read_aliases({settings.REPLICA_STICKY_COOKIE: '1'}), 'None,None')
+
+
+@override_settings(STORAGES=TEST_STORAGES, CACHES=TEST_CACHES, DATABASE_REPLICAS=['replica'])
+class ReplicaStickyTests(TestCase):
+
+    def test_write_sets_sticky_cookie(self):
+        book = Book.objects.create(title='Replika', description='-', publication_year=2000, stock=2)
+        login_with_session(self.client, User.objects.create_user('pembaca'))
+        response = self.client.get(reverse('my_loans'))
+        self.assertNotIn(settings.REPLICA_STICKY_COOKIE, response.cookies)
+
+        response = self.client.get(reverse('request_loan', args=[book.pk]))
+        self.assertRedirects(response, reverse('my_loans'), fetch_redirect_response=False)
+        self.assertEqual(response.cookies[settings.REPLICA_STICKY_COOKIE]['max-age'], settings.REPLICA_STICKY_SECONDS)
+
+
+@override_settings(STORAGES=TEST_STORAGES, CACHES=TEST_CACHES, DATABASE_REPLICAS=['replica'])
+class ReplicaCacheFillTests(TestCase):
+    """Cache yang diisi dengan versi baru dirender dari primary; alias 'replica' sengaja tidak ada."""
+
+    def setUp(self):
+        cache.clear()
+        self.book = Book.objects.create(title='Segar', description='-', publication_year=2000, stock=2)
+        self.url = reverse('detail_book', args=[self.book.pk])
+
+    def test_anonymous_page_filled_from_primary(self):
+        response = self.client.get(self.url)
+        self.assertContains(response, 'Segar')
+        self.assertContains(self.client.get(reverse('book_list')), 'Segar')
+
+    def test_detail_fragment_filled_from_primary(self):
+        login_with_session(self.client, User.objects.create_user('pembaca'))
+        self.assertContains(self.client.get(self.url), 'Segar')
+        # Fragmen sudah ada: bagian ulasan (tidak di-cache) kembali dibaca dari replika
+        with self.assertRaises(ConnectionDoesNotExist):
+            self.client.get(self.url)
+
+
+@override_settings(STORAGES=TEST_STORAGES, CACHES=TEST_CACHES)
+class LoanRequestTests(TestCase):
+    """Pengajuan pinjaman memeriksa batas & denda dari database, bukan cache tampilan."""
+
+    def setUp(self):
+        cache.clear()
+        self.member = User.objects.create_user('peminjam')
+        login_with_session(self.client, self.member)
+        self.books = [
+            Book.objects.create(title=f'Buku {i}', description='-', publication_year=2000, stock=2)
+            for i in range(LOAN_LIMIT + 1)
+        ]
+
+    def request(self, book):
+        self.client.get(reverse('request_loan', args=[book.pk]))
+        return Loan.objects.filter(member=self.member, book=book).exists()
+
+    def test_limit_checked_against_database(self):
+        get_account_state(self.member)  # cache berisi 0 pinjaman aktif
+        Loan.objects.bulk_create([
+            Loan(book=book, member=self.member, status='pending') for book in self.books[:LOAN_LIMIT]
+        ])
+        self.assertFalse(self.request(self.books[-1]))
+
+    def test_fine_checked_against_database(self):
+        loan = Loan.objects.create(book=self.books[0], member=self.member, status='returned',
+                                   fine_amount=3000, is_paid=False)
+        self.assertFalse(get_account_state(self.member).can_borrow)
+        self.assertFalse(self.request(self.books[1]))
+
+        # Lunas lewat UPDATE massal (tanpa signal): cache masih memblokir, pengajuan tidak
+        Loan.objects.filter(pk=loan.pk).update(is_paid=True)
+        self.assertFalse(get_account_state(self.member).can_borrow)
+        self.assertTrue(self.request(self.books[1]))
+
+        Loan.objects.filter(pk=loan.pk).update(is_paid=False)
+        self.assertFalse(self.request(self.books[2]))
+
+    def test_stock_read_after_member_lock(self):
+        book = self.books[0]
+        compute = views.compute_account_state
+
+        def approved_elsewhere(member_id):
+            # Persetujuan lain selesai selama pengajuan menunggu kunci anggota
+            Book.objects.filter(pk=book.pk).update(stock=0)
+            return compute(member_id)
+
+        with mock.patch.object(views, 'compute_account_state', side_effect=approved_elsewhere):
+            self.assertFalse(self.request(book))
+
+
+@override_settings(STORAGES=TEST_STORAGES, CACHES=TEST_CACHES)
+class RatingAggregateTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.books = [
+            Book.objects.create(title=f'Buku {i}', description='-', publication_year=2000, stock=1)
+            for i in range(2)
+        ]
+        self.users = [User.objects.create_user(f'pengulas{i}') for i in range(3)]
+
+    def aggregates(self, book):
+        book.refresh_from_db()
+        return book.rating_sum, book.rating_count, float(book.rating_avg)
+
+    def test_review_changes_refresh_aggregates(self):
+        first, second = self.books
+        Review.objects.create(book=first, user=self.users[0], rating=5, comment='-')
+        review = Review.objects.create(book=first, user=self.users[1], rating=2, comment='-')
+        self.assertEqual(self.aggregates(first), (7, 2, 3.5))
+
+        # Dipindah ke buku lain: kedua buku dihitung ulang
+        review.book = second
+        review.save()
+        self.assertEqual(self.aggregates(first), (5, 1, 5.0))
+        self.assertEqual(self.aggregates(second), (2, 1, 2.0))
+
+        review.delete()
+        self.assertEqual(self.aggregates(second), (0, 0, 0.0))
+
+    def test_refresh_and_rebuild_fix_drifted_aggregates(self):
+        first, second = self.books
+        Review.objects.bulk_create([  # bulk_create tidak memicu signal
+            Review(book=first, user=self.users[0], rating=4, comment='-'),
+            Review(book=first, user=self.users[1], rating=3, comment='-'),
+            Review(book=second, user=self.users[2], rating=1, comment='-'),
+        ])
+        self.assertEqual(self.aggregates(first), (0, 0, 0.0))
+
+        self.assertEqual(Book.refresh_ratings([first.pk]), 1)
+        self.assertEqual(self.aggregates(first), (7, 2, 3.5))
+        self.assertEqual(self.aggregates(second), (0, 0, 0.0))
+
+        Book.objects.update(rating_sum=0, rating_count=0, rating_avg=0)
+        out = StringIO()
+        call_command('rebuild_ratings', batch_size=1, stdout=out)
+        self.assertIn('Rating 2 buku', out.getvalue())
+        self.assertEqual(self.aggregates(first), (7, 2, 3.5))
+        self.assertEqual(self.aggregates(second), (1, 1, 1.0))
+
+
+@override_settings(CACHES=TEST_CACHES)
+class FineExpressionTests(TestCase):
+    """Denda di SQL (``DaysBetween``: julianday di SQLite, ``date - date`` di PostgreSQL) sama dengan Python."""
+
+    DATES = [
+        # (jatuh tempo, kembali)
+        (date(2024, 1, 8), date(2024, 1, 8)),     # tepat waktu
+        (date(2024, 1, 8), date(2024, 1, 2)),     # lebih awal
+        (date(2024, 1, 8), date(2024, 1, 9)),     # terlambat satu hari
+        (date(2024, 1, 25), date(2024, 2, 3)),    # lintas bulan
+        (date(2024, 2, 27), date(2024, 3, 2)),    # melewati 29 Februari
+        (date(2023, 12, 28), date(2024, 1, 4)),   # lintas tahun
+        (date(2024, 1, 8), None),
+        (None, date(2024, 1, 9)),
+    ]
+
+    def setUp(self):
+        self.book = Book.objects.create(title='Buku', description='-', publication_year=2000)
+        self.member = User.objects.create_user('anggota')
+
+    def test_final_fine_matches_python(self):
+        loans = Loan.objects.bulk_create([
+            Loan(book=self.book, member=self.member, status='approved', due_date=due, return_date=returned)
+            for due, returned in self.DATES
+        ])
+        rows = dict(Loan.objects.annotate(fine=Loan.final_fine_expression()).values_list('pk', 'fine'))
+        for loan in loans:
+            self.assertEqual(rows[loan.pk], loan.calculate_final_fine(), (loan.due_date, loan.return_date))
+
+        # Jalur massal (return_loans) memakai ekspresi yang sama dengan Loan.save()
+        stock.return_loans(Loan.objects.all(), today=date(2024, 1, 9))
+        for loan in loans:
+            loan.refresh_from_db()
+            self.assertEqual(loan.fine_amount, loan.calculate_final_fine(), (loan.due_date, loan.return_date))
+
+    def test_running_fine_matches_python(self):
+        today = date.today()
+        dues = [today, today - timedelta(days=1), today - timedelta(days=40), today + timedelta(days=3), None]
+        loans = Loan.objects.bulk_create([
+            Loan(book=self.book, member=self.member, status='approved', due_date=due) for due in dues
+        ])
+        rows = dict(Loan.objects.annotate(fine=Loan.running_fine_expression(today)).values_list('pk', 'fine'))
+        for loan in loans:
+            self.assertEqual(rows[loan.pk], loan.current_fine, loan.due_date)
+
+    def test_vendor_branch(self):
+        sql = str(Loan.objects.annotate(fine=Loan.final_fine_expression()).query)
+        self.assertEqual('julianday' in sql, connection.vendor == 'sqlite')
+
+
+@override_settings(STORAGES=TEST_STORAGES, CACHES=TEST_CACHES)
+class AccruedFineTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.book = Book.objects.create(title='Buku', description='-', publication_year=2000)
+        self.member, self.other = User.objects.create_user('anggota'), User.objects.create_user('lain')
+
+    def materialize(self, today, **options):
+        out = StringIO()
+        call_command('materialize_fines', date=today, stdout=out, **options)
+        return out.getvalue()
+
+    def test_materialize_is_incremental(self):
+        # bulk_create tidak memanggil Loan.save(): accrued_fine masih 0
+        late, due_today, returned = Loan.objects.bulk_create([
+            Loan(book=self.book, member=self.member, status='approved', due_date=date(2024, 1, 8)),
+            Loan(book=self.book, member=self.member, status='approved', due_date=date(2024, 1, 10)),
+            Loan(book=self.book, member=self.member, status='returned', due_date=date(2024, 1, 1),
+                 return_date=date(2024, 1, 5), fine_amount=4000, accrued_fine=4000),
+        ])
+        self.assertIn('1 denda', self.materialize(date(2024, 1, 10), batch_size=1))
+        self.assertEqual(Loan.objects.get(pk=late.pk).accrued_fine, 2000)
+        self.assertEqual(Loan.objects.get(pk=due_today.pk).accrued_fine, 0)
+        self.assertEqual(Loan.objects.get(pk=returned.pk).accrued_fine, 4000)
+
+        self.assertIn('0 denda', self.materialize(date(2024, 1, 10)))
+        self.assertIn('2 denda', self.materialize(date(2024, 1, 12), batch_size=1))
+        self.assertEqual(
+            list(Loan.objects.filter(status='approved').order_by('pk').values_list('accrued_fine', flat=True)),
+            [4000, 2000],
+        )
+
+    def test_not_paid_filter_is_member_scoped(self):
+        unpaid_returned = Loan.objects.create(
+            book=self.book, member=self.member, status='returned',
+            due_date=date(2024, 1, 1), return_date=date(2024, 1, 3),
+        )
+        overdue = Loan.objects.create(
+            book=self.book, member=self.member, status='approved', due_date=date.today() - timedelta(days=2),
+        )
+        Loan.objects.create(  # lunas
+            book=self.book, member=self.member, status='returned', is_paid=True,
+            due_date=date(2024, 1, 1), return_date=date(2024, 1, 3),
+        )
+        Loan.objects.create(book=self.book, member=self.member, status='approved', due_date=date.today())
+        Loan.objects.create(  # milik anggota lain
+            book=self.book, member=self.other, status='returned',
+            due_date=date(2024, 1, 1), return_date=date(2024, 1, 3),
+        )
+        login_with_session(self.client, self.member)
+        response = self.client.get(reverse('my_loans'), {'status': 'not-paid'})
+        self.assertEqual([loan.pk for loan in response.context['loans']], [overdue.pk, unpaid_returned.pk])
+
+
+@override_settings(STORAGES=TEST_STORAGES, CACHES=TEST_CACHES)
+class StockTransitionTests(TransactionTestCase):
+    """Transisi pinjaman di admin tidak bisa menjual stok dua kali (commit sungguhan, bukan savepoint)."""
+
+    def setUp(self):
+        cache.clear()
+        self.book = Book.objects.create(title='Buku Terakhir', description='-', publication_year=2000, stock=1)
+        self.loans = [
+            Loan.objects.create(book=self.book, member=User.objects.create_user(f'anggota{i}'), status='pending')
+            for i in range(2)
+        ]
+
+    def stock(self):
+        return Book.objects.get(pk=self.book.pk).stock
+
+    def test_batch_approve_does_not_oversell(self):
+        approved, skipped = stock.approve_loans(Loan.objects.filter(pk__in=[loan.pk for loan in self.loans]))
+        self.assertEqual(approved, 1)
+        self.assertEqual([loan.pk for loan in skipped], [self.loans[1].pk])
+        self.assertEqual(self.stock(), 0)
+
+    def test_double_approve(self):
+        loans = Loan.objects.filter(pk=self.loans[0].pk)
+        self.assertEqual(stock.approve_loans(loans), (1, []))
+        self.assertEqual(stock.approve_loans(loans), (0, []))
+        self.assertEqual(self.stock(), 0)
+        # Stok habis: pinjaman kedua tetap pending
+        self.assertEqual(stock.approve_loans(Loan.objects.filter(pk=self.loans[1].pk))[0], 0)
+        self.assertEqual(Loan.objects.get(pk=self.loans[1].pk).status, 'pending')
+        self.assertEqual(self.stock(), 0)
+
+    def test_double_return(self):
+        loans = Loan.objects.filter(pk=self.loans[0].pk)
+        stock.approve_loans(loans)
+        self.assertEqual(stock.return_loans(loans), 1)
+        self.assertEqual(stock.return_loans(loans), 0)
+        self.assertEqual(Loan.objects.get(pk=self.loans[0].pk).status, 'returned')
+        self.assertEqual(self.stock(), 1)
+
+    @skipUnlessDBFeature('has_select_for_update')
+    def test_concurrent_approvals_do_not_oversell(self):
+        barrier = threading.Barrier(len(self.loans))
+        results = []
+
+        def approve(loan):
+            try:
+                barrier.wait()
+                results.append(stock.approve_loans(Loan.objects.filter(pk=loan.pk))[0])
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=approve, args=(loan,)) for loan in self.loans]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(sorted(results), [0, 1])
+        self.assertEqual(self.stock(), 0)
+
+
+@override_settings(STORAGES=TEST_STORAGES, CACHES=TEST_CACHES)
+class RecommendationTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.books = {
+            name: Book.objects.create(title=f'Buku {name}', description='-', publication_year=2000, stock=3)
+            for name in 'ABCD'
+        }
+        self.members = [User.objects.create_user(f'pembaca{i}') for i in range(4)]
+
+    def borrow(self, member, *names, status='returned'):
+        for name in names:
+            Loan.objects.create(book=self.books[name], member=member, status=status)
+
+    def recommended(self, name):
+        return [
+            item.recommended.title[-1] for item in
+            BookRecommendation.objects.filter(book=self.books[name]).select_related('recommended').order_by('rank')
+        ]
+
+    def test_full_then_incremental(self):
+        first, second, third, fourth = self.members
+        self.borrow(first, 'A', 'B', 'C')
+        self.borrow(second, 'A', 'B', 'A')
+        self.borrow(third, 'A')
+        self.borrow(third, 'C', status='rejected')
+        Review.objects.create(book=self.books['D'], user=third, rating=5, comment='Bagus')
+        Review.objects.create(book=self.books['C'], user=second, rating=2, comment='Kurang')
+
+        call_command('build_recommendations', stdout=StringIO())
+        # Hanya A-B yang punya dua pembaca bersama (MIN_SUPPORT)
+        self.assertEqual((self.recommended('A'), self.recommended('B'), self.recommended('C')), (['B'], ['A'], []))
+        self.assertTrue(RecommendationRun.objects.get().full)
+
+        url = reverse('detail_book', args=[self.books['A'].pk])
+        response = self.client.get(url)
+        self.assertContains(response, 'Pembaca Juga Meminjam')
+        self.assertContains(response, 'Buku B')
+        self.assertNotContains(response, 'Buku C')
+        etag = response['ETag']
+
+        # Anggota baru meminjam A & D: hanya buku miliknya yang dihitung ulang
+        self.borrow(fourth, 'A', 'D', status='pending')
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('build_recommendations', stdout=StringIO())
+        run = RecommendationRun.objects.latest('pk')
+        self.assertEqual((run.full, run.books_scanned, run.books_changed), (False, 2, 2))
+        # Pinjaman pending tidak menahan kursor
+        self.assertEqual(run.last_loan_id, Loan.objects.latest('pk').pk)
+        self.assertEqual((self.recommended('A'), self.recommended('D')), (['B', 'D'], ['A']))
+        self.assertEqual(self.recommended('B'), ['A'])
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Buku D')
+
+        # Pinjaman yang ditolak setelah run dibaca ulang lewat status_changed_at
+        stock.reject_loans(Loan.objects.filter(member=fourth, book=self.books['D']))
+        call_command('build_recommendations', stdout=StringIO())
+        self.assertEqual((self.recommended('A'), self.recommended('D')), (['B'], []))
+        self.assertEqual(RecommendationRun.objects.latest('pk').books_scanned, 2)
+
+        # Tanpa perubahan apa pun run inkremental tidak menghitung buku
+        call_command('build_recommendations', stdout=StringIO())
+        self.assertEqual(RecommendationRun.objects.latest('pk').books_scanned, 0)
+
+    def test_small_chunks_match_single_chunk(self):
+        first, second, third, fourth = self.members
+        self.borrow(first, 'A', 'B', 'C')
+        self.borrow(second, 'A', 'B', 'D')
+        self.borrow(third, 'A', 'C', 'D')
+        self.borrow(fourth, 'B', 'C', 'D')
+        Review.objects.create(book=self.books['A'], user=fourth, rating=5, comment='Bagus')
+
+        call_command('build_recommendations', full=True, stdout=StringIO())
+        expected = {name: self.recommended(name) for name in 'ABCD'}
+        BookRecommendation.objects.all().delete()
+
+        with CaptureQueriesContext(connection) as queries:
+            call_command('build_recommendations', full=True, chunk_size=1, stdout=StringIO())
+        self.assertEqual({name: self.recommended(name) for name in 'ABCD'}, expected)
+        self.assertEqual(expected['A'], ['B', 'C', 'D'])
+        # Keranjang dibaca per potongan, hanya untuk anggota pembaca buku di potongan itu
+        basket = 'SELECT "library_loan"."member_id" AS "member_id", "library_loan"."book_id"'
+        streams = [q['sql'] for q in queries if q['sql'].startswith(basket)]
+        self.assertEqual(len(streams), 4)
+        self.assertTrue(all(' IN (SELECT ' in sql for sql in streams))
+
+
+@override_settings(STORAGES=TEST_STORAGES, CACHES=TEST_CACHES)
+class BenchmarkHarnessTests(TestCase):
+
+    def test_seed_members_returns_only_new_users(self):
+        existing = {User.objects.create_user(name).pk for name in ('bench-admin', 'benchmark')}
+        member_ids = seed_members(3, 'bench')
+        self.assertEqual(len(member_ids), 3)
+        self.assertFalse(existing & set(member_ids))
+        self.assertEqual(
+            sorted(User.objects.filter(pk__in=member_ids).values_list('username', flat=True)),
+            ['bench0', 'bench1', 'bench2'],
+        )
+
+    def test_seed_and_report(self):
+        call_command('seed_bench', books=30, authors=10, genres=4, locations=3, members=20,
+                     loans=300, reviews=60, stdout=StringIO())
+        self.assertEqual(Review.objects.count(), 60)
+        self.assertEqual(set(Loan.objects.values_list('status', flat=True)),
+                         {'pending', 'approved', 'returned', 'rejected'})
+        self.assertEqual(Book.objects.filter(rating_count__gt=0).count(),
+                         Review.objects.values('book').distinct().count())
+        loans = Loan.objects.count()
+
+        output = tempfile.NamedTemporaryFile(suffix='.json', delete=False).name
+        self.addCleanup(os.remove, output)
+        call_command('bench_views', repeat=1, output=output, stdout=StringIO(), stderr=StringIO())
+        with open(output) as fh:
+            report = json.load(fh)
+        scenarios = report['scenarios']
+        # 4 filter -> 16 kombinasi x 3 urutan
+        self.assertEqual(sum(name.startswith('book_list[') for name in scenarios), 48)
+        self.assertIn('admin[approve_loan]', scenarios)
+        self.assertIn('midtrans_webhook[inline]', scenarios)
+        self.assertTrue(all(result['status'] < 400 for result in scenarios.values()), scenarios)
+        self.assertEqual(report['data']['loans'], loans)  # Perubahan data benchmark di-rollback
+
+    def test_parse_importtime(self):
+        rows = parse_importtime(
+            "import time: self [us] | cumulative | imported package\n"
+            "import time:       120 |        120 |     library.caching\n"
+            "import time:      3779 |       3899 |   library.views\n"
+            "import time:      1000 |       4899 | mysite.urls\n"
+        )
+        self.assertEqual(rows[-1], (0, 'mysite.urls', 1.0, 4.899))
+        self.assertEqual([depth for depth, *_ in rows], [2, 1, 0])
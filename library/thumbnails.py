@@ -0,0 +1,137 @@
+# library/thumbnails.py
+
+"""Varian sampul buku berukuran tetap (WebP + JPEG) untuk ``srcset``.
+
+Varian dibuat saat sampul diunggah (signal ``post_save`` Book) atau lewat
+command ``build_thumbnails`` untuk sampul lama, lalu disimpan di storage
+default (filesystem lokal, Cloudinary jika dikonfigurasi). Daftar varian
+dicatat di ``Book.cover_variants`` sehingga template tidak perlu menyentuh
+storage ataupun query tambahan.
+
+``render_variants`` murni (bytes masuk, bytes keluar) agar bisa dijalankan
+di process pool. Pillow diimpor di dalamnya: modul ini dimuat signal saat
+startup, sedangkan resize hanya terjadi saat sampul diunggah.
+"""
+
+import logging
+import posixpath
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.utils import timezone
+
+from .caching import bump_books
+from .models import Book
+
+logger = logging.getLogger(__name__)
+
+# Lebar varian (px): kartu katalog ~300px, halaman detail hingga 400px tinggi, 2x untuk layar retina
+THUMBNAIL_WIDTHS = (160, 320, 640)
+THUMBNAIL_DIR = 'book_covers/thumbs'
+FORMATS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+
+
+# --- 1. Pembuatan Varian (tanpa Django) ---
+
+def render_variants(data, widths=THUMBNAIL_WIDTHS):
+    """Mengembalikan ``[(format, lebar, bytes), ...]`` dari bytes gambar asli.
+
+    Gambar tidak pernah diperbesar: lebar di atas ukuran asli dilewati,
+    tetapi minimal satu varian (selebar gambar asli) selalu dibuat.
+    """
+    from PIL import Image, ImageOps
+
+    with Image.open(BytesIO(data)) as image:
+        image = ImageOps.exif_transpose(image)
+        if image.mode != 'RGB':
+            # JPEG tidak punya kanal alfa: latar transparan dijadikan putih
+            background = Image.new('RGB', image.size, 'white')
+            rgba = image.convert('RGBA')
+            background.paste(rgba, mask=rgba.getchannel('A'))
+            image = background
+        sizes = [width for width in widths if width < image.width]
+        if len(sizes) < len(widths):
+            sizes.append(image.width)
+
+        variants = []
+        for width in sizes:
+            height = max(1, round(image.height * width / image.width))
+            resized = image.resize((width, height), Image.LANCZOS) if width != image.width else image
+            for fmt, (pil_format, options) in FORMATS.items():
+                buffer = BytesIO()
+                resized.save(buffer, pil_format, **options)
+                variants.append((fmt, width, buffer.getvalue()))
+        return variants
+
+
+# --- 2. Penyimpanan ---
+
+def variant_name(book, fmt, width):
+    stem = posixpath.splitext(posixpath.basename(book.cover_image.name))[0]
+    return f'{THUMBNAIL_DIR}/{book.pk}-{stem}-{width}.{fmt}'
+
+
+def store_variants(book, variants):
+    """Menyimpan hasil ``render_variants`` dan mencatatnya di ``cover_variants``."""
+    delete_variants(book)
+    record = {'source': book.cover_image.name}
+    for fmt, width, content in variants:
+        name = default_storage.save(variant_name(book, fmt, width), ContentFile(content))
+        record.setdefault(fmt, []).append([width, name])
+    # UPDATE langsung: save() akan memicu signal ini lagi
+    Book.objects.filter(pk=book.pk).update(cover_variants=record, updated_at=timezone.now())
+    book.cover_variants = record
+    bump_books([book.pk])
+    return record
+
+
+def delete_variants(book):
+    for fmt in FORMATS:
+        for _, name in book.cover_variants.get(fmt, []):
+            try:
+                default_storage.delete(name)
+            except Exception:
+                logger.warning("Varian sampul %s gagal dihapus", name, exc_info=True)
+
+
+def clear_variants(book):
+    """Membuang varian yang tercatat; template kembali memakai sampul asli."""
+    delete_variants(book)
+    Book.objects.filter(pk=book.pk).update(cover_variants={})
+    book.cover_variants = {}
+
+
+def read_cover(book):
+    with book.cover_image.open('rb') as cover:
+        return cover.read()
+
+
+def needs_variants(book):
+    return bool(book.cover_image) and book.cover_variants.get('source') != book.cover_image.name
+
+
+def generate_for_book(book):
+    """Membuat varian untuk satu buku di proses ini (dipakai saat unggah)."""
+    return store_variants(book, render_variants(read_cover(book)))
+
+
+# --- 3. Template ---
+
+def srcset(book, fmt):
+    """``"url 160w, url 320w"`` atau string kosong jika varian belum ada."""
+    return ', '.join(
+        f'{default_storage.url(name)} {width}w' for width, name in book.cover_variants.get(fmt, [])
+    )
+
+
+def fallback_url(book, max_width=None):
+    """URL JPEG terkecil yang cukup lebar; sampul asli jika belum ada varian."""
+    jpeg = book.cover_variants.get('jpeg', [])
+    if not jpeg:
+        return book.cover_image.url
+    fitting = [name for width, name in jpeg if max_width is None or width >= max_width]
+    return default_storage.url(fitting[0] if fitting else jpeg[-1][1])
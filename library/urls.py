@@ -10,6 +10,7 @@ urlpatterns = [
     path('about/', views.about, name='about'),
     path('user/profile/', views.profile, name='profile'),
     path('books', views.book_list, name='book_list'), 
+    path('authors/lookup/', views.author_lookup, name='author_lookup'),
     path('request/<int:book_id>/', views.request_loan, name='request_loan'), 
    path('loan/<int:pk>/', views.loan_detail_view, name='loan_detail'),
     path('books/<int:pk>/',views.detail_buku,name="detail_book"),
@@ -18,4 +19,5 @@ urlpatterns = [
     path('my-loans', views.my_loans, name='my_loans'), 
     path('loan/cancel/<int:loan_id>/', views.cancel_loan, name='cancel_loan'),
     path('user/change-password/',MyPasswordChangeView.as_view(), name='change_password'),
+    path('metrics/requests/', views.request_metrics, name='request_metrics'),
 ]
\ No newline at end of file
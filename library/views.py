@@ -1,8 +1,17 @@
 # library/views.py
 
+import hashlib
+from contextlib import nullcontext
 from datetime import date
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.core.cache.utils import make_template_fragment_key
 from django.shortcuts import render, get_object_or_404, redirect
+from django.http import Http404, JsonResponse
 from django.contrib.auth.decorators import login_required
+from django.contrib.auth.models import User
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth import update_session_auth_hash
 from django.contrib.auth.signals import user_logged_in, user_logged_out
 from django.contrib.auth.views import PasswordChangeView
@@ -10,11 +19,17 @@ from django.contrib.messages.views import SuccessMessageMixin
 from django.dispatch import receiver
 from django.contrib import messages
 from django.urls import reverse_lazy
-from django.db.models import Sum, Q, Avg, Value
-from django.db.models.functions import Coalesce
-from django.core.paginator import Paginator
+from django.db import transaction
+from django.db.models import Q, Prefetch
 
-from .models import Book, Loan, Review, Location, Author, Genre
+from . import search
+from .instrumentation import metrics
+from .caching import book_versions, cache_anonymous_page, conditional_page, get_version, get_versions
+from .account import LOAN_LIMIT, compute_account_state, get_account_state
+from .facets import get_facets, lookup_authors
+from .pagination import paginate, page_total
+from .routing import primary_reads, replica_reads
+from .models import Book, BookRecommendation, Loan, Review, Location, Author, Genre
 
 # --- AUTHENTICATION VIEWS ---
 
@@ -47,11 +62,32 @@ def about(request):
 
 # --- BOOK COLLECTION ---
 
-def book_list(request):
-    # 1. Ambil data dasar dengan anotasi rating
-    books = Book.objects.all().annotate(
-        rating_rata2=Coalesce(Avg('reviews__rating'), Value(0.0))
+async def _load_user(request):
+    # Context processor auth membaca request.user (lazy, sinkron); isi lebih dulu
+    # secara async agar render di view async tidak menyentuh database.
+    request.user = await request.auser()
+
+def catalogue_books():
+    """Queryset buku beserta relasi yang dirender di kartu & halaman detail."""
+    return Book.objects.select_related('location').prefetch_related(
+        Prefetch('authors', queryset=Author.objects.order_by('pk')),
+        'genre',
+    )
+
+def recommended_books(pk):
+    """Panel "pembaca juga meminjam": satu query lewat indeks unik (book, rank)."""
+    return (
+        BookRecommendation.objects.filter(book_id=pk).select_related('recommended')
+        .only('book_id', 'rank', 'recommended__title', 'recommended__cover_image',
+              'recommended__cover_variants', 'recommended__rating_avg')
+        .order_by('rank')
     )
+
+def _book_list_context(request):
+    # Pencarian (SQL mentah), facet (cache) dan pagination masih sinkron: dijalankan
+    # sekaligus di satu thread lewat sync_to_async dari view async book_list.
+    # 1. Ambil data dasar (rating sudah tersimpan di kolom rating_avg)
+    books = catalogue_books()
     
     # 2. Tangkap parameter filter
     query = request.GET.get('q')
@@ -61,94 +97,188 @@ def book_list(request):
     sort = request.GET.get('sort')
 
     # 3. Logika Pencarian & Filter
+    ranked = False
     if query:
-        books = books.filter(Q(title__icontains=query) | Q(isbn__icontains=query))
+        results = search.search_books(books, query)
+        if results is None:
+            # Indeks full-text tidak tersedia di database ini
+            books = books.filter(Q(title__icontains=query) | Q(isbn__icontains=query))
+        else:
+            books, ranked = results, True
+
+    filters = {}
     if genre_id:
-        books = books.filter(genre__id=genre_id)
+        filters['genre'] = Q(genre__id=genre_id)
     if author_id:
-        books = books.filter(authors__id=author_id)
+        filters['author'] = Q(authors__id=author_id)
     if location_id:
-        books = books.filter(location__id=location_id)
+        filters['location'] = Q(location__id=location_id)
+
+    # Facet dihitung sebelum filter diterapkan (setiap facet mengabaikan filternya sendiri)
+    facets = get_facets(books, filters, [query, genre_id, author_id, location_id])
+    books = books.filter(*filters.values())
 
-    # 4. Logika Sorting
+    # 4. Logika Sorting (kolom terakhir selalu 'id' agar cursor unik)
     if sort == 'rating':
-        books = books.order_by('-rating_rata2', 'title')
+        ordering = ['-rating_avg', 'title', 'id']
     elif sort == 'newest':
-        books = books.order_by('-id')
+        ordering = ['-id']
+    elif ranked and not sort:
+        # Tanpa pilihan urutan, hasil pencarian diurutkan berdasarkan relevansi
+        ordering = ['search_rank', 'id']
     else:
-        books = books.order_by('title')
+        ordering = ['title', 'id']
 
-    # 5. Pagination
-    paginator = Paginator(books, 12)
-    page_number = request.GET.get('page') or 1
-    books_page = paginator.get_page(page_number)
+    # 5. Pagination (keyset, total diambil dari cache)
+    books_page = paginate(request, books, 12, ordering)
 
     context = {
         'books': books_page,
-        'books_count': books.count(),
-        'genres': Genre.objects.all(),
-        'authors': Author.objects.all(),
-        'locations': Location.objects.all(),
+        'books_count': page_total(books_page, books),
+        'genres': facets['genres'],
+        'authors': facets['authors'],
+        'locations': facets['locations'],
+        'selected_genre': _selected_facet(facets['genres'], genre_id),
+        'selected_author': _selected_facet(facets['authors'], author_id),
+        'selected_location': _selected_facet(facets['locations'], location_id),
         'title': "Daftar Koleksi"
     }
-    return render(request, 'pages/book_list.html', context)
-
-def detail_buku(request, pk):
-    book = get_object_or_404(Book, pk=pk)
-    reviews = book.reviews.all().order_by('-created_at')
-    return render(request, 'pages/detail_book.html', {
-        'book': book, 
-        'reviews': reviews
+    if author_id and context['selected_author'] is None:
+        # Penulis yang dipilih lewat typeahead belum tentu termasuk penulis teratas
+        context['selected_author'] = Author.objects.filter(pk=author_id).values('id', 'name').first()
+
+    # Versi per buku untuk kunci fragmen kartu (satu get_many ke cache)
+    versions = book_versions([book.pk for book in books_page])
+    for book in books_page:
+        book.cache_version = versions[book.pk]
+    context['fragment_timeout'] = settings.FRAGMENT_CACHE_TIMEOUT
+    return context
+
+def _book_list_page_key(request):
+    return ['book_list', get_version('catalogue'), get_version('facets'), request.get_full_path()]
+
+def _etag(*parts):
+    return hashlib.md5('|'.join(str(p) for p in (settings.PAGE_ETAG_SALT, *parts)).encode()).hexdigest()
+
+def _book_list_validators(request):
+    # Facet menghitung buku di luar filter aktif, jadi stempelnya seluruh katalog. Setiap
+    # perubahan buku (termasuk hapus & relasi) menaikkan versi catalogue: ETag tanpa query.
+    # Last-Modified tidak dikirim karena butuh MAX(updated_at) seluruh tabel.
+    versions = get_versions(['catalogue', 'facets'])
+    return _etag('book_list', versions['catalogue'], versions['facets']), None
+
+@replica_reads
+@cache_anonymous_page(_book_list_page_key)
+@conditional_page(_book_list_validators)
+async def book_list(request):
+    await _load_user(request)
+    context = await sync_to_async(_book_list_context)(request)
+    # Render di thread: tag {% cache %} membaca cache secara sinkron (bisa backend DB)
+    return await sync_to_async(render)(request, 'pages/book_list.html', context)
+
+def _selected_facet(items, selected_id):
+    if not selected_id:
+        return None
+    return next((item for item in items if str(item['id']) == selected_id), None)
+
+@replica_reads
+def author_lookup(request):
+    """Endpoint typeahead penulis untuk filter katalog."""
+    return JsonResponse({'results': lookup_authors(request.GET.get('q'))})
+
+def _detail_page_key(request, pk):
+    return ['detail_buku', pk, book_versions([pk])[pk]]
+
+def _detail_validators(request, pk):
+    # Review, stok, rating dan nama relasi semuanya menaikkan Book.updated_at
+    modified = Book.objects.filter(pk=pk).values_list('updated_at', flat=True).first()
+    if modified is None:
+        return None, None
+    return _etag('detail_buku', pk, modified), modified
+
+@replica_reads
+@cache_anonymous_page(_detail_page_key)
+@conditional_page(_detail_validators)
+async def detail_buku(request, pk):
+    await _load_user(request)
+    version = (await sync_to_async(book_versions)([pk]))[pk]
+    cached = await cache.ahas_key(make_template_fragment_key('book_detail', [pk, version]))
+    # Fragmen akan diisi dengan versi terbaru: baca dari primary, bukan replika
+    with nullcontext() if cached else primary_reads():
+        # Fragmen sudah ter-render di cache: cukup kolom untuk bagian ulasan
+        books = Book.objects.only('id', 'title') if cached else catalogue_books()
+        try:
+            book = await books.aget(pk=pk)
+        except Book.DoesNotExist:
+            raise Http404("Buku tidak ditemukan.")
+        # Dievaluasi sebelum render: template tidak boleh memicu query sinkron di event loop
+        reviews = [review async for review in book.reviews.select_related('user').order_by('-created_at')]
+        return await sync_to_async(render)(request, 'pages/detail_book.html', {
+            'book': book,
+            'reviews': reviews,
+            # Lazy: hanya dievaluasi (di thread render) saat fragmen informasi buku tidak ada di cache
+            'recommendations': recommended_books(pk),
+            'book_version': version,
+            'fragment_timeout': settings.FRAGMENT_CACHE_TIMEOUT,
+        })
+
+@staff_member_required
+def request_metrics(request):
+    """Histogram durasi, query, SQL & template per nama URL di proses ini (sampel)."""
+    return JsonResponse({
+        'sample_rate': settings.INSTRUMENTATION_SAMPLE_RATE,
+        'views': metrics.snapshot(),
     })
 
 # --- USER PROFILE & LOANS ---
 
 @login_required
 def profile(request):
-    current_loans = Loan.objects.filter(member=request.user, status='approved').order_by('due_date')
-    
-    # Perhitungan denda
-    fixed_fine = Loan.objects.filter(
-        member=request.user, is_paid=False
-    ).aggregate(Sum('fine_amount'))['fine_amount__sum'] or 0
-    
-    running_fine = sum(loan.current_fine for loan in current_loans)
-    total_fine = fixed_fine + running_fine
+    state = get_account_state(request.user)
+    current_loans = Loan.objects.filter(
+        member=request.user, status='approved'
+    ).select_related('book').order_by('due_date')
     
     context = {
         'current_loans': current_loans,
-        'current_loans_count': current_loans.count(),
-        'loan_limit': 5,
-        'total_fine': total_fine,
-        'has_fine': not Loan.can_user_borrow(request.user),
+        'current_loans_count': state.approved_count,
+        'loan_limit': LOAN_LIMIT,
+        'total_fine': state.total_fine,
+        'has_fine': not state.can_borrow,
         'today': date.today(),
     }
     return render(request, 'pages/profile.html', context)
 
 @login_required
 def request_loan(request, book_id):
-    book = get_object_or_404(Book, pk=book_id)
-    active_loans = Loan.objects.filter(member=request.user, status__in=['pending', 'approved'])
-    
-    # Validasi
-    if not Loan.can_user_borrow(request.user):
-        messages.error(request, 'Anda memiliki denda yang belum dibayar.')
-    elif active_loans.count() >= 5:
-        messages.error(request, "Batas maksimal peminjaman adalah 5 buku.")
-    elif active_loans.filter(book=book).exists():
-        messages.error(request, 'Anda sudah mengajukan atau sedang meminjam buku ini.')
-    elif book.stock <= 0:
-        messages.error(request, 'Stok buku sedang kosong.')
-    else:
-        Loan.objects.create(book=book, member=request.user, status='pending')
-        messages.success(request, 'Peminjaman berhasil diajukan!')
-        return redirect('my_loans')
+    with transaction.atomic():
+        # Kunci baris user: pengajuan bersamaan dari anggota yang sama diserialkan.
+        # Status dihitung langsung dari database; cache get_account_state hanya untuk
+        # tampilan (bisa basi di worker/instance lain).
+        User.objects.select_for_update().filter(pk=request.user.pk).exists()
+        state = compute_account_state(request.user.pk)
+        # Stok dibaca setelah kunci diambil, bukan sebelum transaksi
+        book = get_object_or_404(Book.objects.only('pk', 'stock'), pk=book_id)
+
+        # Validasi
+        if not state.can_borrow:
+            messages.error(request, 'Anda memiliki denda yang belum dibayar.')
+        elif state.at_limit:
+            messages.error(request, f"Batas maksimal peminjaman adalah {LOAN_LIMIT} buku.")
+        elif Loan.objects.filter(member=request.user, status__in=['pending', 'approved'], book=book).exists():
+            messages.error(request, 'Anda sudah mengajukan atau sedang meminjam buku ini.')
+        elif book.stock <= 0:
+            messages.error(request, 'Stok buku sedang kosong.')
+        else:
+            Loan.objects.create(book=book, member=request.user, status='pending')
+            messages.success(request, 'Peminjaman berhasil diajukan!')
+            return redirect('my_loans')
 
     return redirect('detail_book', pk=book_id)
 
 @login_required
 def my_loans(request):
-    loans = Loan.objects.filter(member=request.user).order_by('-id')
+    loans = Loan.objects.filter(member=request.user).select_related('book').order_by('-id')
     
     status_filter = request.GET.get('status')
     if status_filter == 'pending':
@@ -163,21 +293,17 @@ def my_loans(request):
         # Filter khusus: Status sudah returned DAN is_paid=True
         loans = loans.filter(status='returned', is_paid=True)
     elif status_filter == 'not-paid':
-        # Filter khusus: Status sudah returned DAN is_paid=True
-        loans = Loan.objects.filter(
-            status__in=['approved',"returned"],
-            due_date__lt=date.today(),
-            is_paid=False
-        )
-    paginator = Paginator(loans, 8)
-    page_number = request.GET.get('page') or 1
-    loans = paginator.get_page(page_number)
-    
-    active_count = Loan.objects.filter(member=request.user, status__in=['pending', 'approved']).count()
+        # Filter khusus: ada denda (berjalan atau tetap) yang belum dibayar
+        loans = loans.filter(accrued_fine__gt=0, is_paid=False)
+    loans = paginate(request, loans, 8, ['-id'])
+    state = get_account_state(request.user)
     
     return render(request, 'pages/my_loans.html', {
         'loans': loans, 
-        'active_loans_count': active_count
+        'active_loans_count': state.active_count,
+        'total_unpaid_fines': state.total_fine,
+        # Denda pinjaman yang sudah dikembalikan (bisa dibayar sekaligus)
+        'payable_fines': state.unpaid_fixed_fine,
     })
 @login_required
 def loan_detail_view(request, pk):
@@ -206,10 +332,12 @@ def submit_review(request, book_id):
         if Review.objects.filter(book=book, user=request.user).exists():
             messages.error(request, "Anda sudah memberikan review untuk buku ini.")
         else:
-            Review.objects.create(
-                book=book, user=request.user,
-                rating=request.POST.get('rating'),
-                comment=request.POST.get('comment')
-            )
+            # Review dan agregat rating buku disimpan dalam satu transaksi
+            with transaction.atomic():
+                Review.objects.create(
+                    book=book, user=request.user,
+                    rating=request.POST.get('rating'),
+                    comment=request.POST.get('comment')
+                )
             messages.success(request, "Review berhasil dikirim!")
     return redirect('detail_book', pk=book_id)
\ No newline at end of file
@@ -1,3 +1,46 @@
 from django.contrib import admin
 
-# Register your models here.
+from .models import PaymentEvent, PaymentOrder
+from .notifications import MAX_ATTEMPTS
+
+
+class QueueStateFilter(admin.SimpleListFilter):
+    title = "Antrean"
+    parameter_name = 'queue'
+
+    def lookups(self, request, model_admin):
+        return [('pending', "Menunggu"), ('dead', f"Gagal {MAX_ATTEMPTS}x (dead)"), ('done', "Selesai")]
+
+    def queryset(self, request, queryset):
+        if self.value() == 'pending':
+            return queryset.filter(processed_at__isnull=True, attempts__lt=MAX_ATTEMPTS)
+        if self.value() == 'dead':
+            return queryset.filter(processed_at__isnull=True, attempts__gte=MAX_ATTEMPTS)
+        if self.value() == 'done':
+            return queryset.filter(processed_at__isnull=False)
+        return queryset
+
+
+@admin.register(PaymentEvent)
+class PaymentEventAdmin(admin.ModelAdmin):
+    list_display = ('order_id', 'transaction_status', 'gross_amount', 'received_at', 'processed_at', 'attempts')
+    list_filter = ('transaction_status', QueueStateFilter)
+    search_fields = ('order_id',)
+    readonly_fields = [field.name for field in PaymentEvent._meta.fields]
+
+    # Append-only: notifikasi hanya dibuat oleh webhook
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(PaymentOrder)
+class PaymentOrderAdmin(admin.ModelAdmin):
+    list_display = ('order_id', 'member', 'amount', 'status', 'created_at', 'expires_at', 'paid_at')
+    list_filter = ('status',)
+    search_fields = ('order_id', 'member__username')
+    list_select_related = ('member',)
+    readonly_fields = ('order_id', 'member', 'loans', 'amount', 'snap_token', 'redirect_url',
+                       'created_at', 'expires_at', 'paid_at')
@@ -0,0 +1,66 @@
+# midtrans/fake_snap.py
+
+"""Server Snap palsu untuk uji lokal & uji beban checkout.
+
+Meniru ``POST /snap/v1/transactions`` dengan latensi dan tingkat error yang
+bisa diatur. Arahkan aplikasi ke server ini lewat ``MIDTRANS_SNAP_URL``.
+"""
+
+import json
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class FakeSnapHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # keep-alive, sama seperti Midtrans
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        server = self.server
+        time.sleep(server.latency)
+        if self.path.rstrip('/') != '/snap/v1/transactions':
+            return self._reply(404, {'error_messages': ['Not found']})
+        if random.random() < server.error_rate:
+            return self._reply(503, {'error_messages': ['Service unavailable']})
+        order_id = json.loads(body or b'{}').get('transaction_details', {}).get('order_id')
+        if order_id in server.orders:
+            return self._reply(400, {'error_messages': ['transaction_details.order_id sudah digunakan']})
+        server.orders.add(order_id)
+        token = uuid.uuid4().hex
+        self._reply(201, {
+            'token': token,
+            'redirect_url': f'http://{self.headers.get("Host")}/snap/v2/vtweb/{token}',
+        })
+
+    def _reply(self, status, payload):
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+def make_server(host='127.0.0.1', port=0, latency=0.0, error_rate=0.0, verbose=False):
+    server = ThreadingHTTPServer((host, port), FakeSnapHandler)
+    server.daemon_threads = True
+    server.latency = latency
+    server.error_rate = error_rate
+    server.verbose = verbose
+    server.orders = set()
+    return server
+
+
+def start_in_thread(**kwargs):
+    """Menjalankan server di thread latar; mengembalikan ``(server, base_url)``."""
+    server = make_server(**kwargs)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    host, port = server.server_address
+    return server, f'http://{host}:{port}/snap/v1'
@@ -0,0 +1,243 @@
+# midtrans/gateway.py
+
+"""Klien HTTP Midtrans Snap.
+
+Menggantikan ``midtransclient.Snap`` agar panggilan ke Midtrans tidak bisa
+menahan worker gunicorn terlalu lama:
+
+* satu ``requests.Session`` per proses (koneksi keep-alive dipakai ulang);
+* batas waktu connect/read yang ketat;
+* retry dengan backoff + jitter hanya untuk kegagalan yang aman diulang
+  (koneksi gagal dibuka, 429/502/503/504);
+* circuit breaker: setelah beberapa kegagalan berturut-turut panggilan
+  langsung gagal dengan error terakhir sampai masa tunggu habis;
+* metrik latensi di memori proses (``get_snap_client().metrics.snapshot()``).
+
+``requests`` baru diimpor saat klien pertama dibuat: cold start serverless
+untuk halaman katalog & webhook tidak ikut membayar impor HTTP client.
+"""
+
+import logging
+import random
+import threading
+import time
+from collections import deque
+from functools import lru_cache
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+SANDBOX_URL = 'https://app.sandbox.midtrans.com/snap/v1'
+PRODUCTION_URL = 'https://app.midtrans.com/snap/v1'
+RETRY_STATUSES = (429, 502, 503, 504)
+
+
+class GatewayError(Exception):
+    """Midtrans menolak permintaan atau tidak bisa dihubungi."""
+
+
+class GatewayUnavailable(GatewayError):
+    """Circuit breaker terbuka: panggilan tidak dikirim sama sekali."""
+
+
+class GatewayRejected(GatewayError):
+    """Midtrans menolak isi permintaan (4xx); tidak dihitung sebagai kegagalan breaker."""
+
+
+# --- 1. Metrik ---
+
+class LatencyMetrics:
+    def __init__(self, size=500):
+        self._lock = threading.Lock()
+        self._samples = deque(maxlen=size)
+        self.calls = 0
+        self.failures = 0
+        self.rejected = 0
+
+    def record(self, milliseconds, ok):
+        with self._lock:
+            self._samples.append(milliseconds)
+            self.calls += 1
+            self.failures += not ok
+
+    def record_rejected(self):
+        with self._lock:
+            self.rejected += 1
+
+    def snapshot(self):
+        with self._lock:
+            samples = sorted(self._samples)
+            calls, failures, rejected = self.calls, self.failures, self.rejected
+
+        def percentile(p):
+            return round(samples[min(len(samples) - 1, int(len(samples) * p))], 1) if samples else None
+        return {
+            'calls': calls, 'failures': failures, 'rejected': rejected,
+            'p50_ms': percentile(0.50), 'p95_ms': percentile(0.95), 'max_ms': round(samples[-1], 1) if samples else None,
+        }
+
+
+# --- 2. Circuit Breaker ---
+
+class CircuitBreaker:
+    """closed -> open (setelah ``threshold`` kegagalan) -> half-open (setelah ``reset_timeout``)."""
+
+    def __init__(self, threshold, reset_timeout):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None
+        self._probing = False
+        self.last_error = None
+
+    @property
+    def state(self):
+        if self._opened_at is None:
+            return 'closed'
+        if time.monotonic() - self._opened_at >= self.reset_timeout:
+            return 'half-open'
+        return 'open'
+
+    def before_call(self):
+        with self._lock:
+            state = self.state
+            if state == 'open' or (state == 'half-open' and self._probing):
+                raise GatewayUnavailable(f"Midtrans sedang tidak tersedia: {self.last_error}")
+            # Half-open: hanya satu permintaan percobaan yang dilewatkan
+            self._probing = state == 'half-open'
+
+    def on_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._probing = False
+
+    def on_failure(self, error):
+        with self._lock:
+            self.last_error = str(error)
+            self._failures += 1
+            self._probing = False
+            if self._opened_at is not None or self._failures >= self.threshold:
+                self._opened_at = time.monotonic()
+                logger.warning("Circuit breaker Midtrans terbuka: %s", error)
+
+
+# --- 3. Klien ---
+
+def _not_sent(exc):
+    import requests
+    from urllib3.exceptions import NewConnectionError
+
+    if isinstance(exc, requests.ConnectTimeout):
+        return True
+    reason = getattr(exc.args[0], 'reason', None) if exc.args else None
+    return isinstance(reason, NewConnectionError)
+
+
+class SnapClient:
+    def __init__(self, server_key, base_url, connect_timeout, read_timeout,
+                 max_retries, backoff, breaker_threshold, breaker_reset, pool_size=10):
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        self.base_url = base_url.rstrip('/')
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.breaker = CircuitBreaker(breaker_threshold, breaker_reset)
+        self.metrics = LatencyMetrics()
+
+        self.session = requests.Session()
+        self.session.auth = (server_key or '', '')
+        self.session.headers.update({'Accept': 'application/json'})
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    def create_transaction(self, param):
+        """Mengembalikan dict ``{'token': ..., 'redirect_url': ...}`` dari Snap."""
+        return self._post('/transactions', param)
+
+    def _sleep_before_retry(self, attempt):
+        # Full jitter: acak antara 0 dan backoff * 2^attempt
+        time.sleep(random.uniform(0, self.backoff * (2 ** attempt)))
+
+    def _post(self, path, payload):
+        try:
+            self.breaker.before_call()
+        except GatewayUnavailable:
+            self.metrics.record_rejected()
+            raise
+        error = GatewayError("Panggilan Snap terhenti")
+        try:
+            data = self._send(path, payload)
+        except GatewayRejected:
+            error = None
+            raise
+        except Exception as exc:
+            error = exc
+            raise
+        else:
+            error = None
+            return data
+        finally:
+            # Breaker selalu diselesaikan, apa pun exception-nya: probe half-open yang
+            # tidak pernah selesai membuat semua panggilan berikutnya ditolak
+            if error is None:
+                self.breaker.on_success()
+            else:
+                self.breaker.on_failure(error)
+
+    def _send(self, path, payload):
+        import requests
+
+        attempt = 0
+        while True:
+            start = time.perf_counter()
+            try:
+                response = self.session.post(self.base_url + path, json=payload, timeout=self.timeout)
+                data = response.json() if response.status_code < 400 else None
+            except (requests.RequestException, ValueError) as exc:
+                # Hanya diulang jika permintaan pasti belum terkirim; setelah read
+                # timeout (atau respons 2xx yang bukan JSON) transaksi mungkin sudah
+                # dibuat di Midtrans
+                error = exc
+                retryable = isinstance(exc, requests.ConnectionError) and _not_sent(exc)
+            else:
+                elapsed = (time.perf_counter() - start) * 1000
+                if response.status_code < 400:
+                    self.metrics.record(elapsed, ok=True)
+                    return data
+                error = GatewayError(f"Snap HTTP {response.status_code}: {response.text[:200]}")
+                retryable = response.status_code in RETRY_STATUSES
+                if not retryable and response.status_code < 500:
+                    self.metrics.record(elapsed, ok=True)
+                    raise GatewayRejected(str(error))
+
+            self.metrics.record((time.perf_counter() - start) * 1000, ok=False)
+            if retryable and attempt < self.max_retries:
+                attempt += 1
+                logger.info("Retry Snap %s (percobaan %s): %s", path, attempt, error)
+                self._sleep_before_retry(attempt)
+                continue
+            if isinstance(error, GatewayError):
+                raise error
+            raise GatewayError(str(error)) from error
+
+
+@lru_cache(maxsize=None)
+def get_snap_client():
+    """Satu klien (dan satu pool koneksi) per proses; dibuat saat pertama dipakai."""
+    base_url = settings.MIDTRANS_SNAP_URL or (PRODUCTION_URL if settings.IS_PRODUCTION else SANDBOX_URL)
+    return SnapClient(
+        server_key=settings.MIDTRANS_SERVER_KEY,
+        base_url=base_url,
+        connect_timeout=settings.MIDTRANS_CONNECT_TIMEOUT,
+        read_timeout=settings.MIDTRANS_READ_TIMEOUT,
+        max_retries=settings.MIDTRANS_MAX_RETRIES,
+        backoff=settings.MIDTRANS_RETRY_BACKOFF,
+        breaker_threshold=settings.MIDTRANS_BREAKER_THRESHOLD,
+        breaker_reset=settings.MIDTRANS_BREAKER_RESET,
+    )
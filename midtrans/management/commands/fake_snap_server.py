@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from midtrans.fake_snap import make_server
+
+
+class Command(BaseCommand):
+    help = (
+        "Menjalankan server Snap palsu untuk uji lokal. Jalankan aplikasi dengan "
+        "MIDTRANS_SNAP_URL=http://127.0.0.1:<port>/snap/v1 agar checkout diarahkan ke sini."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--port', type=int, default=8765)
+        parser.add_argument('--latency', type=float, default=0.1, help="Latensi tiap respons (detik).")
+        parser.add_argument('--error-rate', type=float, default=0.0, help="Proporsi respons 503 (0-1).")
+        parser.add_argument('--verbose', action='store_true')
+
+    def handle(self, *args, **options):
+        server = make_server(
+            port=options['port'], latency=options['latency'],
+            error_rate=options['error_rate'], verbose=options['verbose'],
+        )
+        self.stdout.write(f"Snap palsu di http://127.0.0.1:{options['port']}/snap/v1 (Ctrl+C untuk berhenti)")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
@@ -0,0 +1,113 @@
+import json
+import statistics
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from django.urls import reverse
+from django.utils import timezone
+
+from library.models import Loan
+from midtrans.models import PaymentOrder
+from midtrans.notifications import signature_for
+from midtrans.payments import new_order_id
+
+
+class Command(BaseCommand):
+    help = (
+        "Pengganti lokal notifier Midtrans untuk uji beban webhook. Mengirim notifikasi "
+        "bertanda tangan (MIDTRANS_SERVER_KEY) ke --url, atau langsung ke view lewat test "
+        "client jika --url tidak diberikan. --duplicates meniru retry Midtrans."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default=None,
+                            help="URL webhook, mis. http://127.0.0.1:8000/payment/webhook/midtrans/")
+        parser.add_argument('--orders', nargs='*', default=None,
+                            help="Order ID; default semua PaymentOrder yang masih pending.")
+        parser.add_argument('--create-orders', action='store_true',
+                            help="Buat dulu PaymentOrder lokal (tanpa Midtrans) untuk pinjaman "
+                                 "returned yang belum lunas.")
+        parser.add_argument('--count', type=int, default=None, help="Batas jumlah order.")
+        parser.add_argument('--status', default='settlement')
+        parser.add_argument('--duplicates', type=int, default=1,
+                            help="Berapa kali setiap notifikasi dikirim.")
+        parser.add_argument('--concurrency', type=int, default=8)
+
+    def handle(self, *args, **options):
+        if not settings.MIDTRANS_SERVER_KEY:
+            raise CommandError("MIDTRANS_SERVER_KEY belum diatur; webhook menolak semua notifikasi tanpanya.")
+        if options['create_orders']:
+            self._create_orders(options['count'])
+        orders = PaymentOrder.objects.filter(status='pending')
+        if options['orders']:
+            orders = PaymentOrder.objects.filter(order_id__in=options['orders'])
+        rows = list(orders.order_by('pk').values_list('order_id', 'amount')[:options['count']])
+        if not rows:
+            raise CommandError("Tidak ada order untuk dikirimi notifikasi (coba --create-orders).")
+
+        payloads = [
+            self._payload(order_id, options['status'], f"{amount:.2f}") for order_id, amount in rows
+        ] * options['duplicates']
+
+        send = self._http_sender(options['url']) if options['url'] else self._client_sender()
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['concurrency']) as pool:
+            results = list(pool.map(send, payloads))
+        elapsed = time.perf_counter() - started
+
+        latencies = sorted(latency for _, latency in results)
+        codes = Counter(code for code, _ in results)
+        self.stdout.write(
+            f"{len(results)} notifikasi dalam {elapsed:.2f} s ({len(results) / elapsed:.1f}/s), "
+            f"p50 {statistics.median(latencies):.1f} ms, "
+            f"p95 {latencies[int(len(latencies) * 0.95) - 1]:.1f} ms"
+        )
+        self.stdout.write(f"Status HTTP: {dict(codes)}")
+
+    def _create_orders(self, limit):
+        loans = Loan.objects.filter(status='returned', is_paid=False, fine_amount__gt=0).order_by('pk')[:limit]
+        expires_at = timezone.now() + timedelta(minutes=settings.MIDTRANS_ORDER_EXPIRY_MINUTES)
+        for loan in loans:
+            order = PaymentOrder.objects.create(
+                order_id=new_order_id(), member_id=loan.member_id, amount=loan.fine_amount,
+                snap_token=f'local-{loan.pk}', expires_at=expires_at,
+            )
+            order.loans.add(loan)
+
+    def _payload(self, order_id, status, gross_amount):
+        status_code = '200' if status in ('settlement', 'capture') else '201'
+        return {
+            'order_id': order_id,
+            'transaction_status': status,
+            'status_code': status_code,
+            'gross_amount': gross_amount,
+            'fraud_status': 'accept',
+            'payment_type': 'bank_transfer',
+            'transaction_time': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            'signature_key': signature_for(order_id, status_code, gross_amount),
+        }
+
+    def _http_sender(self, url):
+        import requests
+
+        session = requests.Session()
+
+        def send(payload):
+            start = time.perf_counter()
+            response = session.post(url, json=payload, timeout=10)
+            return response.status_code, (time.perf_counter() - start) * 1000
+        return send
+
+    def _client_sender(self):
+        url = reverse('midtrans_webhook')
+
+        def send(payload):
+            start = time.perf_counter()
+            response = Client().post(url, json.dumps(payload), content_type='application/json')
+            return response.status_code, (time.perf_counter() - start) * 1000
+        return send
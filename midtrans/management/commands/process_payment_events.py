@@ -0,0 +1,35 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from midtrans import notifications
+
+
+class Command(BaseCommand):
+    help = (
+        "Worker antrean notifikasi Midtrans: menerapkan PaymentEvent yang belum diproses. "
+        "Jalankan terus-menerus (proses worker) atau dengan --once dari cron. Beberapa worker "
+        "aman berjalan bersamaan di PostgreSQL (SELECT ... FOR UPDATE SKIP LOCKED)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help="Kosongkan antrean lalu berhenti.")
+        parser.add_argument('--batch-size', type=int, default=100)
+        parser.add_argument('--interval', type=float, default=2.0,
+                            help="Jeda (detik) saat antrean kosong.")
+        parser.add_argument('--max-attempts', type=int, default=notifications.MAX_ATTEMPTS)
+
+    def handle(self, *args, **options):
+        total = 0
+        while True:
+            processed = notifications.process_pending(options['batch_size'], options['max_attempts'])
+            total += processed
+            if processed:
+                continue
+            if options['once']:
+                break
+            time.sleep(options['interval'])
+        self.stdout.write(self.style.SUCCESS(f"{total} notifikasi diproses."))
+        dead = notifications.dead_events(options['max_attempts']).count()
+        if dead:
+            self.stderr.write(f"{dead} notifikasi gagal {options['max_attempts']} kali (dead); lihat admin Notifikasi Pembayaran.")
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.8 on 2026-10-17 22:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PaymentEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('order_id', models.CharField(max_length=64, verbose_name='Order ID')),
+                ('transaction_status', models.CharField(max_length=20, verbose_name='Status Transaksi')),
+                ('status_code', models.CharField(blank=True, max_length=3)),
+                ('fraud_status', models.CharField(blank=True, max_length=20)),
+                ('gross_amount', models.CharField(blank=True, max_length=20)),
+                ('payload', models.JSONField(default=dict)),
+                ('received_at', models.DateTimeField(auto_now_add=True, verbose_name='Diterima')),
+                ('processed_at', models.DateTimeField(blank=True, null=True, verbose_name='Diproses')),
+                ('attempts', models.PositiveSmallIntegerField(default=0)),
+                ('last_error', models.TextField(blank=True)),
+            ],
+            options={
+                'verbose_name': 'Notifikasi Pembayaran',
+                'verbose_name_plural': 'Notifikasi Pembayaran',
+                'indexes': [models.Index(condition=models.Q(('processed_at__isnull', True)), fields=['id'], name='payment_event_pending_idx')],
+                'constraints': [models.UniqueConstraint(fields=('order_id', 'transaction_status'), name='payment_event_order_status_uniq')],
+            },
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.8 on 2026-10-17 22:02
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0018_loan_access_indexes'),
+        ('midtrans', '0001_payment_event'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PaymentOrder',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('order_id', models.CharField(max_length=50, unique=True, verbose_name='Order ID')),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=10, verbose_name='Jumlah (Rp)')),
+                ('status', models.CharField(choices=[('pending', 'Menunggu Pembayaran'), ('paid', 'Lunas'), ('expired', 'Kedaluwarsa'), ('failed', 'Gagal / Dibatalkan')], default='pending', max_length=10, verbose_name='Status')),
+                ('snap_token', models.CharField(blank=True, max_length=64, verbose_name='Token Snap')),
+                ('redirect_url', models.URLField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('expires_at', models.DateTimeField(verbose_name='Token Berlaku Sampai')),
+                ('paid_at', models.DateTimeField(blank=True, null=True)),
+                ('loans', models.ManyToManyField(related_name='payment_orders', to='library.loan', verbose_name='Pinjaman')),
+                ('member', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='payment_orders', to=settings.AUTH_USER_MODEL, verbose_name='Anggota')),
+            ],
+            options={
+                'verbose_name': 'Order Pembayaran',
+                'verbose_name_plural': 'Order Pembayaran',
+                'indexes': [models.Index(fields=['member', 'status', 'expires_at'], name='payment_order_reuse_idx')],
+            },
+        ),
+    ]
@@ -1,3 +1,79 @@
+from django.contrib.auth.models import User
 from django.db import models
 
-# Create your models here.
+from library.models import Loan
+
+
+class PaymentEvent(models.Model):
+    """Notifikasi Midtrans yang diterima webhook (append-only).
+
+    Satu baris per kombinasi ``order_id`` + ``transaction_status`` sehingga
+    notifikasi ulang (retry) dari Midtrans tidak pernah diproses dua kali.
+    Baris dengan ``processed_at`` kosong adalah antrean untuk worker
+    ``process_payment_events``.
+    """
+
+    order_id = models.CharField(max_length=64, verbose_name="Order ID")
+    transaction_status = models.CharField(max_length=20, verbose_name="Status Transaksi")
+    status_code = models.CharField(max_length=3, blank=True)
+    fraud_status = models.CharField(max_length=20, blank=True)
+    gross_amount = models.CharField(max_length=20, blank=True)
+    payload = models.JSONField(default=dict)
+    received_at = models.DateTimeField(auto_now_add=True, verbose_name="Diterima")
+
+    # Status pemrosesan oleh worker
+    processed_at = models.DateTimeField(null=True, blank=True, verbose_name="Diproses")
+    attempts = models.PositiveSmallIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+
+    def __str__(self):
+        return f"{self.order_id} ({self.transaction_status})"
+
+    class Meta:
+        verbose_name = "Notifikasi Pembayaran"
+        verbose_name_plural = "Notifikasi Pembayaran"
+        constraints = [
+            models.UniqueConstraint(fields=['order_id', 'transaction_status'], name='payment_event_order_status_uniq'),
+        ]
+        indexes = [
+            # Antrean worker: hanya baris yang belum diproses
+            models.Index(fields=['id'], name='payment_event_pending_idx', condition=models.Q(processed_at__isnull=True)),
+        ]
+
+
+class PaymentOrder(models.Model):
+    """Order pembayaran denda yang dikirim ke Midtrans Snap.
+
+    Token Snap disimpan bersama masa berlakunya sehingga klik ulang tombol
+    bayar memakai token yang sama tanpa memanggil Midtrans lagi. Webhook
+    mencari order lewat ``order_id`` (unik) alih-alih mengurai string.
+    """
+
+    ORDER_STATUS = (
+        ('pending', 'Menunggu Pembayaran'),
+        ('paid', 'Lunas'),
+        ('expired', 'Kedaluwarsa'),
+        ('failed', 'Gagal / Dibatalkan'),
+    )
+
+    order_id = models.CharField(max_length=50, unique=True, verbose_name="Order ID")
+    member = models.ForeignKey(User, on_delete=models.CASCADE, related_name='payment_orders', verbose_name="Anggota")
+    loans = models.ManyToManyField(Loan, related_name='payment_orders', verbose_name="Pinjaman")
+    amount = models.DecimalField(max_digits=10, decimal_places=2, verbose_name="Jumlah (Rp)")
+    status = models.CharField(max_length=10, choices=ORDER_STATUS, default='pending', verbose_name="Status")
+    snap_token = models.CharField(max_length=64, blank=True, verbose_name="Token Snap")
+    redirect_url = models.URLField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(verbose_name="Token Berlaku Sampai")
+    paid_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return self.order_id
+
+    class Meta:
+        verbose_name = "Order Pembayaran"
+        verbose_name_plural = "Order Pembayaran"
+        indexes = [
+            # Pencarian token yang masih berlaku saat checkout
+            models.Index(fields=['member', 'status', 'expires_at'], name='payment_order_reuse_idx'),
+        ]
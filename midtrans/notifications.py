@@ -0,0 +1,188 @@
+# midtrans/notifications.py
+
+"""Pipeline notifikasi pembayaran Midtrans.
+
+Webhook hanya memverifikasi tanda tangan lalu mencatat notifikasi ke
+``PaymentEvent``. Perubahan status pinjaman diterapkan dari baris yang belum
+diproses di tabel yang sama (tanpa broker): langsung di request webhook
+(``MIDTRANS_PROCESS_INLINE``, default) dan/atau oleh worker
+``process_payment_events``. Keduanya aman berjalan bersamaan.
+
+Tanpa ``MIDTRANS_SERVER_KEY`` semua notifikasi ditolak: tanda tangan tidak
+bisa diverifikasi. Notifikasi yang gagal ``MAX_ATTEMPTS`` kali tidak diambil
+lagi dan dicatat sebagai *dead* di log (filter di admin).
+"""
+
+import hashlib
+import hmac
+import logging
+from decimal import Decimal, InvalidOperation
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from library.account import invalidate_account_state
+from library.models import Loan
+
+from .models import PaymentEvent, PaymentOrder
+
+logger = logging.getLogger(__name__)
+
+PAID_STATUSES = ('settlement', 'capture')
+MAX_ATTEMPTS = 5
+
+
+class NotificationError(Exception):
+    """Notifikasi tidak bisa diterapkan (order tidak dikenal, data tidak lengkap)."""
+
+
+# --- 1. Verifikasi & Pencatatan ---
+
+def signature_for(order_id, status_code, gross_amount, server_key=None):
+    server_key = server_key if server_key is not None else settings.MIDTRANS_SERVER_KEY
+    if not server_key:
+        raise ImproperlyConfigured("MIDTRANS_SERVER_KEY belum diatur.")
+    raw = f"{order_id}{status_code}{gross_amount}{server_key}"
+    return hashlib.sha512(raw.encode()).hexdigest()
+
+
+def verify_signature(data, server_key=None):
+    """``signature_key`` = SHA512(order_id + status_code + gross_amount + server_key).
+
+    Selalu ``False`` jika server key kosong (gagal tertutup).
+    """
+    if not (server_key if server_key is not None else settings.MIDTRANS_SERVER_KEY):
+        return False
+    expected = signature_for(
+        data.get('order_id', ''), data.get('status_code', ''), data.get('gross_amount', ''), server_key
+    )
+    return hmac.compare_digest(expected, str(data.get('signature_key', '')))
+
+
+def record_notification(data):
+    """Mencatat notifikasi. Mengembalikan ``(event, created)``; duplikat tidak dicatat ulang."""
+    fields = {
+        'order_id': data['order_id'],
+        'transaction_status': data['transaction_status'],
+    }
+    try:
+        with transaction.atomic():
+            event = PaymentEvent.objects.create(
+                **fields,
+                status_code=data.get('status_code', ''),
+                fraud_status=data.get('fraud_status', ''),
+                gross_amount=data.get('gross_amount', ''),
+                payload=data,
+            )
+        return event, True
+    except IntegrityError:
+        return PaymentEvent.objects.get(**fields), False
+
+
+# --- 2. Penerapan ---
+
+FAILED_STATUSES = ('deny', 'cancel', 'failure')
+
+
+def legacy_loan_id(order_id):
+    # Order lama (sebelum PaymentOrder): FINE-<loan_id>-<timestamp>
+    parts = order_id.split('-')
+    if len(parts) < 2 or parts[0] != 'FINE' or not parts[1].isdigit():
+        raise NotificationError(f"Order tidak dikenal: {order_id}")
+    return int(parts[1])
+
+
+def _is_paid(event):
+    if event.transaction_status not in PAID_STATUSES:
+        return False
+    return event.transaction_status != 'capture' or event.fraud_status in ('', 'accept')
+
+
+def apply_order_event(event, order):
+    if _is_paid(event):
+        try:
+            gross_amount = Decimal(event.gross_amount)
+        except InvalidOperation:
+            gross_amount = None
+        if gross_amount != order.amount:
+            raise NotificationError(
+                f"Jumlah {event.gross_amount} tidak sesuai order {order.order_id} ({order.amount})"
+            )
+        if order.status == 'paid':
+            return None
+        order.status, order.paid_at = 'paid', timezone.now()
+        order.save(update_fields=['status', 'paid_at'])
+        Loan.objects.filter(payment_orders=order, is_paid=False).update(is_paid=True)
+        logger.info("Order %s lunas", order.order_id)
+        return order.member_id
+    if order.status == 'pending' and event.transaction_status in FAILED_STATUSES + ('expire',):
+        order.status = 'expired' if event.transaction_status == 'expire' else 'failed'
+        order.save(update_fields=['status'])
+    return None
+
+
+def apply_event(event):
+    """Menerapkan satu notifikasi ke order / pinjaman terkait. Idempoten.
+
+    Mengembalikan ``member_id`` jika ada pinjaman yang berubah, selain itu ``None``.
+    """
+    order = PaymentOrder.objects.filter(order_id=event.order_id).first()
+    if order is not None:
+        return apply_order_event(event, order)
+
+    if not _is_paid(event):
+        return None
+    loan_id = legacy_loan_id(event.order_id)
+    member_id = Loan.objects.filter(pk=loan_id).values_list('member_id', flat=True).first()
+    if member_id is None:
+        raise NotificationError(f"Loan {loan_id} tidak ditemukan")
+    if Loan.objects.filter(pk=loan_id, is_paid=False).update(is_paid=True):
+        logger.info("Loan %s ditandai lunas (order %s)", loan_id, event.order_id)
+        return member_id
+    return None
+
+
+def process_pending(batch_size=100, max_attempts=MAX_ATTEMPTS):
+    """Memproses satu batch antrean. Mengembalikan jumlah notifikasi yang diambil."""
+    with transaction.atomic():
+        events = list(
+            PaymentEvent.objects
+            .filter(processed_at__isnull=True, attempts__lt=max_attempts)
+            .select_for_update(skip_locked=True)
+            .order_by('id')[:batch_size]
+        )
+        changed_members = []
+        for event in events:
+            event.attempts += 1
+            try:
+                with transaction.atomic():
+                    member_id = apply_event(event)
+            except NotificationError as exc:
+                # Tidak akan berhasil jika diulang: tandai selesai beserta alasannya
+                logger.warning("Notifikasi %s dilewati: %s", event, exc)
+                event.last_error = str(exc)
+                event.processed_at = timezone.now()
+            except Exception as exc:
+                logger.exception("Gagal memproses notifikasi %s", event)
+                event.last_error = str(exc)
+                if event.attempts >= max_attempts:
+                    logger.error(
+                        "Notifikasi %s gagal %s kali dan tidak akan dicoba lagi (dead); "
+                        "periksa lalu terapkan manual: %s", event, event.attempts, exc,
+                    )
+            else:
+                if member_id is not None:
+                    changed_members.append(member_id)
+                event.last_error = ''
+                event.processed_at = timezone.now()
+        PaymentEvent.objects.bulk_update(events, ['attempts', 'last_error', 'processed_at'])
+
+    invalidate_account_state(changed_members)
+    return len(events)
+
+
+def dead_events(max_attempts=MAX_ATTEMPTS):
+    """Notifikasi yang sudah gagal ``max_attempts`` kali dan tidak lagi diambil worker."""
+    return PaymentEvent.objects.filter(processed_at__isnull=True, attempts__gte=max_attempts)
@@ -0,0 +1,140 @@
+# midtrans/payments.py
+
+"""Pembuatan order pembayaran denda (Snap).
+
+Setiap checkout dicatat sebagai ``PaymentOrder``. Jika anggota menekan tombol
+bayar lagi untuk pinjaman yang sama dan token Snap sebelumnya masih berlaku,
+token itu dikembalikan tanpa memanggil Midtrans.
+
+Pencarian order lama dan pembuatan order baru berjalan di satu transaksi
+yang mengunci pinjaman belum lunas milik anggota (``select_for_update``),
+jadi klik ganda atau dua tab tidak membuat dua transaksi Snap. Order dibuat
+lebih dulu tanpa token dan kunci dilepas sebelum Midtrans dipanggil;
+checkout lain untuk pinjaman yang sama selama itu mendapat
+``CheckoutInProgress``.
+"""
+
+import uuid
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from library.models import Loan
+
+from .gateway import get_snap_client
+from .models import PaymentOrder
+
+# Token tidak dipakai ulang jika sisa masa berlakunya kurang dari ini
+REUSE_MARGIN = timedelta(minutes=5)
+# Order tanpa token yang lebih muda dari ini dianggap masih menunggu Snap
+IN_PROGRESS_WINDOW = timedelta(minutes=1)
+
+
+class CheckoutInProgress(Exception):
+    """Checkout lain untuk pinjaman yang sama sedang menunggu Midtrans."""
+
+
+def new_order_id():
+    return f"ORDER-{uuid.uuid4().hex[:20].upper()}"
+
+
+def reusable_orders(member, loans, amount, now=None):
+    """Order pending milik ``member`` dengan himpunan pinjaman & jumlah yang sama persis.
+
+    Termasuk order yang baru dibuat dan masih menunggu token Snap.
+    """
+    now = now or timezone.now()
+    loan_ids = {loan.pk for loan in loans}
+    return (
+        PaymentOrder.objects
+        .filter(member=member, status='pending', amount=amount, expires_at__gt=now + REUSE_MARGIN)
+        .exclude(Q(snap_token='') & Q(created_at__lte=now - IN_PROGRESS_WINDOW))
+        .annotate(
+            loan_total=Count('loans', distinct=True),
+            loan_matched=Count('loans', filter=Q(loans__in=loan_ids), distinct=True),
+        )
+        .filter(loan_total=len(loan_ids), loan_matched=len(loan_ids))
+        .order_by('-expires_at')
+    )
+
+
+def build_transaction(order, member, loans):
+    amount = int(order.amount)
+    return {
+        "transaction_details": {"order_id": order.order_id, "gross_amount": amount},
+        "item_details": [
+            {"id": str(loan.id), "price": int(loan.fine_amount), "quantity": 1, "name": f"Denda: {loan.book.title[:20]}"}
+            for loan in loans
+        ],
+        "customer_details": {"first_name": member.username, "email": member.email},
+        "expiry": {"unit": "minutes", "duration": settings.MIDTRANS_ORDER_EXPIRY_MINUTES},
+    }
+
+
+def _reserve(member, loans, amount):
+    """Mengembalikan ``(order, reused)``; order baru belum punya token Snap."""
+    with transaction.atomic():
+        # Checkout anggota yang sama berjalan berurutan sampai order tercatat
+        list(
+            Loan.objects.select_for_update()
+            .filter(member=member, status='returned', is_paid=False).order_by('pk').values_list('pk')
+        )
+        order = reusable_orders(member, loans, amount).first()
+        if order is not None:
+            if not order.snap_token:
+                raise CheckoutInProgress("Checkout sebelumnya masih diproses, coba lagi sebentar.")
+            return order, True
+        order = PaymentOrder.objects.create(
+            order_id=new_order_id(), member=member, amount=amount,
+            expires_at=timezone.now() + timedelta(minutes=settings.MIDTRANS_ORDER_EXPIRY_MINUTES),
+        )
+        order.loans.set(loans)
+    return order, False
+
+
+def _save_token(order, result):
+    order.snap_token = result['token']
+    order.redirect_url = result.get('redirect_url', '')
+    order.save(update_fields=['snap_token', 'redirect_url'])
+
+
+def checkout(member, loans):
+    """Mengembalikan ``(order, reused)``. ``loans`` harus sudah membawa ``loan.book``."""
+    loans = list(loans)
+    amount = sum(loan.fine_amount for loan in loans)
+    order, reused = _reserve(member, loans, amount)
+    if reused:
+        return order, True
+    try:
+        result = get_snap_client().create_transaction(build_transaction(order, member, loans))
+    except Exception:
+        order.delete()  # Klik berikutnya boleh mencoba lagi
+        raise
+    _save_token(order, result)
+    return order, False
+
+
+async def acheckout(member, loans):
+    """Versi async ``checkout`` untuk view ASGI.
+
+    Panggilan HTTP ke Snap dijalankan di thread pool terpisah
+    (``thread_sensitive=False``) sehingga banyak checkout yang menunggu
+    Midtrans tidak saling antre di satu thread.
+    """
+    loans = list(loans)
+    amount = sum(loan.fine_amount for loan in loans)
+    order, reused = await sync_to_async(_reserve)(member, loans, amount)
+    if reused:
+        return order, True
+    create_transaction = sync_to_async(get_snap_client().create_transaction, thread_sensitive=False)
+    try:
+        result = await create_transaction(build_transaction(order, member, loans))
+    except Exception:
+        await order.adelete()
+        raise
+    await sync_to_async(_save_token)(order, result)
+    return order, False
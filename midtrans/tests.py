@@ -1,3 +1,291 @@
-from django.test import TestCase
+import json
+import threading
+import time
+from datetime import date, timedelta
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.contrib.auth.models import User
+from django.db import connections
+from django.test import (
+    AsyncRequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings, skipUnlessDBFeature,
+)
+from django.urls import reverse
+from django.utils import timezone
+
+from library.models import Book, Loan, Location
+
+from . import notifications, payments, views
+from .fake_snap import start_in_thread
+from .gateway import GatewayError, GatewayUnavailable, SnapClient
+from .models import PaymentEvent, PaymentOrder
+
+
+@override_settings(MIDTRANS_SERVER_KEY='test-key', MIDTRANS_PROCESS_INLINE=False)
+class WebhookTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        location = Location.objects.create(shelf_name='A1', description='Rak A1')
+        book = Book.objects.create(title='Buku', description='-', publication_year=2000, stock=1, location=location)
+        member = User.objects.create_user('anggota')
+        cls.loan = Loan.objects.create(
+            book=book, member=member, status='returned',
+            borrow_date=date(2024, 1, 1), due_date=date(2024, 1, 8), return_date=date(2024, 1, 10),
+        )
+
+    def notify(self, status='settlement', signature=None, order_id=None, gross_amount='2000.00'):
+        # Tanpa order_id: format order lama FINE-<loan_id>-<timestamp>
+        order_id = order_id or f'FINE-{self.loan.pk}-20240110120000'
+        payload = {
+            'order_id': order_id, 'transaction_status': status,
+            'status_code': '200', 'gross_amount': gross_amount,
+        }
+        payload['signature_key'] = signature or notifications.signature_for(order_id, '200', gross_amount)
+        return self.client.post(reverse('midtrans_webhook'), json.dumps(payload), content_type='application/json')
+
+    def test_invalid_signature_rejected(self):
+        self.assertEqual(self.notify(signature='0' * 128).status_code, 403)
+        self.assertFalse(PaymentEvent.objects.exists())
+
+    def test_missing_server_key_fails_closed(self):
+        forged = notifications.signature_for(f'FINE-{self.loan.pk}-20240110120000', '200', '2000.00', 'x')
+        with self.settings(MIDTRANS_SERVER_KEY=''), self.assertLogs('midtrans', 'ERROR'):
+            self.assertEqual(self.notify(signature=forged).status_code, 503)
+        self.assertFalse(notifications.verify_signature({'signature_key': forged}, server_key=''))
+        self.assertFalse(PaymentEvent.objects.exists())
+
+    def test_retries_recorded_once_and_applied_by_worker(self):
+        for _ in range(3):
+            self.assertEqual(self.notify().status_code, 200)
+        self.assertEqual(PaymentEvent.objects.count(), 1)
+
+        self.loan.refresh_from_db()
+        self.assertFalse(self.loan.is_paid)  # belum diproses worker
+
+        self.assertEqual(notifications.process_pending(), 1)
+        self.assertEqual(notifications.process_pending(), 0)
+        self.loan.refresh_from_db()
+        self.assertTrue(self.loan.is_paid)
+
+    def test_unknown_order_marked_processed_with_error(self):
+        Loan.objects.filter(pk=self.loan.pk).delete()
+        self.notify()
+        notifications.process_pending()
+        event = PaymentEvent.objects.get()
+        self.assertIsNotNone(event.processed_at)
+        self.assertIn('tidak ditemukan', event.last_error)
+
+    def test_failing_event_marked_dead_after_max_attempts(self):
+        self.notify()
+        with mock.patch.object(notifications, 'apply_event', side_effect=RuntimeError('DB mati')):
+            with self.assertLogs('midtrans.notifications', 'ERROR') as logs:
+                for _ in range(2):
+                    notifications.process_pending(max_attempts=2)
+        self.assertTrue(any('dead' in line for line in logs.output))
+        self.assertEqual(notifications.process_pending(max_attempts=2), 0)
+        self.assertEqual(notifications.dead_events(max_attempts=2).get().attempts, 2)
+
+    @override_settings(MIDTRANS_PROCESS_INLINE=True)
+    def test_inline_processing_marks_paid(self):
+        self.assertEqual(self.notify().status_code, 200)
+        self.loan.refresh_from_db()
+        self.assertTrue(self.loan.is_paid)
+
+    def make_order(self, amount='2000'):
+        order = PaymentOrder.objects.create(
+            order_id='ORDER-TEST', member=self.loan.member, amount=amount,
+            snap_token='token', expires_at=timezone.now() + timedelta(hours=1),
+        )
+        order.loans.add(self.loan)
+        return order
+
+    def test_order_resolved_by_order_id(self):
+        order = self.make_order()
+        self.notify(order_id=order.order_id)
+        notifications.process_pending()
+        order.refresh_from_db()
+        self.loan.refresh_from_db()
+        self.assertEqual(order.status, 'paid')
+        self.assertTrue(self.loan.is_paid)
+
+    def test_order_amount_mismatch_not_applied(self):
+        order = self.make_order()
+        self.notify(order_id=order.order_id, gross_amount='1.00')
+        notifications.process_pending()
+        self.loan.refresh_from_db()
+        self.assertFalse(self.loan.is_paid)
+        self.assertIn('tidak sesuai', PaymentEvent.objects.get().last_error)
+
+
+@override_settings(MIDTRANS_SERVER_KEY='test-key')
+class CheckoutTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        location = Location.objects.create(shelf_name='A1', description='Rak A1')
+        book = Book.objects.create(title='Buku', description='-', publication_year=2000, stock=1, location=location)
+        cls.member = User.objects.create_user('anggota')
+        cls.loan = Loan.objects.create(
+            book=book, member=cls.member, status='returned',
+            borrow_date=date(2024, 1, 1), due_date=date(2024, 1, 8), return_date=date(2024, 1, 10),
+        )
+
+    def request_for(self, url):
+        request = AsyncRequestFactory().get(url)
+        request.user = self.member
+
+        async def auser():
+            return self.member
+        request.auser = auser
+        return request
+
+    def test_valid_token_reused_without_calling_midtrans(self):
+        request = self.request_for(reverse('checkout_midtrans', args=[self.loan.pk]))
+        create_payment = async_to_sync(views.create_payment)
+        with mock.patch('midtrans.gateway.SnapClient.create_transaction', return_value={'token': 'abc'}) as create:
+            first = create_payment(request, self.loan.pk)
+            second = create_payment(request, self.loan.pk)
+        self.assertEqual(json.loads(first.content), {'token': 'abc'})
+        self.assertEqual(json.loads(second.content), {'token': 'abc'})
+        self.assertEqual(create.call_count, 1)
+        self.assertEqual(PaymentOrder.objects.get().loans.get(), self.loan)
+
+    def test_double_click_while_waiting_for_snap(self):
+        request = self.request_for(reverse('checkout_midtrans', args=[self.loan.pk]))
+        create_payment = async_to_sync(views.create_payment)
+        # Order dari klik pertama sudah tercatat, tokennya belum kembali dari Snap
+        order, reused = payments._reserve(self.member, [self.loan], self.loan.fine_amount)
+        self.assertFalse(reused)
+        with mock.patch('midtrans.gateway.SnapClient.create_transaction') as create:
+            response = create_payment(request, self.loan.pk)
+        self.assertEqual(response.status_code, 409)
+        create.assert_not_called()
+
+        # Order tanpa token yang sudah lewat jendela tidak lagi menahan checkout
+        PaymentOrder.objects.filter(pk=order.pk).update(
+            created_at=timezone.now() - payments.IN_PROGRESS_WINDOW - timedelta(seconds=1),
+        )
+        with mock.patch('midtrans.gateway.SnapClient.create_transaction', return_value={'token': 'abc'}):
+            self.assertEqual(json.loads(create_payment(request, self.loan.pk).content), {'token': 'abc'})
+
+    def test_failed_snap_call_releases_order(self):
+        request = self.request_for(reverse('checkout_midtrans', args=[self.loan.pk]))
+        create_payment = async_to_sync(views.create_payment)
+        with mock.patch('midtrans.gateway.SnapClient.create_transaction', side_effect=GatewayError('503')), \
+                self.assertLogs('midtrans.views', 'ERROR'):
+            self.assertEqual(create_payment(request, self.loan.pk).status_code, 500)
+        self.assertFalse(PaymentOrder.objects.exists())
+        with mock.patch('midtrans.gateway.SnapClient.create_transaction', return_value={'token': 'abc'}):
+            self.assertEqual(create_payment(request, self.loan.pk).status_code, 200)
+        self.assertEqual(PaymentOrder.objects.get().snap_token, 'abc')
+
+    def test_all_unpaid_fines_in_one_order(self):
+        second = Loan.objects.create(
+            book=self.loan.book, member=self.member, status='returned',
+            borrow_date=date(2024, 2, 1), due_date=date(2024, 2, 8), return_date=date(2024, 2, 13),
+        )
+        request = self.request_for(reverse('checkout_all_fines'))
+        with mock.patch('midtrans.gateway.SnapClient.create_transaction', return_value={'token': 'abc'}) as create:
+            async_to_sync(views.create_payment_all)(request)
+        param = create.call_args.args[0]
+        self.assertEqual(len(param['item_details']), 2)
+        self.assertEqual(param['transaction_details']['gross_amount'], 7000)
+
+        order = PaymentOrder.objects.get()
+        notifications.record_notification({
+            'order_id': order.order_id, 'transaction_status': 'settlement',
+            'status_code': '200', 'gross_amount': '7000.00',
+        })
+        notifications.process_pending()
+        self.assertEqual(Loan.objects.filter(pk__in=[self.loan.pk, second.pk], is_paid=True).count(), 2)
+
+
+@skipUnlessDBFeature('has_select_for_update')
+class CheckoutLockTests(TransactionTestCase):
+
+    def test_concurrent_checkouts_create_one_snap_transaction(self):
+        book = Book.objects.create(title='Buku', description='-', publication_year=2000, stock=1)
+        member = User.objects.create_user('anggota')
+        Loan.objects.create(
+            book=book, member=member, status='returned',
+            borrow_date=date(2024, 1, 1), due_date=date(2024, 1, 8), return_date=date(2024, 1, 10),
+        )
+        barrier = threading.Barrier(2)
+        outcomes = []
+
+        def slow_snap(payload):
+            time.sleep(0.5)
+            return {'token': 'abc'}
+
+        def pay():
+            try:
+                barrier.wait()
+                loans = Loan.objects.filter(member=member).select_related('book')
+                outcomes.append(payments.checkout(member, loans)[1])
+            except payments.CheckoutInProgress:
+                outcomes.append('diproses')
+            finally:
+                connections.close_all()
+
+        with mock.patch('midtrans.gateway.SnapClient.create_transaction', side_effect=slow_snap) as create:
+            threads = [threading.Thread(target=pay) for _ in range(2)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        self.assertEqual(create.call_count, 1)
+        self.assertEqual(sorted(outcomes, key=str), [False, 'diproses'])
+        self.assertEqual(PaymentOrder.objects.count(), 1)
+
+
+class SnapClientTests(SimpleTestCase):
+
+    def setUp(self):
+        self.server, self.base_url = start_in_thread()
+        self.addCleanup(self.server.shutdown)
+
+    def client_for(self, **kwargs):
+        options = dict(server_key='test-key', base_url=self.base_url, connect_timeout=1, read_timeout=2,
+                       max_retries=1, backoff=0, breaker_threshold=2, breaker_reset=60)
+        options.update(kwargs)
+        return SnapClient(**options)
+
+    def test_create_transaction_returns_token(self):
+        client = self.client_for()
+        result = client.create_transaction({'transaction_details': {'order_id': 'ORDER-1', 'gross_amount': 1000}})
+        self.assertIn('token', result)
+        self.assertEqual(client.metrics.snapshot()['calls'], 1)
+
+    def test_breaker_opens_and_fails_fast(self):
+        self.server.error_rate = 1.0
+        client = self.client_for()
+        for _ in range(2):
+            with self.assertRaises(GatewayError):
+                client.create_transaction({})
+        self.assertEqual(client.breaker.state, 'open')
+        calls = client.metrics.snapshot()['calls']
+        with self.assertRaises(GatewayUnavailable):
+            client.create_transaction({})
+        # Tidak ada permintaan HTTP baru selama breaker terbuka
+        self.assertEqual(client.metrics.snapshot()['calls'], calls)
+        self.assertEqual(client.metrics.snapshot()['rejected'], 1)
+
+    def test_unexpected_errors_settle_half_open_probe(self):
+        import requests
+
+        client = self.client_for(breaker_threshold=1, breaker_reset=0)
+        invalid_json = mock.Mock(status_code=200, json=mock.Mock(side_effect=ValueError('bukan JSON')))
+        failures = [requests.TooManyRedirects('loop'), requests.exceptions.ChunkedEncodingError('putus'), invalid_json]
+        for failure in failures:
+            # reset 0 detik: setiap panggilan setelah kegagalan adalah probe half-open
+            with mock.patch.object(client.session, 'post', side_effect=[failure]):
+                with self.assertRaises(GatewayError) as ctx:
+                    client.create_transaction({})
+            self.assertNotIsInstance(ctx.exception, GatewayUnavailable)
+            self.assertEqual(client.breaker.state, 'half-open')
+        with mock.patch.object(client.session, 'post', side_effect=KeyboardInterrupt):
+            with self.assertRaises(KeyboardInterrupt):
+                client.create_transaction({})
+        self.assertIn('token', client.create_transaction({'transaction_details': {'order_id': 'ORDER-2', 'gross_amount': 1}}))
+        self.assertEqual(client.breaker.state, 'closed')
@@ -3,6 +3,8 @@ from . import views
 
 urlpatterns = [
  path('checkout/<int:loan_id>/', views.create_payment, name='checkout_midtrans'),
+path('checkout/all/', views.create_payment_all, name='checkout_all_fines'),
 path('payment-callback/', views.payment_callback, name='payment_callback'),
 path('webhook/midtrans/', views.midtrans_webhook, name='midtrans_webhook'),
+path('gateway-metrics/', views.gateway_metrics, name='gateway_metrics'),
 ]
\ No newline at end of file
@@ -1,74 +1,99 @@
 import json
-import midtransclient
+import logging
+from asgiref.sync import sync_to_async
 from django.conf import settings
-from django.http import JsonResponse, HttpResponse
-from django.shortcuts import get_object_or_404, render, redirect
+from django.http import Http404, JsonResponse, HttpResponse
+from django.shortcuts import render, redirect
 from django.views.decorators.csrf import csrf_exempt
 from django.contrib.auth.decorators import login_required
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib import messages
+from django.views.decorators.http import require_POST
 from library.models import Loan
-from datetime import datetime
 
-# Konfigurasi Midtrans
-snap = midtransclient.Snap(
-    is_production=settings.IS_PRODUCTION,
-    server_key=settings.MIDTRANS_SERVER_KEY,
-    client_key=settings.MIDTRANS_CLIENT_KEY
-)
+from . import notifications, payments
+from .gateway import GatewayUnavailable, get_snap_client
+
+logger = logging.getLogger(__name__)
 
 @login_required
-def create_payment(request, loan_id):
-    loan = get_object_or_404(Loan, pk=loan_id, member=request.user)
+async def create_payment(request, loan_id):
+    user = await request.auser()
+    loan = await Loan.objects.select_related('book').filter(pk=loan_id, member=user).afirst()
+    if loan is None:
+        raise Http404("Peminjaman tidak ditemukan.")
     
     if loan.status != 'returned':
         return JsonResponse({'error': 'Buku harus dikembalikan terlebih dahulu.'}, status=400)
-    timestamp = datetime.now().strftime('%Y%m%d%H%M%S')
-    amount = int(loan.fine_amount)
-    order_id = f"FINE-{loan.id}-{timestamp}"
-    print(order_id)
-    param = {
-        "transaction_details": {"order_id": order_id, "gross_amount": amount},
-        "item_details": [{"id": str(loan.id), "price": amount, "quantity": 1, "name": f"Denda: {loan.book.title[:20]}"}],
-        "customer_details": {"first_name": loan.member.username, "email": loan.member.email}
-    }
+    if loan.is_paid or loan.fine_amount <= 0:
+        return JsonResponse({'error': 'Tidak ada denda yang perlu dibayar.'}, status=400)
+    return await _checkout(user, [loan])
+
+@login_required
+async def create_payment_all(request):
+    user = await request.auser()
+    # Semua denda pinjaman yang sudah dikembalikan dalam satu order (satu item per pinjaman)
+    loans = [
+        loan async for loan in
+        Loan.objects.filter(member=user, status='returned', is_paid=False, fine_amount__gt=0)
+        .select_related('book').order_by('pk')
+    ]
+    if not loans:
+        return JsonResponse({'error': 'Tidak ada denda yang perlu dibayar.'}, status=400)
+    return await _checkout(user, loans)
 
+async def _checkout(user, loans):
     try:
-        transaction = snap.create_transaction(param)
-        return JsonResponse({'token': transaction['token']})
+        # Token Snap yang masih berlaku dipakai ulang tanpa memanggil Midtrans
+        order, reused = await payments.acheckout(user, loans)
+    except GatewayUnavailable as e:
+        # Circuit breaker terbuka: gagal cepat tanpa menahan worker
+        return JsonResponse({'error': str(e)}, status=503)
+    except payments.CheckoutInProgress as e:
+        # Klik ganda: token dari klik pertama sedang dibuat
+        return JsonResponse({'error': str(e)}, status=409)
     except Exception as e:
+        logger.exception("Gagal membuat transaksi Snap untuk loan %s", [loan.id for loan in loans])
         return JsonResponse({'error': str(e)}, status=500)
+    logger.info("Checkout %s (%s)", order.order_id, 'token lama' if reused else 'transaksi baru')
+    return JsonResponse({'token': order.snap_token})
+
 @csrf_exempt
-def midtrans_webhook(request):
-    if request.method == 'POST':
-        try:
-            data = json.loads(request.body)
-            order_id_raw = data.get('order_id')
-            status = data.get('transaction_status')
-            
-            print(f"Webhook Received: {order_id_raw} - Status: {status}") # DEBUG
+@require_POST
+async def midtrans_webhook(request):
+    # Verifikasi + catat, lalu balas 200. Status pinjaman diperbarui di sini
+    # (MIDTRANS_PROCESS_INLINE) dan/atau oleh worker process_payment_events.
+    if not settings.MIDTRANS_SERVER_KEY:
+        # Gagal tertutup: tanpa server key tanda tangan apa pun bisa dipalsukan.
+        # 503 agar Midtrans mengirim ulang setelah key diatur.
+        logger.error("Webhook Midtrans ditolak: MIDTRANS_SERVER_KEY belum diatur")
+        return HttpResponse(status=503)
+    try:
+        data = json.loads(request.body)
+        order_id = data['order_id']
+        status = data['transaction_status']
+    except (ValueError, KeyError, TypeError):
+        logger.warning("Webhook Midtrans dengan body tidak valid")
+        return HttpResponse(status=400)
+
+    if not notifications.verify_signature(data):
+        logger.warning("Tanda tangan webhook tidak valid: %s - %s", order_id, status)
+        return HttpResponse(status=403)
+
+    event, created = await sync_to_async(notifications.record_notification)(data)
+    if not created:
+        logger.info("Webhook duplikat diabaikan: %s - %s", order_id, status)
+    elif settings.MIDTRANS_PROCESS_INLINE:
+        # Default: proses antrean di request ini (deployment tanpa worker, mis. Vercel)
+        await sync_to_async(notifications.process_pending)()
+    return HttpResponse(status=200)
+
+@staff_member_required
+def gateway_metrics(request):
+    """Latensi & status circuit breaker klien Snap di proses ini."""
+    client = get_snap_client()
+    return JsonResponse({**client.metrics.snapshot(), 'breaker': client.breaker.state})
 
-            # Pecah ID
-            parts = order_id_raw.split('-')
-            if len(parts) < 2:
-                return HttpResponse(status=400) # Bad Request jika format salah
-                
-            loan_id = parts[1]
-            loan = Loan.objects.filter(id=loan_id).first() # Gunakan filter agar tidak crash
-            
-            if loan:
-                if status in ['settlement', 'capture']:
-                    loan.is_paid = True
-                    loan.save()
-                    print(f"Loan {loan_id} marked as PAID")
-                return HttpResponse(status=200)
-            else:
-                print(f"Loan ID {loan_id} not found in database!")
-                return HttpResponse(status=404) # Ini yang bikin 404 jika ID ga ada
-        except Exception as e:
-            print(f"Webhook Error: {str(e)}")
-            return HttpResponse(status=500)
-            
-    return HttpResponse(status=405)
 # Handler untuk memicu Django Messages
 def payment_callback(request):
     status = request.GET.get('status')
@@ -5,6 +5,14 @@ It exposes the ASGI callable as a module-level variable named ``application``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
+
+Profil deployment ASGI: proses ``web-asgi`` di ``Procfile`` (uvicorn,
+``CONN_MAX_AGE=0`` karena koneksi persisten tidak dipakai ulang antar
+konteks async; gunakan pooler seperti Neon pooled URL). View checkout,
+webhook Midtrans dan katalog adalah view async, jadi profil ini cocok jika
+latensi Midtrans mulai menahan worker WSGI. Deployment default tetap WSGI
+(``web``, juga ``vercel.json``). Bandingkan keduanya dengan
+``python manage.py loadtest --help``.
 """
 
 import os
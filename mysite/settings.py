@@ -14,16 +14,20 @@ from pathlib import Path
 import dj_database_url
 import os
 from django.contrib.messages import constants as messages
-import os
-from dotenv import load_dotenv
 
-load_dotenv()
+# Build paths inside the project like this: BASE_DIR / 'subdir'.
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+# .env hanya untuk pengembangan lokal. Di Vercel variabel datang dari platform,
+# jadi python-dotenv (dan pencarian file .env-nya) tidak ikut dibayar saat cold start.
+if (BASE_DIR / '.env').exists():
+    from dotenv import load_dotenv
+    load_dotenv(BASE_DIR / '.env')
+
 MESSAGE_TAGS = {
     messages.ERROR: 'danger',  # Ini wajib ada agar class bg-danger muncul
     messages.SUCCESS: 'success',
 }
-# Build paths inside the project like this: BASE_DIR / 'subdir'.
-BASE_DIR = Path(__file__).resolve().parent.parent
 
 
 # Quick-start development settings - unsuitable for production
@@ -48,13 +52,18 @@ INSTALLED_APPS = [
     'django.contrib.messages',
     'django.contrib.staticfiles',
     'library.apps.LibraryConfig',
-    'cloudinary_storage',
-    'cloudinary',
     'midtrans.apps.MidtransConfig',
 ]
+# Storage Cloudinary (STORAGES) diimpor saat file pertama diakses, bukan saat startup.
+# App-nya hanya menambah command (deleteorphanedmedia) & template tag yang tidak dipakai,
+# tetapi mengimpor SDK cloudinary di setiap cold start; di lambda (VERCEL) tidak dipasang.
+if not os.getenv('VERCEL'):
+    INSTALLED_APPS.append('cloudinary_storage')
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'library.instrumentation.InstrumentationMiddleware',
+    'library.routing.ReplicaMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -70,7 +79,8 @@ ROOT_URLCONF = 'mysite.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # DjangoTemplates + pengukuran waktu render (library/instrumentation.py)
+        'BACKEND': 'library.instrumentation.InstrumentedTemplates',
         'DIRS': [BASE_DIR/"templates"],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -89,13 +99,63 @@ WSGI_APPLICATION = 'mysite.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# Koneksi dipakai ulang selama CONN_MAX_AGE, termasuk antar invocation hangat lambda
+# (proses dibekukan, bukan dimatikan). Health check membuang koneksi yang sudah ditutup
+# server/pooler selama jeda itu sebelum dipakai, bukan gagal di query pertama.
+# DATABASE_POOLER=pgbouncer untuk URL pooler mode transaksi (otomatis untuk host Neon
+# "-pooler"): server-side cursor tidak bertahan antar transaksi sehingga dimatikan.
+_database_url = os.getenv('DATABASE_URL') or os.getenv('NEON_SECRET_URL') or ''
+DATABASE_POOLER = os.getenv('DATABASE_POOLER', 'pgbouncer' if '-pooler.' in _database_url else '')
+DATABASE_OPTIONS = {
+    # Set 0 untuk deployment ASGI (lihat mysite/asgi.py)
+    'conn_max_age': int(os.getenv('CONN_MAX_AGE', 600)),
+    'conn_health_checks': True,
+    'disable_server_side_cursors': DATABASE_POOLER == 'pgbouncer',
+}
+
 DATABASES = {
-    'default': dj_database_url.config(
-        default=os.getenv('NEON_SECRET_URL'),
-        conn_max_age=600
-    )
+    'default': dj_database_url.config(default=os.getenv('NEON_SECRET_URL'), **DATABASE_OPTIONS)
 }
 
+# Replika baca (library/routing.py): REPLICA_DATABASE_URLS berisi satu atau lebih URL dipisah koma.
+# Katalog, facet & laporan admin dibaca dari replika; tulis dan view lain tetap ke primary.
+# Saat test, replika mencerminkan database test default (TEST.MIRROR).
+DATABASE_REPLICAS = []
+for _number, _url in enumerate(filter(None, map(str.strip, os.getenv('REPLICA_DATABASE_URLS', '').split(','))), 1):
+    DATABASES[f'replica_{_number}'] = dj_database_url.parse(_url, **DATABASE_OPTIONS) | {'TEST': {'MIRROR': 'default'}}
+    DATABASE_REPLICAS.append(f'replica_{_number}')
+DATABASE_ROUTERS = ['library.routing.ReplicaRouter']
+# Setelah request yang menulis, klien membaca dari primary selama sekian detik (read-your-writes)
+REPLICA_STICKY_SECONDS = int(os.getenv('REPLICA_STICKY_SECONDS', 10))
+REPLICA_STICKY_COOKIE = 'primary_sticky'
+
+# Cache
+# CACHE_BACKEND: locmem, file, atau db. Versi cache (library/caching.py) harus terlihat
+# di semua worker/instance, jadi default-nya db kecuali database lokal SQLite (satu proses
+# runserver). Tabel cache dibuat oleh build_files.sh (python manage.py createcachetable).
+
+CACHE_BACKENDS = {
+    'locmem': ('django.core.cache.backends.locmem.LocMemCache', 'jendela-bangsa'),
+    'file': ('django.core.cache.backends.filebased.FileBasedCache', '/tmp/jendela-bangsa-cache'),
+    'db': ('django.core.cache.backends.db.DatabaseCache', 'library_cache'),
+}
+_local_database = 'sqlite3' in DATABASES['default'].get('ENGINE', '')
+CACHE_BACKEND = os.getenv('CACHE_BACKEND', 'locmem' if _local_database else 'db')
+_cache_backend, _cache_location = CACHE_BACKENDS[CACHE_BACKEND]
+CACHES = {
+    'default': {
+        'BACKEND': _cache_backend,
+        'LOCATION': os.getenv('CACHE_LOCATION', _cache_location),
+        'TIMEOUT': 300,
+    }
+}
+# Halaman katalog utuh untuk pengunjung anonim & fragmen buku (detik). Di locmem setiap
+# worker punya salinan versi sendiri, jadi fragmen tidak boleh hidup lebih lama dari halaman.
+PAGE_CACHE_TIMEOUT = int(os.getenv('PAGE_CACHE_TIMEOUT', 300))
+FRAGMENT_CACHE_TIMEOUT = int(os.getenv('FRAGMENT_CACHE_TIMEOUT', 300 if CACHE_BACKEND == 'locmem' else 3600))
+# Disertakan di ETag halaman agar template baru setelah deploy tidak dijawab 304
+PAGE_ETAG_SALT = os.getenv('PAGE_ETAG_SALT', os.getenv('VERCEL_GIT_COMMIT_SHA', ''))
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -153,10 +213,14 @@ CLOUDINARY_STORAGE = {
 # Ganti DEFAULT_FILE_STORAGE agar Django menyimpan file media di Cloudinary
 DEFAULT_FILE_STORAGE = 'cloudinary_storage.storage.MediaCloudinaryStorage'
 # settings.py (KHUSUS UNTUK DJANGO 4.2+)
+# Tanpa CLOUD_NAME (lokal) sampul & thumbnail disimpan di MEDIA_ROOT
 
 STORAGES = {
     "default": {
-        "BACKEND": "cloudinary_storage.storage.MediaCloudinaryStorage",
+        "BACKEND": (
+            "cloudinary_storage.storage.MediaCloudinaryStorage" if os.getenv('CLOUD_NAME')
+            else "django.core.files.storage.FileSystemStorage"
+        ),
     },
     # JANGAN UBAH BAGIAN STATICFILES INI, biarkan tetap default
     "staticfiles": {
@@ -169,4 +233,40 @@ STORAGES = {
 
 MIDTRANS_SERVER_KEY = os.getenv('MIDTRANS_SERVER_KEY')
 MIDTRANS_CLIENT_KEY = os.getenv('MIDTRANS_CLIENT_KEY')
-IS_PRODUCTION = os.getenv('MIDTRANS_IS_PRODUCTION') or False  # Set ke True jika sudah live
\ No newline at end of file
+IS_PRODUCTION = os.getenv('MIDTRANS_IS_PRODUCTION') or False  # Set ke True jika sudah live
+# Masa berlaku token Snap; selama masih berlaku token dipakai ulang saat checkout
+MIDTRANS_ORDER_EXPIRY_MINUTES = int(os.getenv('MIDTRANS_ORDER_EXPIRY_MINUTES', 60))
+# Klien Snap (midtrans/gateway.py). MIDTRANS_SNAP_URL bisa diarahkan ke server Snap palsu lokal.
+MIDTRANS_SNAP_URL = os.getenv('MIDTRANS_SNAP_URL')
+MIDTRANS_CONNECT_TIMEOUT = float(os.getenv('MIDTRANS_CONNECT_TIMEOUT', 3.05))
+MIDTRANS_READ_TIMEOUT = float(os.getenv('MIDTRANS_READ_TIMEOUT', 8))
+MIDTRANS_MAX_RETRIES = int(os.getenv('MIDTRANS_MAX_RETRIES', 2))
+MIDTRANS_RETRY_BACKOFF = float(os.getenv('MIDTRANS_RETRY_BACKOFF', 0.2))  # detik
+MIDTRANS_BREAKER_THRESHOLD = int(os.getenv('MIDTRANS_BREAKER_THRESHOLD', 5))
+MIDTRANS_BREAKER_RESET = float(os.getenv('MIDTRANS_BREAKER_RESET', 30))  # detik
+# Webhook mencatat notifikasi ke PaymentEvent lalu langsung menerapkannya (default, aman
+# untuk Vercel yang tidak punya worker). Set False hanya jika proses `worker` di Procfile
+# (`process_payment_events`) berjalan; antrean tidak pernah diproses tanpa salah satunya.
+MIDTRANS_PROCESS_INLINE = os.getenv('MIDTRANS_PROCESS_INLINE', 'True').lower() in ('1', 'true', 'yes')
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'midtrans': {'handlers': ['console'], 'level': os.getenv('MIDTRANS_LOG_LEVEL', 'INFO')},
+        'library.instrumentation': {'handlers': ['console'], 'level': 'WARNING'},
+    },
+}
+
+# Instrumentasi request (library/instrumentation.py): porsi request yang diukur
+# (0 = mati, 1 = semua) dan batas jumlah query per nama URL (dicatat & di-log jika lewat)
+INSTRUMENTATION_SAMPLE_RATE = float(os.getenv('INSTRUMENTATION_SAMPLE_RATE', 0.1))
+INSTRUMENTATION_QUERY_BUDGETS = {
+    'book_list': 8,
+    'detail_book': 6,
+    'my_loans': 8,
+    'profile': 6,
+}